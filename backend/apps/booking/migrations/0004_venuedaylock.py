@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-18 06:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0003_alter_additionalservice_table_alter_applicant_table_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VenueDayLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='Day the lock guards')),
+                ('venue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_locks', to='booking.venue')),
+            ],
+            options={
+                'db_table': 'booking_venuedaylock',
+                'constraints': [models.UniqueConstraint(fields=('venue', 'date'), name='booking_venuedaylock_venue_date')],
+            },
+        ),
+    ]
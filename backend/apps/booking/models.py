@@ -198,4 +198,18 @@ class BookingService(models.Model):
         db_table = 'booking_bookingservice'
     
     def __str__(self):
-        return f"{self.booking.booking_reference} - {self.service.service_name}"
\ No newline at end of file
+        return f"{self.booking.booking_reference} - {self.service.service_name}"
+
+class VenueDayLock(models.Model):
+    """Lock row per venue and day; booking writers for that day take it FOR UPDATE"""
+    venue = models.ForeignKey(Venue, on_delete=models.CASCADE, related_name='day_locks')
+    date = models.DateField(help_text="Day the lock guards")
+    
+    class Meta:
+        db_table = 'booking_venuedaylock'
+        constraints = [
+            models.UniqueConstraint(fields=['venue', 'date'], name='booking_venuedaylock_venue_date'),
+        ]
+    
+    def __str__(self):
+        return f"{self.venue.venue_name} - {self.date}"
@@ -1,5 +1,8 @@
+from datetime import time
+
 from rest_framework import serializers
-from .models import Venue, Booking
+from .models import Venue, Booking, BookingSlot, PriceTier
+from .reservations import FULL_DAY_TIER_HOURS
 from django.utils import timezone
 
 
@@ -36,10 +39,85 @@ class BookingSerializer(serializers.ModelSerializer):
         return data
 
 
-class BookingCreateSerializer(serializers.ModelSerializer):
+class BookingCreateSerializer(serializers.Serializer):
+    """A booking request for one slot.
+    
+    The slot is priced by a PriceTier whose duration must match the requested
+    hours (full-day slots use the FULL_DAY_TIER_HOURS package), once for each
+    day from ``start_date`` to ``end_date``. Send either
+    ``tier_id`` or, as older clients do, ``venue_id`` and let the tier be
+    picked by duration; ``event_date`` is accepted for ``start_date``.
+    """
+    tier_id = serializers.IntegerField(required=False)
+    venue_id = serializers.IntegerField(required=False)
+    applicant_id = serializers.IntegerField(required=False, allow_null=True)
+    start_date = serializers.DateField(required=False)
+    event_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    start_time = serializers.TimeField(required=False)
+    end_time = serializers.TimeField(required=False)
+    total_hours = serializers.IntegerField(required=False)
+    isfullday = serializers.BooleanField(default=False)
+    event_types = serializers.ListField(child=serializers.CharField(), default=list)
+    event_details = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    additional_notes = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    is_public = serializers.BooleanField(default=False)
+    
+    def validate(self, data):
+        """Validate booking data."""
+        event_date = data.pop('event_date', None)
+        data.setdefault('start_date', event_date)
+        if data['start_date'] is None:
+            raise serializers.ValidationError("start_date (or event_date) is required")
+        data.setdefault('end_date', data['start_date'])
+        if data['end_date'] < data['start_date']:
+            raise serializers.ValidationError("End date must be on or after start date")
+        if data['start_date'] < timezone.localdate():
+            raise serializers.ValidationError("Start date cannot be in the past")
+        
+        if data['isfullday']:
+            data.setdefault('start_time', time(0, 0))
+            data.setdefault('end_time', time(23, 59))
+            hours = FULL_DAY_TIER_HOURS
+        elif 'start_time' not in data or 'end_time' not in data:
+            raise serializers.ValidationError("start_time and end_time are required unless isfullday is set")
+        elif data['start_time'] >= data['end_time']:
+            raise serializers.ValidationError("End time must be after start time")
+        else:
+            minutes = (data['end_time'].hour * 60 + data['end_time'].minute
+                       - data['start_time'].hour * 60 - data['start_time'].minute)
+            if minutes % 60:
+                raise serializers.ValidationError("Slots are booked in whole hours")
+            hours = minutes // 60
+        total_hours = data.pop('total_hours', None)
+        if total_hours is not None and total_hours != hours:
+            raise serializers.ValidationError("total_hours does not match start_time and end_time")
+        
+        tier_id = data.pop('tier_id', None)
+        venue_id = data.pop('venue_id', None)
+        if tier_id is not None:
+            try:
+                tier = PriceTier.objects.get(pk=tier_id)
+            except PriceTier.DoesNotExist:
+                raise serializers.ValidationError("Unknown price tier")
+            if venue_id is not None and tier.venue_id != venue_id:
+                raise serializers.ValidationError("Price tier belongs to another venue")
+            if tier.duration != hours:
+                raise serializers.ValidationError(f"The {tier.duration}-hour package does not cover {hours} hours")
+        elif venue_id is not None:
+            tier = PriceTier.objects.filter(venue_id=venue_id, duration=hours).first()
+            if tier is None:
+                raise serializers.ValidationError(f"The venue has no {hours}-hour package")
+        else:
+            raise serializers.ValidationError("tier_id or venue_id is required")
+        data['tier'] = tier
+        return data
+
+
+class BookingSlotSerializer(serializers.ModelSerializer):
     class Meta:
-        model = Booking
-        fields = ['venue_id', 'applicant_id', 'event_date', 'start_time', 'end_time', 'total_hours', 'event_details']
+        model = BookingSlot
+        fields = ['id', 'booking_id', 'venue_id', 'tier_id', 'start_date', 'end_date', 'start_time', 'end_time', 'isfullday', 'venue_cost']
 
 
 class BookingUpdateSerializer(serializers.ModelSerializer):
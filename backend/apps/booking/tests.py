@@ -0,0 +1,204 @@
+import threading
+from datetime import time, timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.booking.models import BookingSlot, PriceTier, Venue, VenueDayLock
+from apps.booking.reservations import SlotUnavailable, reserve_slot
+
+
+def _create_tier():
+    venue = Venue.objects.create(venue_name="Main Auditorium", capacity=600)
+    return PriceTier.objects.create(venue=venue, duration=4, price=Decimal('1800.00'))
+
+
+class ReserveSlotTests(TestCase):
+    """Conflict rules of the reservation path."""
+
+    def setUp(self):
+        self.tier = _create_tier()
+        self.day = timezone.localdate() + timedelta(days=7)
+
+    def _reserve(self, start, end, **kwargs):
+        return reserve_slot(self.tier, kwargs.pop('start_date', self.day), kwargs.pop('end_date', self.day),
+                            start, end, **kwargs)
+
+    def test_overlapping_slot_is_rejected(self):
+        self._reserve(time(10), time(14))
+        with self.assertRaises(SlotUnavailable):
+            self._reserve(time(13), time(17))
+        with self.assertRaises(SlotUnavailable):
+            self._reserve(time(0), time(23, 59), isfullday=True)
+
+    def test_adjacent_and_cancelled_slots_do_not_conflict(self):
+        booking, _ = self._reserve(time(10), time(14))
+        self._reserve(time(14), time(18))
+        booking.booking_status = 'cancelled'
+        booking.save()
+        self._reserve(time(9), time(12))
+
+    def test_multi_day_slot_takes_a_lock_row_per_day(self):
+        booking, slot = self._reserve(time(10), time(14), end_date=self.day + timedelta(days=2))
+        self.assertEqual((slot.venue_cost, booking.total_amount), (Decimal('5400.00'), Decimal('5400.00')))
+        self.assertEqual(VenueDayLock.objects.filter(venue=self.tier.venue).count(), 3)
+        with self.assertRaises(SlotUnavailable):
+            self._reserve(time(12), time(16), start_date=self.day + timedelta(days=2),
+                          end_date=self.day + timedelta(days=2))
+
+    def test_conflict_check_runs_under_the_day_locks(self):
+        self._reserve(time(10), time(14))
+
+        with CaptureQueriesContext(connection) as queries:
+            with self.assertRaises(SlotUnavailable):
+                self._reserve(time(12), time(16))
+
+        tables = [
+            table for query in queries.captured_queries
+            for table in ('booking_venuedaylock', 'booking_bookingslot') if f'FROM "{table}"' in query['sql']
+        ]
+        self.assertEqual(tables, ['booking_venuedaylock', 'booking_bookingslot'])
+        self.assertEqual(BookingSlot.objects.count(), 1)
+
+
+class BookingCreateTests(TestCase):
+    """POST /api/booking/bookings/ with the old and the tier-based fields."""
+
+    def setUp(self):
+        self.tier = _create_tier()
+        self.venue = self.tier.venue
+        self.client = APIClient()
+        self.day = (timezone.localdate() + timedelta(days=7)).isoformat()
+
+    def _post(self, **data):
+        return self.client.post(reverse('booking:bookings'), data, format='json')
+
+    def test_old_fields_pick_the_tier_by_duration(self):
+        PriceTier.objects.create(venue=self.venue, duration=2, price=Decimal('1000.00'))
+
+        response = self._post(venue_id=self.venue.id, event_date=self.day, start_time='10:00', end_time='14:00',
+                              total_hours=4, event_details='Annual meeting')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['slot']['tier_id'], self.tier.id)
+        self.assertEqual(Decimal(response.data['total_amount']), Decimal('1800.00'))
+        self.assertEqual(VenueDayLock.objects.filter(venue=self.venue).count(), 1)
+
+        conflict = self._post(venue_id=self.venue.id, event_date=self.day, start_time='12:00', end_time='16:00')
+        self.assertEqual(conflict.status_code, 400)
+        self.assertEqual(BookingSlot.objects.count(), 1)
+
+    def test_hours_must_match_the_package(self):
+        for data in (
+            {'venue_id': self.venue.id, 'start_time': '10:00', 'end_time': '13:00'},
+            {'tier_id': self.tier.id, 'start_time': '10:00', 'end_time': '16:00'},
+            {'tier_id': self.tier.id, 'start_time': '10:00', 'end_time': '14:30'},
+            {'tier_id': self.tier.id, 'start_time': '10:00', 'end_time': '14:00', 'total_hours': 6},
+            {'tier_id': self.tier.id, 'isfullday': True},
+        ):
+            with self.subTest(data=data):
+                self.assertEqual(self._post(start_date=self.day, **data).status_code, 400)
+        self.assertFalse(BookingSlot.objects.exists())
+
+    def test_tier_id_and_full_day_package(self):
+        full_day = PriceTier.objects.create(venue=self.venue, duration=12, price=Decimal('5000.00'))
+
+        self.assertEqual(self._post(tier_id=self.tier.id, start_date=self.day, start_time='08:00',
+                                    end_time='12:00').status_code, 201)
+        response = self._post(venue_id=self.venue.id, start_date=self.day, isfullday=True)
+        self.assertEqual(response.status_code, 400)
+        other_day = (timezone.localdate() + timedelta(days=8)).isoformat()
+        response = self._post(venue_id=self.venue.id, start_date=other_day, isfullday=True)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['slot']['tier_id'], full_day.id)
+
+    def test_multi_day_booking_is_charged_per_day(self):
+        full_day = PriceTier.objects.create(venue=self.venue, duration=12, price=Decimal('5000.00'))
+        start = timezone.localdate() + timedelta(days=7)
+
+        response = self._post(tier_id=self.tier.id, start_date=start.isoformat(),
+                              end_date=(start + timedelta(days=1)).isoformat(), start_time='10:00', end_time='14:00')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Decimal(response.data['total_amount']), Decimal('3600.00'))
+
+        response = self._post(tier_id=full_day.id, start_date=(start + timedelta(days=2)).isoformat(),
+                              end_date=(start + timedelta(days=4)).isoformat(), isfullday=True)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Decimal(response.data['total_amount']), Decimal('15000.00'))
+        self.assertEqual(Decimal(response.data['slot']['venue_cost']), Decimal('15000.00'))
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentReservationTests(TransactionTestCase):
+    """Concurrent writers for one slot must serialize on the venue-day lock."""
+
+    WRITERS = 16
+
+    def _burst(self, requests):
+        """Run ``reserve_slot(*args)`` for every request at once; return the successes."""
+        barrier = threading.Barrier(len(requests))
+        successes = []
+        errors = []
+
+        def worker(args):
+            try:
+                barrier.wait()
+                reserve_slot(*args)
+                successes.append(args)
+            except SlotUnavailable:
+                pass
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(args,)) for args in requests]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return successes
+
+    def test_only_one_of_many_writers_gets_the_slot(self):
+        tier = _create_tier()
+        day = timezone.localdate() + timedelta(days=7)
+
+        successes = self._burst([(tier, day, day, time(10), time(14))] * self.WRITERS)
+
+        self.assertEqual(len(successes), 1)
+        self.assertEqual(BookingSlot.objects.filter(venue=tier.venue, start_date=day).count(), 1)
+
+    def test_writers_for_different_days_all_succeed(self):
+        tier = _create_tier()
+        first_day = timezone.localdate() + timedelta(days=7)
+        days = [first_day + timedelta(days=offset) for offset in range(self.WRITERS)]
+
+        successes = self._burst([(tier, day, day, time(10), time(14)) for day in days])
+
+        self.assertEqual(len(successes), self.WRITERS)
+
+    def test_overlapping_multi_day_writers_do_not_double_book(self):
+        tier = _create_tier()
+        first_day = timezone.localdate() + timedelta(days=7)
+        # Every request overlaps its neighbours by one day
+        requests = [
+            (tier, first_day + timedelta(days=offset), first_day + timedelta(days=offset + 1), time(10), time(14))
+            for offset in range(self.WRITERS)
+        ]
+
+        self._burst(requests)
+
+        booked = {}
+        for slot in BookingSlot.objects.filter(venue=tier.venue):
+            day = slot.start_date
+            while day <= slot.end_date:
+                booked[day] = booked.get(day, 0) + 1
+                day += timedelta(days=1)
+        self.assertTrue(booked)
+        self.assertEqual(max(booked.values()), 1)
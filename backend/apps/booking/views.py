@@ -8,9 +8,11 @@ from .serializers import (
     VenueSerializer, 
     BookingSerializer, 
     BookingCreateSerializer,
+    BookingSlotSerializer,
     BookingUpdateSerializer
 )
 from .models import Venue, Booking
+from .reservations import SlotUnavailable, reserve_slot
 
 
 class VenueView(APIView):
@@ -93,35 +95,24 @@ class BookingView(APIView):
         return Response(serializer.data)
     
     def post(self, request):
-        """Create a new booking."""
+        """Create a new booking.
+        
+        The conflict check and the insert run under the venue's day locks,
+        so concurrent requests for the same slot cannot both succeed.
+        """
         serializer = BookingCreateSerializer(data=request.data)
         if serializer.is_valid():
-            # Check if venue is available
-            venue_id = serializer.validated_data['venue_id']
-            start_time = serializer.validated_data['start_time']
-            end_time = serializer.validated_data['end_time']
-            
-            # Check for conflicts
-            conflicts = Booking.objects.filter(
-                venue_id=venue_id,
-                status__in=['pending', 'approved'],
-                event_date=serializer.validated_data['event_date'],
-                start_time__lt=end_time,
-                end_time__gt=start_time
-            )
-            
-            if conflicts.exists():
-                return Response(
-                    {'error': 'Venue is not available for the selected time slot'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Create booking
-            booking_data = serializer.validated_data.copy()
-            booking = Booking.objects.create(**booking_data)
+            try:
+                booking, slot = reserve_slot(**serializer.validated_data)
+            except SlotUnavailable as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
-            response_serializer = BookingSerializer(booking)
-            return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+            return Response({
+                'booking_id': booking.id,
+                'booking_status': booking.booking_status,
+                'total_amount': booking.total_amount,
+                'slot': BookingSlotSerializer(slot).data,
+            }, status=status.HTTP_201_CREATED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
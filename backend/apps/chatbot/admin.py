@@ -1,6 +1,6 @@
 from django.contrib import admin
 from .models import (
-    ChatSession, ChatMessage, ChatbotMessage, Applicant, Venue, VenueImage, 
+    ChatSession, ChatMessage, ArchivedChatSession, ChatbotMessage, Applicant, Venue, VenueImage, 
     PriceTier, Booking, Feedback, BookingSlot, AdditionalService, PreArrangement,
     BookingService, NewPayment, OnlinePayment, ManualPayment, PaymentNotification,
     Refund, RefundBankDetails, PaymentAuditLog, PaymentInvoice, LegacyPayment,
@@ -24,6 +24,13 @@ class ChatMessageAdmin(admin.ModelAdmin):
         return obj.content[:50] + '...' if len(obj.content) > 50 else obj.content
     content_preview.short_description = 'Content Preview'
 
+@admin.register(ArchivedChatSession)
+class ArchivedChatSessionAdmin(admin.ModelAdmin):
+    list_display = ['session_id', 'user_id', 'message_count', 'updated_at', 'archived_at']
+    list_filter = ['archived_at']
+    search_fields = ['user_id']
+    readonly_fields = ['segment', 'offset', 'length']
+
 @admin.register(ChatbotMessage)
 class ChatbotMessageAdmin(admin.ModelAdmin):
     list_display = ['message_id', 'sender_type', 'user_id', 'message_preview', 'resolved', 'timestamp']
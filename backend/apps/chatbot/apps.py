@@ -5,3 +5,7 @@ class ChatbotConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.chatbot'
     verbose_name = 'Chatbot'
+
+    def ready(self):
+        from apps.chatbot.signals import connect_signals
+        connect_signals()
@@ -0,0 +1,175 @@
+"""
+Cold storage for idle chat sessions.
+
+Sessions not updated for CHATBOT_ARCHIVE_IDLE_DAYS are written to append-only
+segment files in CHATBOT_ARCHIVE_DIR, one gzip member per session, and
+removed from the hot chatbot_sessions / chatbot_messages_new tables. The
+ArchivedChatSession row records where each member lives, so a single session
+can be read back (rehydrated) with one seek and one read.
+"""
+import gzip
+import json
+import os
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.chatbot.chat_sessions import forget_session
+from apps.chatbot.models import ChatSession, ChatMessage, ArchivedChatSession
+
+
+def _archive_dir():
+    return str(getattr(settings, 'CHATBOT_ARCHIVE_DIR', 'chat_archive'))
+
+
+def _encode(value):
+    # Full isoformat; DjangoJSONEncoder would drop sub-millisecond precision
+    return value.isoformat()
+
+
+def _session_record(session, messages):
+    return {
+        'id': session.id,
+        'user_id': session.user_id,
+        'created_at': session.created_at,
+        'updated_at': session.updated_at,
+        'summary': session.summary,
+        'summary_through_id': session.summary_through_id,
+        'messages': messages,
+    }
+
+
+def archive_idle_sessions(idle_days=None, batch_size=500, dry_run=False):
+    """Move sessions idle for ``idle_days`` into a new segment file.
+
+    Returns the number of sessions archived (or that would be, with
+    ``dry_run``). Each batch is fsynced to the segment before its rows are
+    deleted, so a crash never loses a transcript.
+    """
+    if idle_days is None:
+        idle_days = getattr(settings, 'CHATBOT_ARCHIVE_IDLE_DAYS', 90)
+    cutoff = timezone.now() - timedelta(days=idle_days)
+    idle = ChatSession.objects.filter(updated_at__lt=cutoff)
+    if dry_run:
+        return idle.count()
+
+    os.makedirs(_archive_dir(), exist_ok=True)
+    segment = f"chat-{timezone.now():%Y%m%dT%H%M%S%f}.jsonl.gz"
+    archived = 0
+    last_id = 0
+    with open(os.path.join(_archive_dir(), segment), 'ab') as out:
+        while True:
+            sessions = list(idle.filter(id__gt=last_id).order_by('id')[:batch_size])
+            if not sessions:
+                break
+            last_id = sessions[-1].id
+
+            messages = defaultdict(list)
+            rows = (
+                ChatMessage.objects.filter(session_id__in=[session.id for session in sessions])
+                .order_by('id')
+                .values('id', 'session_id', 'sender_type', 'content', 'created_at')
+            )
+            for row in rows:
+                messages[row.pop('session_id')].append(row)
+
+            entries = {}
+            for session in sessions:
+                record = _session_record(session, messages[session.id])
+                member = gzip.compress(json.dumps(record, default=_encode).encode('utf-8'))
+                entries[session.id] = ArchivedChatSession(
+                    session_id=session.id,
+                    user_id=session.user_id,
+                    created_at=session.created_at,
+                    updated_at=session.updated_at,
+                    message_count=len(messages[session.id]),
+                    segment=segment,
+                    offset=out.tell(),
+                    length=len(member),
+                )
+                out.write(member)
+            out.flush()
+            os.fsync(out.fileno())
+
+            with transaction.atomic():
+                # A session touched since it was read stays hot; its copy in
+                # the segment is simply never referenced
+                still_idle = list(
+                    ChatSession.objects.select_for_update()
+                    .filter(id__in=entries, updated_at__lt=cutoff)
+                    .values_list('id', flat=True)
+                )
+                ArchivedChatSession.objects.bulk_create([entries[session_id] for session_id in still_idle])
+                ChatMessage.objects.filter(session_id__in=still_idle).delete()
+                ChatSession.objects.filter(id__in=still_idle).delete()
+
+            for user_id in {entries[session_id].user_id for session_id in still_idle}:
+                forget_session(user_id)
+            archived += len(still_idle)
+
+    if not archived:
+        os.remove(os.path.join(_archive_dir(), segment))
+    return archived
+
+
+def read_archived_session(entry):
+    """Return the archived record (session fields and messages) for ``entry``."""
+    with open(os.path.join(_archive_dir(), entry.segment), 'rb') as segment:
+        segment.seek(entry.offset)
+        member = segment.read(entry.length)
+    return json.loads(gzip.decompress(member))
+
+
+def rehydrate_session(session_id):
+    """Restore an archived session and its messages into the hot tables.
+
+    Returns the restored ChatSession, or None if ``session_id`` is neither
+    archived nor live. Original ids and timestamps are kept; ``updated_at``
+    is set to now so the session is not archived again on the next run.
+    Concurrent calls for the same session are safe: the archive entry is
+    locked, and a caller that finds it already restored gets the live session.
+    """
+    try:
+        with transaction.atomic():
+            entry = ArchivedChatSession.objects.select_for_update().filter(session_id=session_id).first()
+            if entry is None:
+                # Never archived, or restored by a concurrent call
+                return ChatSession.objects.filter(id=session_id).first()
+            session = _restore(read_archived_session(entry))
+            entry.delete()
+    except IntegrityError:
+        # Backends without row locks (SQLite) let the loser get this far
+        return ChatSession.objects.filter(id=session_id).first()
+
+    forget_session(session.user_id)
+    return session
+
+
+def _restore(record):
+    session = ChatSession.objects.create(
+        id=record['id'],
+        user_id=record['user_id'],
+        summary=record['summary'],
+        summary_through_id=record['summary_through_id'],
+    )
+    session.created_at = parse_datetime(record['created_at'])
+    ChatSession.objects.filter(id=session.id).update(created_at=session.created_at)
+
+    messages = ChatMessage.objects.bulk_create([
+        ChatMessage(
+            id=message['id'],
+            session_id=session.id,
+            sender_type=message['sender_type'],
+            content=message['content'],
+        )
+        for message in record['messages']
+    ], batch_size=500)
+    # bulk_create stamps auto_now_add fields; put the original times back
+    for message, original in zip(messages, record['messages']):
+        message.created_at = parse_datetime(original['created_at'])
+    ChatMessage.objects.bulk_update(messages, ['created_at'], batch_size=500)
+    return session
@@ -0,0 +1,321 @@
+"""
+In-memory interval index of booked venue dates.
+
+Every active booking slot (its booking is pending or confirmed) is held per
+venue as two sorted lists, one of start dates and one of end dates. The slots
+overlapping a date range [start, end] are those starting on or before
+``end`` minus those that ended before ``start``, so an availability check is
+two binary searches and never touches the database.
+
+The index is kept current by model signals (see signals.py), applied once the
+writing transaction commits. Each change also bumps a generation counter in
+the default cache, and a worker whose index is behind that generation (another
+process wrote), or older than CHATBOT_AVAILABILITY_INDEX_TTL, reloads it with
+one query. A reload on TTL first compares the index with what it loaded
+(``check_consistency``), so changes that bypass signals, such as
+``QuerySet.update()``, are reported and counted as drift.
+
+The counter only reaches other workers through a shared cache backend; with
+the per-process LocMemCache they would answer from a stale index until the
+TTL, so CHATBOT_AVAILABILITY_INDEX is off by default unless one is
+configured. Only the chatbot app's slots (chatbot_booking_slots) are indexed:
+bookings made through apps/booking live in their own tables and are not part
+of this availability, with or without the index.
+
+``occupancy_matrix`` serves calendar views: the hourly occupancy of many
+venues over a date window, built from a single UNION query over booked slots
+and pre-arrangement (setup, rehearsal, breakdown) windows.
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+from django.db.models import F, Value
+
+from apps.chatbot.models import BookingSlot, PreArrangement, Venue
+
+
+ACTIVE_BOOKING_STATUSES = ('confirmed', 'pending')
+
+# Occupancy matrix cell codes; a booked hour wins over a setup window
+FREE, ARRANGEMENT, BOOKED = 0, 1, 2
+
+GENERATION_CACHE_KEY = 'chatbot:availability_index_generation'
+
+
+class VenueIntervals:
+    """Sorted start and end dates of one venue's active slots."""
+
+    def __init__(self):
+        self.slots = {}
+        self.starts = []
+        self.ends = []
+
+    def add(self, slot_id, start, end):
+        if slot_id in self.slots:
+            self.remove(slot_id)
+        self.slots[slot_id] = (start, end)
+        insort(self.starts, start)
+        insort(self.ends, end)
+
+    def remove(self, slot_id):
+        interval = self.slots.pop(slot_id, None)
+        if interval is None:
+            return
+        start, end = interval
+        del self.starts[bisect_left(self.starts, start)]
+        del self.ends[bisect_left(self.ends, end)]
+
+    def count_overlaps(self, start, end):
+        """Number of slots overlapping [start, end], both inclusive."""
+        # Slots that ended before ``start`` also started before ``end``
+        return bisect_right(self.starts, end) - bisect_left(self.ends, start)
+
+
+def _load_active_slots(**filters):
+    return BookingSlot.objects.filter(
+        booking__booking_status__in=ACTIVE_BOOKING_STATUSES, **filters
+    ).values_list('slot_id', 'venue_id', 'start_date', 'end_date')
+
+
+def shared_generation(key=GENERATION_CACHE_KEY):
+    """Change counter other worker processes publish in the shared cache."""
+    return cache.get(key, 0)
+
+
+def bump_shared_generation(key=GENERATION_CACHE_KEY):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # First change since the cache was (re)started
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+
+
+class VenueIntervalIndex:
+    """Per-venue interval index over active BookingSlot rows."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._venues = {}
+        self._slot_venues = {}
+        self.generation = None
+        self.built_at = 0.0
+        self.rebuilds = 0
+        self.drifts = 0
+
+    def rebuild(self, rows=None, generation=None):
+        with self._lock:
+            if rows is None:
+                # Read the generation first; a change committed while loading
+                # bumps it again and triggers another rebuild
+                generation = shared_generation()
+                rows = _load_active_slots()
+            venues = {}
+            slot_venues = {}
+            for slot_id, venue_id, start, end in rows:
+                venues.setdefault(venue_id, VenueIntervals()).add(slot_id, start, end)
+                slot_venues[slot_id] = venue_id
+            self._venues = venues
+            self._slot_venues = slot_venues
+            self.generation = generation
+            self.built_at = time.monotonic()
+            self.rebuilds += 1
+
+    def _ensure_fresh(self):
+        generation = shared_generation()
+        if self.generation is None or self.generation != generation:
+            self.rebuild()
+            return
+        ttl = getattr(settings, 'CHATBOT_AVAILABILITY_INDEX_TTL', 300)
+        if ttl and time.monotonic() - self.built_at > ttl:
+            # Nothing is known to have changed; verify that before reloading
+            rows = list(_load_active_slots())
+            report = self.check_consistency(rows)
+            if any(report.values()):
+                self.drifts += 1
+                counts = ', '.join(f"{len(slot_ids)} {problem}" for problem, slot_ids in report.items())
+                print(f"Venue availability index drifted from the database ({counts} slots)")
+            self.rebuild(rows, generation)
+
+    def count_overlaps(self, venue_id, start, end):
+        """Number of active slots of ``venue_id`` overlapping [start, end]."""
+        with self._lock:
+            self._ensure_fresh()
+            intervals = self._venues.get(venue_id)
+            return intervals.count_overlaps(start, end) if intervals else 0
+
+    def is_available(self, venue_id, start, end):
+        return self.count_overlaps(venue_id, start, end) == 0
+
+    def _discard(self, slot_id):
+        venue_id = self._slot_venues.pop(slot_id, None)
+        if venue_id is not None:
+            self._venues[venue_id].remove(slot_id)
+
+    def _apply(self, slot_ids, rows):
+        """Replace ``slot_ids`` with the active ``rows`` and publish the change."""
+        with self._lock:
+            generation = bump_shared_generation()
+            if self.generation is None or generation != self.generation + 1:
+                # Another process changed bookings since the index was loaded
+                # (the atomic increment skipped its bump); reload on the next query
+                self.generation = None
+                return
+            for slot_id in slot_ids:
+                self._discard(slot_id)
+            for slot_id, venue_id, start, end in rows:
+                self._venues.setdefault(venue_id, VenueIntervals()).add(slot_id, start, end)
+                self._slot_venues[slot_id] = venue_id
+            self.generation = generation
+
+    def refresh_slot(self, slot_id):
+        """Re-read one slot after it was saved or deleted."""
+        self._apply([slot_id], list(_load_active_slots(slot_id=slot_id)))
+
+    def refresh_booking(self, booking_id):
+        """Re-read a booking's slots after its status may have changed."""
+        slot_ids = list(BookingSlot.objects.filter(booking_id=booking_id).values_list('slot_id', flat=True))
+        self._apply(slot_ids, list(_load_active_slots(booking_id=booking_id)))
+
+    def check_consistency(self, rows=None):
+        """Compare the index with the database (or with already loaded ``rows``).
+
+        Returns a dict of slot ids ``missing`` from the index, ``extra`` in
+        the index but not active in the database, and ``mismatched`` (venue
+        or dates differ). All lists are empty when the index is consistent.
+        """
+        if rows is None:
+            rows = _load_active_slots()
+        expected = {slot_id: (venue_id, start, end) for slot_id, venue_id, start, end in rows}
+        with self._lock:
+            indexed = {
+                slot_id: (venue_id, *self._venues[venue_id].slots[slot_id])
+                for slot_id, venue_id in self._slot_venues.items()
+            }
+        return {
+            'missing': sorted(expected.keys() - indexed.keys()),
+            'extra': sorted(indexed.keys() - expected.keys()),
+            'mismatched': sorted(
+                slot_id for slot_id in expected.keys() & indexed.keys()
+                if expected[slot_id] != indexed[slot_id]
+            ),
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                'venues': len(self._venues),
+                'slots': len(self._slot_venues),
+                'generation': self.generation,
+                'rebuilds': self.rebuilds,
+                'drifts': self.drifts,
+            }
+
+
+_venue_interval_index = VenueIntervalIndex()
+
+
+def get_venue_interval_index():
+    return _venue_interval_index
+
+
+def _row_columns(kind, row_id, booking, venue, first_day, last_day, start_time, end_time, full_day):
+    # Every branch of the UNION selects the same columns in the same order
+    return {
+        'row_kind': Value(kind, output_field=models.CharField()),
+        'row_id': row_id,
+        'row_booking': booking,
+        'row_venue': venue,
+        'row_first_day': first_day,
+        'row_last_day': last_day,
+        'row_start_time': start_time,
+        'row_end_time': end_time,
+        'row_full_day': full_day,
+    }
+
+
+def slot_rows(**filters):
+    """Busy rows of active booking slots matching ``filters``."""
+    return BookingSlot.objects.filter(
+        booking__booking_status__in=ACTIVE_BOOKING_STATUSES, **filters
+    ).values(**_row_columns('booking', F('slot_id'), F('booking_id'), F('venue_id'), F('start_date'),
+                            F('end_date'), F('start_time'), F('end_time'), F('isfullday')))
+
+
+def arrangement_rows(**filters):
+    """Busy rows of setup, rehearsal and breakdown windows of active bookings."""
+    return PreArrangement.objects.filter(
+        booking__booking_status__in=ACTIVE_BOOKING_STATUSES, **filters
+    ).values(**_row_columns('arrangement', F('arrangement_id'), F('booking_id'), F('venue_id'), F('date'),
+                            F('date'), F('start_time'), F('end_time'),
+                            Value(False, output_field=models.BooleanField())))
+
+
+def occupancy_rows(venue_ids, start, end):
+    """One UNION ALL query over booked slots, pre-arrangement windows and,
+    when ``venue_ids`` is None, the active venues themselves (and only the
+    slots and windows of active venues)."""
+    slots = slot_rows(start_date__lte=end, end_date__gte=start)
+    arrangements = arrangement_rows(date__gte=start, date__lte=end)
+    if venue_ids is not None:
+        return slots.filter(venue_id__in=venue_ids).union(
+            arrangements.filter(venue_id__in=venue_ids), all=True
+        )
+
+    # Slots of venues taken out of service are not part of "every venue"
+    slots = slots.filter(venue__status='active')
+    arrangements = arrangements.filter(venue__status='active')
+    no_id = Value(None, output_field=models.IntegerField())
+    no_date = Value(None, output_field=models.DateField())
+    no_time = Value(None, output_field=models.TimeField())
+    venues = Venue.objects.filter(status='active').values(**_row_columns(
+        'venue', F('venue_id'), no_id, F('venue_id'), no_date, no_date, no_time, no_time,
+        Value(False, output_field=models.BooleanField()),
+    ))
+    return slots.union(arrangements, venues, all=True)
+
+
+def _hour_range(start_time, end_time, full_day):
+    if full_day:
+        return range(24)
+    first = start_time.hour
+    # A window ending at or before its start runs to midnight
+    if end_time <= start_time:
+        return range(first, 24)
+    last = end_time.hour + (1 if end_time.minute or end_time.second else 0)
+    return range(first, last)
+
+
+def occupancy_matrix(start, end, venue_ids=None):
+    """Hourly occupancy of venues over the days ``start``..``end``.
+
+    Returns ``{venue_id: bytearray}`` with 24 cells per day (FREE,
+    ARRANGEMENT or BOOKED). A multi-day slot occupies its hours on every day
+    it spans. Without ``venue_ids`` every active venue is included. Costs one
+    query.
+    """
+    days = (end - start).days + 1
+    matrix = {venue_id: bytearray(days * 24) for venue_id in venue_ids or ()}
+    for row in occupancy_rows(venue_ids, start, end):
+        cells = matrix.setdefault(row['row_venue'], bytearray(days * 24))
+        if row['row_kind'] == 'venue':
+            continue
+        code = BOOKED if row['row_kind'] == 'booking' else ARRANGEMENT
+        hours = _hour_range(row['row_start_time'], row['row_end_time'], row['row_full_day'])
+        first_day = max(row['row_first_day'], start)
+        last_day = min(row['row_last_day'], end)
+        for offset in range((first_day - start).days, (last_day - start).days + 1):
+            base = offset * 24
+            for hour in hours:
+                if cells[base + hour] < code:
+                    cells[base + hour] = code
+    return matrix
+
+
+def day_range(start, end):
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
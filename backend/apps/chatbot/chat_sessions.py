@@ -0,0 +1,149 @@
+"""
+Chat session resolution and transcript writes for the chat endpoints.
+
+Each caller (signed-in user, the client's ``user_id`` or a guest cookie) has
+their own ChatSession, resolved from the cache, so a warm chat turn issues no
+lookups of its own and no caller sees another's history or summary. The
+user's message is saved before the LLM is called, together with a narrow
+UPDATE of ``updated_at``, so it is kept even when the LLM call fails; the
+reply is a single insert afterwards. With CHATBOT_WRITE_BEHIND enabled both
+writes are handed to the background writer in transcripts.py instead, and
+the reply's id is not known to the request
+(the chat endpoints then return ``message_id: null``).
+"""
+import queue
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from apps.chatbot.models import ArchivedChatSession, ChatSession, ChatMessage
+
+
+GUEST_ID_SESSION_KEY = 'chatbot_guest_id'
+
+SESSION_FIELDS = ('id', 'user_id', 'summary', 'summary_through_id')
+
+
+def _session_cache_key(username):
+    return f'chatbot:session:{username}'
+
+
+def caller_id(request, user_id=None):
+    """Identity the caller's chat sessions are stored under.
+
+    The signed-in user's username; otherwise the ``user_id`` the client sends
+    with its messages; otherwise a guest id kept in the caller's Django
+    session (and so in its session cookie).
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.username
+    if user_id not in (None, ''):
+        return str(user_id)[:100]
+    django_session = getattr(request, 'session', None)
+    if django_session is None:
+        # Nothing to recognise the caller by next time
+        return f'guest-{uuid.uuid4().hex}'
+    return django_session.setdefault(GUEST_ID_SESSION_KEY, f'guest-{uuid.uuid4().hex}')
+
+
+def _owned_session(username, session_id):
+    """``username``'s session ``session_id`` (restored from the archive if
+    needed), or None if it does not exist or belongs to someone else."""
+    from apps.chatbot.archive import rehydrate_session
+
+    session = ChatSession.objects.filter(id=session_id, user_id=username).only(*SESSION_FIELDS).first()
+    if session is None and ArchivedChatSession.objects.filter(session_id=session_id, user_id=username).exists():
+        session = rehydrate_session(session_id)
+    return session
+
+
+def resolve_session(request, data=None):
+    """Return the caller's ChatSession, creating it if needed.
+
+    The caller is identified by ``caller_id``. A ``session_id`` in ``data``
+    selects one of the caller's own sessions; otherwise, or when it names a
+    session of another caller, their latest session is used. The session is
+    cached per caller, so a warm chat turn issues no lookups of its own.
+    """
+    data = data or {}
+    username = caller_id(request, data.get('user_id'))
+    try:
+        session_id = int(data['session_id']) if data.get('session_id') not in (None, '') else None
+    except (TypeError, ValueError):
+        session_id = None
+
+    key = _session_cache_key(username)
+    session = cache.get(key)
+    if session is not None and session_id in (None, session.id):
+        return session
+    session = (
+        (_owned_session(username, session_id) if session_id is not None else None)
+        or ChatSession.objects.filter(user_id=username).only(*SESSION_FIELDS).order_by('-updated_at').first()
+        or ChatSession.objects.create(user_id=username)
+    )
+    cache.set(key, session, timeout=getattr(settings, 'CHATBOT_SESSION_CACHE_TIMEOUT', 3600))
+    return session
+
+
+def forget_session(username):
+    """Drop a cached session, e.g. after its summary changed or it was removed."""
+    cache.delete(_session_cache_key(username))
+
+
+def _write_behind():
+    return getattr(settings, 'CHATBOT_WRITE_BEHIND', False)
+
+
+def _queued(session, sender_type, content):
+    # user_id lets the writer recreate a session deleted before the flush
+    return {'session_id': session.id, 'user_id': session.user_id, 'sender_type': sender_type, 'content': content}
+
+
+def _enqueue(message):
+    """Queue one message for the background writer; False if the queue is full."""
+    from apps.chatbot.transcripts import get_transcript_writer
+
+    try:
+        get_transcript_writer().enqueue([message])
+    except queue.Full:
+        print("Chat transcript queue full, writing message synchronously")
+        return False
+    return True
+
+
+def record_user_message(session, content):
+    """Persist the user's message and bump the session's ``updated_at``.
+
+    Call before the LLM so the message survives a failed completion. Returns
+    the session, which differs from the one passed in only if the cached
+    session no longer existed and a new one had to be created.
+    """
+    if _write_behind() and _enqueue(_queued(session, 'user', content)):
+        return session
+    with transaction.atomic():
+        updated = ChatSession.objects.filter(id=session.id).update(updated_at=timezone.now())
+        if not updated:
+            forget_session(session.user_id)
+            session = ChatSession.objects.create(user_id=session.user_id)
+            cache.set(
+                _session_cache_key(session.user_id),
+                session,
+                timeout=getattr(settings, 'CHATBOT_SESSION_CACHE_TIMEOUT', 3600),
+            )
+        ChatMessage.objects.create(session_id=session.id, sender_type='user', content=content)
+    return session
+
+
+def record_reply(session, content):
+    """Persist the bot's reply to the message saved by ``record_user_message``.
+
+    Returns the ChatMessage, or None when it was queued for the write-behind
+    writer and has no id yet.
+    """
+    if _write_behind() and _enqueue(_queued(session, 'admin', content)):
+        return None
+    return ChatMessage.objects.create(session_id=session.id, sender_type='admin', content=content)
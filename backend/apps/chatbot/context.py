@@ -0,0 +1,176 @@
+"""
+Precomputed database context for the chatbot prompt.
+
+The catalog data the chatbot quotes (venues, pricing, capacities, services,
+JTCC information and contact details) changes only a few times a day, so the
+rendered text blocks are built once, kept in the cache and rebuilt only when
+one of the source models is saved or deleted (see signals.py).
+"""
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from apps.chatbot.models import Venue, PriceTier, AdditionalService, JTCCHistory, Contact
+
+CONTEXT_SNAPSHOT_CACHE_KEY = 'chatbot:context_snapshot'
+
+CONTEXT_TOPICS = ('venues', 'pricing', 'capacity', 'services', 'about', 'contact')
+
+# Words in venue names too generic to identify a venue on their own
+GENERIC_VENUE_WORDS = frozenset({'main', 'hall', 'room', 'open', 'centre', 'center', 'venue', 'space', 'the'})
+
+
+def _load_active_venues():
+    """Load active venues with their price tiers in two queries."""
+    tiers = PriceTier.objects.order_by('duration')
+    return list(
+        Venue.objects.filter(status='active').prefetch_related(
+            Prefetch('price_tiers', queryset=tiers, to_attr='ordered_price_tiers')
+        )
+    )
+
+
+def _render_venues_block(venues):
+    lines = []
+    if venues:
+        lines.append("🏛️ Available Venues at JTCC:")
+        for venue in venues:
+            lines.append(f"\n📍 {venue.venue_name}")
+            lines.append(f"   Capacity: {venue.capacity} people")
+            lines.append(f"   Description: {venue.description[:200]}...")
+
+            # Pricing for this venue (prefetched)
+            if venue.ordered_price_tiers:
+                lines.append("   💰 Pricing:")
+                for tier in venue.ordered_price_tiers:
+                    lines.append(f"      {tier.duration}h: LKR {tier.price:,.2f}")
+    else:
+        lines.append("No venues currently available.")
+    return "\n".join(lines)
+
+
+def _render_pricing_block(venues):
+    lines = []
+    if venues:
+        lines.append("💰 Venue Pricing:")
+        for venue in venues:
+            lines.append(f"\n📍 {venue.venue_name}:")
+            for tier in venue.ordered_price_tiers:
+                lines.append(f"   {tier.duration}h: LKR {tier.price:,.2f}")
+    return "\n".join(lines)
+
+
+def _render_capacity_block(venues):
+    lines = []
+    if venues:
+        lines.append("👥 Venue Capacities:")
+        for venue in sorted(venues, key=lambda venue: venue.capacity):
+            lines.append(f"- {venue.venue_name}: {venue.capacity} people")
+    return "\n".join(lines)
+
+
+def _render_services_block():
+    lines = []
+    services = AdditionalService.objects.all()
+    if services.exists():
+        lines.append("🔧 Additional Services:")
+        for service in services:
+            mandatory = " (Required)" if service.is_mandatory else ""
+            lines.append(f"- {service.service_name}{mandatory}: LKR {service.basic_rate:,.2f} + LKR {service.extra_hourly_rate:,.2f}/hour")
+    return "\n".join(lines)
+
+
+def _render_about_block():
+    lines = []
+    jtcc_info = JTCCHistory.objects.first()
+    if jtcc_info:
+        lines.append("🏛️ About JTCC:")
+        lines.append(f"Official Name: {jtcc_info.official_name}")
+        lines.append(f"Location: {jtcc_info.location}")
+        lines.append(f"Description: {jtcc_info.description[:300]}...")
+        lines.append(f"Facilities: {jtcc_info.facilities}")
+    return "\n".join(lines)
+
+
+def _render_contact_block():
+    lines = []
+    contact = Contact.objects.first()
+    if contact:
+        lines.append("📞 Contact Information:")
+        lines.append(f"Phone: {contact.phone_number}")
+        lines.append(f"Email: {contact.email}")
+        lines.append(f"Available: {contact.available_time}")
+    return "\n".join(lines)
+
+
+def build_context_snapshot():
+    """Render every topic block from the database.
+
+    Returns a dict with the rendered ``blocks`` keyed by topic, the active
+    ``venues`` as ``(venue_id, venue_name)`` pairs and a ``version`` hash of
+    the blocks, which changes whenever the rendered catalog does.
+    """
+    # Venues, pricing and capacity share one grouped load of venues and tiers
+    venues = _load_active_venues()
+    blocks = {
+        'venues': _render_venues_block(venues),
+        'pricing': _render_pricing_block(venues),
+        'capacity': _render_capacity_block(venues),
+        'services': _render_services_block(),
+        'about': _render_about_block(),
+        'contact': _render_contact_block(),
+    }
+    digest = hashlib.sha1()
+    for topic in CONTEXT_TOPICS:
+        digest.update(topic.encode('utf-8'))
+        digest.update(blocks[topic].encode('utf-8'))
+    return {
+        'version': digest.hexdigest()[:12],
+        'blocks': blocks,
+        'venues': [(venue.venue_id, venue.venue_name) for venue in venues],
+    }
+
+
+def get_context_snapshot():
+    """Return the cached context snapshot, building it on first use."""
+    snapshot = cache.get(CONTEXT_SNAPSHOT_CACHE_KEY)
+    if snapshot is None:
+        snapshot = build_context_snapshot()
+        cache.set(
+            CONTEXT_SNAPSHOT_CACHE_KEY,
+            snapshot,
+            timeout=getattr(settings, 'CHATBOT_CONTEXT_CACHE_TIMEOUT', None),
+        )
+    return snapshot
+
+
+def mentioned_venue_ids(message):
+    """Ids of active venues ``message`` names, by full name or a distinctive word."""
+    text = message.lower()
+    matched = []
+    for venue_id, name in get_context_snapshot().get('venues', ()):
+        name = name.lower()
+        words = [word for word in re.findall(r'[a-z]+', name) if word not in GENERIC_VENUE_WORDS]
+        if name in text or any(re.search(rf'\b{word}\b', text) for word in words):
+            matched.append(venue_id)
+    return matched
+
+
+def venue_name_words():
+    """Every word that occurs in an active venue name."""
+    return {
+        word for _, name in get_context_snapshot().get('venues', ())
+        for word in re.findall(r'[a-z]+', name.lower())
+    }
+
+
+def invalidate_context_snapshot(**kwargs):
+    """Drop the cached snapshot so the next chat turn rebuilds it.
+
+    Accepts and ignores signal keyword arguments so it can be connected
+    directly as a post_save/post_delete receiver.
+    """
+    cache.delete(CONTEXT_SNAPSHOT_CACHE_KEY)
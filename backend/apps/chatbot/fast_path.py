@@ -0,0 +1,134 @@
+"""
+Local answers for chatbot turns that do not need the LLM.
+
+Greetings, help, contact details, the venue list, capacities, prices,
+services and the centre's description are fully answered by the database
+context snapshot, so those turns are served from the local templates without
+calling OpenRouter. Each turn gets a confidence score from its intents and
+from how much of the message the intent keywords explain; only turns scoring
+at least CHATBOT_FAST_PATH_THRESHOLD take the fast path and everything else
+(open-ended, multi-topic, dated or numeric questions) goes to the LLM. The
+local answers cover every venue at once, so data questions that name one
+venue go to the LLM as well.
+"""
+import threading
+from collections import Counter
+
+from django.conf import settings
+
+from apps.chatbot.context import mentioned_venue_ids
+from apps.chatbot.intents import uncovered_words
+
+
+# Intents answerable from the snapshot, with the context block each needs
+# (None for intents that are answered without data)
+FAST_PATH_INTENTS = {
+    'greeting': None,
+    'help': None,
+    'contact': 'contact',
+    'venue': 'venues',
+    'capacity': 'capacity',
+    'pricing': 'pricing',
+    'services': 'services',
+    'about': 'about',
+}
+
+# Intents that only frame a question ("hi, what are your prices?")
+FRAMING_INTENTS = frozenset({'greeting', 'help'})
+
+# Intents that are usually the subject of a more specific question ("what is
+# the capacity of your halls?"); dropped in this order while other topics remain
+SUBJECT_INTENTS = ('about', 'venue')
+
+# Words that ask for reasoning rather than a lookup
+OPEN_ENDED_WORDS = frozenset("""
+    why best better recommend recommendation suggest suggestion compare comparison difference
+    should suitable ideal plan planning idea ideas explain cheapest largest smallest biggest
+    between versus vs if
+""".split())
+
+TURN_PATHS = ['fast_path', 'cache', 'llm', 'fallback']
+
+
+def score_turn(message, intents, blocks, conversation_history=None):
+    """Return ``(confidence, intent)`` for answering ``message`` locally.
+
+    ``intent`` is the intent the local answer would be built for, or None
+    (with confidence 0) when the turn must go to the LLM.
+    """
+    if not intents or not intents <= FAST_PATH_INTENTS.keys():
+        return 0.0, None
+
+    topics = intents - FRAMING_INTENTS or intents
+    for subject in SUBJECT_INTENTS:
+        if len(topics) > 1:
+            topics = topics - {subject}
+    if len(topics) > 1:
+        # Several topics in one message need the LLM to combine them
+        return 0.0, None
+    intent = next(iter(topics))
+    block = FAST_PATH_INTENTS[intent]
+    if block is not None and not blocks.get(block):
+        return 0.0, None
+    if block is not None and mentioned_venue_ids(message):
+        # "What is the price of the auditorium?" wants that venue, not the list
+        return 0.0, None
+
+    content_words, uncovered = uncovered_words(message)
+    if not content_words:
+        return 0.0, None
+    confidence = 1 - len(uncovered) / content_words
+    if any(word in OPEN_ENDED_WORDS for word in uncovered):
+        confidence *= 0.3
+    if any(char.isdigit() for char in message):
+        # Dates, times and guest counts need reasoning over the data
+        confidence *= 0.5
+    if conversation_history:
+        # Follow-ups may lean on earlier turns
+        confidence *= 0.8
+    return confidence, intent
+
+
+class TurnStats:
+    """Counts of chat turns by the path that answered them."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.paths = Counter()
+        self.fast_path_intents = Counter()
+
+    def record(self, path, intent=None):
+        with self._lock:
+            self.paths[path] += 1
+            if intent is not None:
+                self.fast_path_intents[intent] += 1
+
+    def stats(self):
+        with self._lock:
+            total = sum(self.paths.values())
+            return {
+                'turns': {path: self.paths[path] for path in TURN_PATHS},
+                'fast_path_intents': dict(self.fast_path_intents),
+                'local_ratio': (self.paths['fast_path'] / total) if total else 0.0,
+            }
+
+
+_turn_stats = TurnStats()
+
+
+def get_turn_stats():
+    return _turn_stats
+
+
+def record_turn_path(path, intent=None):
+    _turn_stats.record(path, intent)
+
+
+def fast_path_intent(message, intents, blocks, conversation_history=None):
+    """Intent to answer ``message`` locally for, or None to use the LLM."""
+    if not getattr(settings, 'CHATBOT_FAST_PATH', True):
+        return None
+    confidence, intent = score_turn(message, intents, blocks, conversation_history)
+    if confidence < getattr(settings, 'CHATBOT_FAST_PATH_THRESHOLD', 0.75):
+        return None
+    return intent
@@ -0,0 +1,73 @@
+"""
+Conversation history for chatbot prompts.
+
+Only the most recent messages of a session are loaded (one query, newest
+first, limited in SQL) and they are trimmed to a token budget so the prompt
+stays bounded however long the session grows. Older messages are represented
+by the session's rolling summary (see summaries.py). Sessions belong to a
+single caller (chat_sessions.resolve_session), so a prompt only ever carries
+that caller's own turns and summary.
+"""
+from django.conf import settings
+
+from apps.chatbot.models import ChatMessage
+
+
+# ChatMessage.sender_type -> chat-completions role
+SENDER_ROLES = {
+    'user': 'user',
+    'admin': 'assistant',
+}
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token for English text)."""
+    return max(1, (len(text) + 3) // 4)
+
+
+def trim_to_token_budget(turns, token_budget):
+    """Keep the newest turns whose combined estimate fits in ``token_budget``.
+
+    ``turns`` is oldest-first; the result keeps that order.
+    """
+    kept = []
+    used = 0
+    for turn in reversed(turns):
+        cost = estimate_tokens(turn['content'])
+        if used + cost > token_budget:
+            break
+        kept.append(turn)
+        used += cost
+    kept.reverse()
+    return kept
+
+
+def load_conversation_history(session, max_messages=None, token_budget=None):
+    """Return the session summary and recent turns as chat-completions messages.
+
+    Messages already folded into ``session.summary`` are skipped, so the
+    prompt is the running summary plus the newest turns after it.
+    """
+    if max_messages is None:
+        max_messages = getattr(settings, 'CHATBOT_HISTORY_MAX_MESSAGES', 10)
+    if token_budget is None:
+        token_budget = getattr(settings, 'CHATBOT_HISTORY_TOKEN_BUDGET', 1500)
+    if not max_messages or not token_budget:
+        return []
+
+    history = []
+    if session.summary:
+        # Never let the summary take more than half the budget
+        summary = session.summary[-(token_budget // 2) * 4:]
+        history.append({'role': 'system', 'content': f"Summary of the earlier conversation:\n{summary}"})
+        token_budget -= estimate_tokens(history[0]['content'])
+
+    rows = ChatMessage.objects.filter(session_id=session.id, sender_type__in=SENDER_ROLES)
+    if session.summary_through_id:
+        rows = rows.filter(id__gt=session.summary_through_id)
+    rows = rows.order_by('-created_at', '-id').values_list('sender_type', 'content')[:max_messages]
+    turns = [
+        {'role': SENDER_ROLES[sender_type], 'content': content}
+        for sender_type, content in reversed(list(rows))
+    ]
+    return history + trim_to_token_budget(turns, token_budget)
@@ -0,0 +1,143 @@
+"""
+Keyword intent detection for chatbot messages.
+
+All intent vocabularies are compiled into a single regular expression, so a
+message is scanned once no matter how many keywords are registered. The set
+of matched intents is shared by the prompt context builder and the local
+fallback responses. Generic verbs and question words ("list", "what is") are
+deliberately not keywords: they say nothing about the topic, and the fallback
+answers the first matching intent, so they would shadow the real one.
+"""
+import re
+
+
+INTENT_KEYWORDS = {
+    'venue': [
+        'venue', 'venues', 'space', 'spaces', 'hall', 'halls', 'room', 'rooms',
+        'auditorium', 'auditoriums', 'conference', 'amphitheatre', 'amphitheater',
+        'library', 'exhibition', 'exhibitions',
+    ],
+    'booking': [
+        'book', 'books', 'booked', 'booking', 'bookings', 'reserve', 'reserved',
+        'reservation', 'reservations', 'schedule', 'scheduled',
+    ],
+    'pricing': [
+        'price', 'prices', 'cost', 'costs', 'rate', 'rates', 'fee', 'fees', 'pricing',
+        'how much', 'expensive', 'cheap',
+    ],
+    'availability': ['availability', 'available', 'free', 'open', 'when'],
+    'capacity': [
+        'capacity', 'capacities', 'people', 'size', 'large', 'small', 'how many',
+        'accommodate',
+    ],
+    'services': [
+        'service', 'services', 'amenities', 'amenity', 'sound', 'lighting', 'catering',
+        'security', 'cleaning', 'include', 'includes',
+    ],
+    'about': ['jtcc', 'centre', 'center', 'about', 'information', 'history'],
+    'contact': ['contact', 'phone', 'email', 'call', 'reach', 'speak', 'talk'],
+    'greeting': [
+        'hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening',
+        'vanakkam', 'வணக்கம்', 'ayubowan', 'ආයුබෝවන්',
+    ],
+    'help': ['help', 'what can you do', 'assist', 'support'],
+}
+
+
+def _normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def _keyword_pattern(keyword):
+    pattern = r'\s+'.join(re.escape(part) for part in keyword.split())
+    # Latin keywords must match whole words ("hi" must not match "this").
+    # Tamil and Sinhala words contain combining vowel signs that \b treats as
+    # word breaks, so those keywords are matched as plain substrings.
+    if keyword.isascii():
+        pattern = rf'(?<![a-z0-9_]){pattern}(?![a-z0-9_])'
+    return pattern
+
+
+def _compile(intent_keywords):
+    keyword_intents = {}
+    for intent, keywords in intent_keywords.items():
+        for keyword in keywords:
+            keyword_intents.setdefault(_normalize(keyword), set()).add(intent)
+
+    # Longest first so multi-word phrases win over their first word
+    keywords = sorted(keyword_intents, key=len, reverse=True)
+    pattern = re.compile('|'.join(_keyword_pattern(keyword) for keyword in keywords))
+    return pattern, {keyword: frozenset(intents) for keyword, intents in keyword_intents.items()}
+
+
+_INTENT_PATTERN, _KEYWORD_INTENTS = _compile(INTENT_KEYWORDS)
+
+
+def detect_intents(message):
+    """Return the frozenset of intents whose keywords occur in ``message``."""
+    intents = set()
+    for match in _INTENT_PATTERN.finditer(message.lower()):
+        intents |= _KEYWORD_INTENTS[_normalize(match.group(0))]
+    return frozenset(intents)
+
+
+# Words that carry no topic of their own; they neither need a keyword match
+# nor make a message open-ended
+STOPWORDS = frozenset("""
+    a an the is are am be do does did you your yours we our us i me my it its this that these those
+    there here what what's whats which tell show give list please can could would will of for at in
+    on to and or any all some have has with get know want like let let's thanks thank ok okay now
+    currently how number numbers details detail info so jaffna thiruvalluvar cultural
+""".split())
+
+_WORD_PATTERN = re.compile(r'\S+')
+_WORD_PUNCTUATION = '.,!?;:()[]"\'`'
+
+
+def uncovered_words(message):
+    """Return ``(content_words, uncovered)`` for ``message``.
+
+    ``content_words`` counts the words that are not stopwords and
+    ``uncovered`` lists those that are not part of any intent keyword, i.e.
+    what the intents do not explain.
+    """
+    text = message.lower()
+    spans = [match.span() for match in _INTENT_PATTERN.finditer(text)]
+    content_words = 0
+    uncovered = []
+    for match in _WORD_PATTERN.finditer(text):
+        word = match.group(0).strip(_WORD_PUNCTUATION)
+        if not word or word in STOPWORDS:
+            continue
+        content_words += 1
+        start, end = match.span()
+        if not any(span_start < end and start < span_end for span_start, span_end in spans):
+            uncovered.append(word)
+    return content_words, uncovered
+
+
+# Intents whose keywords are interchangeable ("price", "cost", "how much");
+# venue and service keywords name different things and are kept as they are
+SYNONYM_INTENTS = frozenset({
+    'booking', 'pricing', 'availability', 'capacity', 'about', 'contact', 'greeting', 'help',
+})
+
+
+def canonical_words(message):
+    """Content words of ``message`` with synonym keywords replaced by their
+    intent, so paraphrases ("price" / "how much ... cost") converge."""
+    text = message.lower()
+    words = []
+    for match in _INTENT_PATTERN.finditer(text):
+        keyword = _normalize(match.group(0))
+        intents = _KEYWORD_INTENTS[keyword]
+        if intents <= SYNONYM_INTENTS:
+            words.extend(sorted(intents))
+        else:
+            words.append(keyword.replace(' ', '_'))
+    text = _INTENT_PATTERN.sub(' ', text)
+    for match in _WORD_PATTERN.finditer(text):
+        word = match.group(0).strip(_WORD_PUNCTUATION)
+        if word and word not in STOPWORDS:
+            words.append(word)
+    return words
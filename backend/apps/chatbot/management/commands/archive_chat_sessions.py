@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.chatbot.archive import archive_idle_sessions
+
+
+class Command(BaseCommand):
+    help = 'Move chat sessions idle past a threshold into compressed archive segments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--idle-days',
+            type=int,
+            default=getattr(settings, 'CHATBOT_ARCHIVE_IDLE_DAYS', 90),
+            help='Archive sessions not updated for this many days',
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Sessions per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many sessions would be archived')
+
+    def handle(self, *args, **options):
+        count = archive_idle_sessions(
+            idle_days=options['idle_days'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+        if options['dry_run']:
+            self.stdout.write(f"{count} sessions would be archived")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Archived {count} sessions"))
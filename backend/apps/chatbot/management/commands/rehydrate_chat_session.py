@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.chatbot.archive import rehydrate_session
+
+
+class Command(BaseCommand):
+    help = 'Restore archived chat sessions into the live tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('session_ids', nargs='+', type=int, help='Archived session ids')
+
+    def handle(self, *args, **options):
+        for session_id in options['session_ids']:
+            session = rehydrate_session(session_id)
+            if session is None:
+                raise CommandError(f"Session {session_id} is not archived")
+            self.stdout.write(self.style.SUCCESS(f"Rehydrated session {session_id}"))
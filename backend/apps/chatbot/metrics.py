@@ -0,0 +1,126 @@
+"""
+Prometheus text-format metrics for the chatbot.
+
+Served by the ``metrics/`` endpoint. Values are per worker process; scrape
+every worker (or aggregate with a sidecar) when running several.
+"""
+from apps.chatbot.availability import get_venue_interval_index
+from apps.chatbot.occupancy import get_occupancy_calendar
+from apps.chatbot.fast_path import TURN_PATHS, get_turn_stats
+from apps.chatbot.resilience import STATES
+from apps.chatbot.response_cache import get_response_cache
+from apps.chatbot.routing import get_latency_tracker
+from apps.chatbot.semantic_cache import get_semantic_cache
+from apps.chatbot.timing import STAGES, get_stage_histograms
+
+
+def _line(name, value, labels=None):
+    if labels:
+        label_text = ','.join(f'{key}="{val}"' for key, val in sorted(labels.items()))
+        return f"{name}{{{label_text}}} {value}"
+    return f"{name} {value}"
+
+
+def _metric(lines, name, metric_type, help_text, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {metric_type}")
+    for labels, value in samples:
+        lines.append(_line(name, value, labels))
+
+
+def _histogram(lines, name, help_text, label, histograms):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for key, (buckets, counts, count, total) in histograms:
+        for bound, bucket_count in zip(buckets, counts):
+            lines.append(_line(f"{name}_bucket", bucket_count, {label: key, 'le': bound}))
+        lines.append(_line(f"{name}_bucket", count, {label: key, 'le': '+Inf'}))
+        lines.append(_line(f"{name}_sum", round(total, 6), {label: key}))
+        lines.append(_line(f"{name}_count", count, {label: key}))
+
+
+def _breaker_metrics(lines):
+    from apps.chatbot.services import get_openrouter_breaker
+
+    stats = get_openrouter_breaker().stats()
+    upstream = {'upstream': 'openrouter'}
+    _metric(lines, 'chatbot_circuit_state', 'gauge',
+            'Circuit breaker state (1 for the current state)',
+            [({**upstream, 'state': state}, int(stats['state'] == state)) for state in STATES])
+    _metric(lines, 'chatbot_upstream_requests_total', 'counter',
+            'Upstream LLM call attempts by outcome',
+            [({**upstream, 'outcome': 'success'}, stats['successes']),
+             ({**upstream, 'outcome': 'failure'}, stats['failures'])])
+    _metric(lines, 'chatbot_circuit_rejected_total', 'counter',
+            'Calls answered locally because the circuit was open',
+            [(upstream, stats['rejected'])])
+    _metric(lines, 'chatbot_circuit_trips_total', 'counter',
+            'Times the circuit breaker opened',
+            [(upstream, stats['trips'])])
+
+
+def _hedge_metrics(lines):
+    stats = get_latency_tracker().stats()
+    _metric(lines, 'chatbot_hedged_requests_total', 'counter',
+            'Completions raced against the hedge model', [(None, stats['hedges'])])
+    _metric(lines, 'chatbot_hedge_wins_total', 'counter',
+            'Hedged completions won by the hedge model', [(None, stats['hedge_wins'])])
+
+
+def _turn_metrics(lines):
+    stats = get_turn_stats().stats()
+    _metric(lines, 'chatbot_turns_total', 'counter',
+            'Chat turns by what answered them (fast_path and fallback are local)',
+            [({'path': path}, stats['turns'][path]) for path in TURN_PATHS])
+    _metric(lines, 'chatbot_fast_path_turns_total', 'counter',
+            'Chat turns answered locally without the LLM, by intent',
+            [({'intent': intent}, count) for intent, count in sorted(stats['fast_path_intents'].items())])
+    _metric(lines, 'chatbot_fast_path_ratio', 'gauge',
+            'Fraction of chat turns answered by the local fast path',
+            [(None, round(stats['local_ratio'], 4))])
+
+
+def _stage_metrics(lines):
+    histograms = get_stage_histograms().snapshot()
+    _histogram(lines, 'chatbot_request_stage_seconds',
+               'Time spent in each stage of a chat request (llm_ttfb is time to first byte from the LLM)',
+               'stage', [(name, histograms[name]) for name in STAGES if name in histograms])
+
+
+def _availability_metrics(lines):
+    stats = get_venue_interval_index().stats()
+    _metric(lines, 'chatbot_availability_index_slots', 'gauge',
+            'Active booking slots held by the venue availability index', [(None, stats['slots'])])
+    _metric(lines, 'chatbot_availability_index_rebuilds_total', 'counter',
+            'Full reloads of the venue availability index', [(None, stats['rebuilds'])])
+    _metric(lines, 'chatbot_availability_index_drift_total', 'counter',
+            'Reloads that found the index out of step with the database', [(None, stats['drifts'])])
+    stats = get_occupancy_calendar().stats()
+    _metric(lines, 'chatbot_occupancy_calendar_bytes', 'gauge',
+            'Memory held by the half-hour occupancy calendar', [(None, stats['bytes'])])
+    _metric(lines, 'chatbot_occupancy_calendar_rebuilds_total', 'counter',
+            'Full reloads of the occupancy calendar', [(None, stats['rebuilds'])])
+
+
+def _cache_metrics(lines):
+    caches = [('exact', get_response_cache().stats())]
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is not None:
+        caches.append(('semantic', semantic_cache.stats()))
+    _metric(lines, 'chatbot_response_cache_entries', 'gauge', 'Live entries in the answer caches',
+            [({'cache': name}, stats['entries']) for name, stats in caches])
+    _metric(lines, 'chatbot_response_cache_lookups_total', 'counter', 'Answer cache lookups by result',
+            [({'cache': name, 'result': result}, stats[key])
+             for name, stats in caches for result, key in (('hit', 'hits'), ('miss', 'misses'))])
+
+
+def render_metrics():
+    """Return all chatbot metrics in the Prometheus text exposition format."""
+    lines = []
+    _breaker_metrics(lines)
+    _hedge_metrics(lines)
+    _turn_metrics(lines)
+    _stage_metrics(lines)
+    _availability_metrics(lines)
+    _cache_metrics(lines)
+    return '\n'.join(lines) + '\n'
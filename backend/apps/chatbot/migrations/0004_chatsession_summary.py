@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 06:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chatbot", "0003_additionalservice_contact_jtccfacility_jtccfunder_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatsession",
+            name="summary",
+            field=models.TextField(
+                blank=True, default="", help_text="Running summary of older messages"
+            ),
+        ),
+        migrations.AddField(
+            model_name="chatsession",
+            name="summary_through_id",
+            field=models.IntegerField(
+                blank=True,
+                help_text="Last ChatMessage id folded into the summary",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-18 06:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chatbot", "0004_chatsession_summary"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="chatmessage",
+            index=models.Index(
+                fields=["session", "created_at"], name="chatbot_mes_session_abe896_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chatsession",
+            index=models.Index(
+                fields=["user_id", "updated_at"], name="chatbot_ses_user_id_f6e74a_idx"
+            ),
+        ),
+    ]
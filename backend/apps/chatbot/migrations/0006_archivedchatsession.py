@@ -0,0 +1,52 @@
+# Generated by Django 5.2.5 on 2026-10-18 06:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chatbot", "0005_chat_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedChatSession",
+            fields=[
+                ("session_id", models.IntegerField(primary_key=True, serialize=False)),
+                ("user_id", models.CharField(max_length=100)),
+                ("created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+                ("message_count", models.IntegerField(default=0)),
+                (
+                    "segment",
+                    models.CharField(
+                        help_text="Segment file name inside CHATBOT_ARCHIVE_DIR",
+                        max_length=255,
+                    ),
+                ),
+                (
+                    "offset",
+                    models.BigIntegerField(
+                        help_text="Byte offset of the session's gzip member in the segment"
+                    ),
+                ),
+                (
+                    "length",
+                    models.BigIntegerField(
+                        help_text="Byte length of the session's gzip member"
+                    ),
+                ),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "db_table": "chatbot_archived_sessions",
+                "ordering": ["-updated_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["user_id", "updated_at"],
+                        name="chatbot_arc_user_id_08e7c8_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -9,10 +9,15 @@ class ChatSession(models.Model):
     user_id = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    summary = models.TextField(blank=True, default='', help_text="Running summary of older messages")
+    summary_through_id = models.IntegerField(null=True, blank=True, help_text="Last ChatMessage id folded into the summary")
     
     class Meta:
         db_table = 'chatbot_sessions'
         ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['user_id', 'updated_at']),
+        ]
     
     def __str__(self):
         return f"Session {self.id} - User {self.user_id}"
@@ -33,11 +38,37 @@ class ChatMessage(models.Model):
     class Meta:
         db_table = 'chatbot_messages_new'
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['session', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.sender_type}: {self.content[:50]}..."
 
 
+class ArchivedChatSession(models.Model):
+    """Index of a chat session moved out of the hot tables into a segment file"""
+    session_id = models.IntegerField(primary_key=True)
+    user_id = models.CharField(max_length=100)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    message_count = models.IntegerField(default=0)
+    segment = models.CharField(max_length=255, help_text="Segment file name inside CHATBOT_ARCHIVE_DIR")
+    offset = models.BigIntegerField(help_text="Byte offset of the session's gzip member in the segment")
+    length = models.BigIntegerField(help_text="Byte length of the session's gzip member")
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'chatbot_archived_sessions'
+        ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['user_id', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"Archived session {self.session_id} - User {self.user_id}"
+
+
 class ChatbotMessage(models.Model):
     """Chat message model matching existing chatbot_messages table."""
     SENDER_TYPE_CHOICES = [
@@ -0,0 +1,218 @@
+"""
+Precomputed occupancy calendar of every venue in 30-minute buckets.
+
+Each venue has a NumPy array of shape (2, days, 48): per day and half-hour
+bucket, how many booked slots (plane 0) and how many setup, rehearsal or
+breakdown windows (plane 1) cover it. Counts rather than bits let a change be
+applied by subtracting the row's old buckets and adding its new ones, even
+when rows overlap; the occupancy bitmaps are ``counts > 0``. Utilization and
+occupancy questions over whole months are then vectorized array operations
+instead of SQL range scans.
+
+The calendar covers a rolling horizon of CHATBOT_OCCUPANCY_PAST_DAYS before
+today to CHATBOT_OCCUPANCY_FUTURE_DAYS after it, so memory stays at
+venues * days * 192 bytes (about 75 KB per venue for the default year). It is
+built from the database (one query) on first use in each worker process,
+again when the day rolls over, whenever another process has published a
+change (a generation counter in the default cache, like the availability
+index) and at the latest CHATBOT_OCCUPANCY_TTL seconds after the last build.
+The generation only reaches other workers through a shared cache backend;
+with the per-process LocMemCache the TTL bounds how stale they can be.
+Changes made in this process are applied incrementally from model signals
+after the transaction commits.
+"""
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from apps.chatbot.availability import (
+    arrangement_rows, bump_shared_generation, occupancy_rows, shared_generation, slot_rows,
+)
+
+
+BUCKET_MINUTES = 30
+BUCKETS_PER_DAY = 24 * 60 // BUCKET_MINUTES
+
+BOOKED_PLANE, ARRANGEMENT_PLANE = 0, 1
+
+GENERATION_CACHE_KEY = 'chatbot:occupancy_calendar_generation'
+
+
+def _bucket_range(row):
+    """First and last (exclusive) half-hour bucket a busy row covers each day."""
+    if row['row_full_day']:
+        return 0, BUCKETS_PER_DAY
+    start = row['row_start_time']
+    end = row['row_end_time']
+    first = (start.hour * 60 + start.minute) // BUCKET_MINUTES
+    # A window ending at or before its start runs to midnight
+    if end <= start:
+        return first, BUCKETS_PER_DAY
+    return first, -(-(end.hour * 60 + end.minute) // BUCKET_MINUTES)
+
+
+class OccupancyCalendar:
+    """Per-venue half-hour occupancy counts over a rolling horizon."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._venues = {}
+        self._rows = {}
+        self.origin = None
+        self.days = 0
+        self.generation = None
+        self.built_at = 0.0
+        self.rebuilds = 0
+
+    def _horizon(self):
+        today = timezone.localdate()
+        origin = today - timedelta(days=getattr(settings, 'CHATBOT_OCCUPANCY_PAST_DAYS', 31))
+        days = (today - origin).days + getattr(settings, 'CHATBOT_OCCUPANCY_FUTURE_DAYS', 366)
+        return origin, days
+
+    def _empty(self):
+        return np.zeros((2, self.days, BUCKETS_PER_DAY), dtype=np.uint16)
+
+    def _add(self, key, row, sign):
+        """Add (sign 1) or remove (sign -1) one busy row's buckets."""
+        first_day = max((row['row_first_day'] - self.origin).days, 0)
+        last_day = min((row['row_last_day'] - self.origin).days, self.days - 1)
+        if first_day > last_day:
+            return
+        venue = self._venues.get(row['row_venue'])
+        if venue is None:
+            venue = self._venues[row['row_venue']] = self._empty()
+        plane = BOOKED_PLANE if row['row_kind'] == 'booking' else ARRANGEMENT_PLANE
+        first, last = _bucket_range(row)
+        if sign > 0:
+            venue[plane, first_day:last_day + 1, first:last] += 1
+            self._rows[key] = row
+        else:
+            venue[plane, first_day:last_day + 1, first:last] -= 1
+            self._rows.pop(key, None)
+
+    def rebuild(self):
+        with self._lock:
+            generation = shared_generation(GENERATION_CACHE_KEY)
+            self.origin, self.days = self._horizon()
+            self._venues = {}
+            self._rows = {}
+            last_day = self.origin + timedelta(days=self.days - 1)
+            for row in occupancy_rows(None, self.origin, last_day):
+                if row['row_kind'] == 'venue':
+                    self._venues.setdefault(row['row_venue'], self._empty())
+                else:
+                    self._add((row['row_kind'], row['row_id']), row, 1)
+            self.generation = generation
+            self.built_at = time.monotonic()
+            self.rebuilds += 1
+
+    def _ensure_fresh(self):
+        ttl = getattr(settings, 'CHATBOT_OCCUPANCY_TTL', 60)
+        if (
+            self.generation is None
+            or self.generation != shared_generation(GENERATION_CACHE_KEY)
+            or self.origin != self._horizon()[0]
+            or (ttl and time.monotonic() - self.built_at > ttl)
+        ):
+            self.rebuild()
+
+    def _apply(self, keys, rows):
+        """Replace the rows under ``keys`` with ``rows`` and publish the change."""
+        with self._lock:
+            generation = bump_shared_generation(GENERATION_CACHE_KEY)
+            if self.generation is None or generation != self.generation + 1:
+                # Another process changed bookings since the calendar was
+                # built; rebuild from the database on the next query
+                self.generation = None
+                return
+            for key in keys:
+                if key in self._rows:
+                    self._add(key, self._rows[key], -1)
+            for row in rows:
+                self._add((row['row_kind'], row['row_id']), row, 1)
+            self.generation = generation
+
+    def refresh_slot(self, slot_id):
+        self._apply([('booking', slot_id)], list(slot_rows(slot_id=slot_id)))
+
+    def refresh_arrangement(self, arrangement_id):
+        self._apply([('arrangement', arrangement_id)], list(arrangement_rows(arrangement_id=arrangement_id)))
+
+    def refresh_booking(self, booking_id):
+        with self._lock:
+            keys = [key for key, row in self._rows.items() if row['row_booking'] == booking_id]
+        rows = list(slot_rows(booking_id=booking_id)) + list(arrangement_rows(booking_id=booking_id))
+        self._apply(keys + [(row['row_kind'], row['row_id']) for row in rows], rows)
+
+    def covers(self, start, end):
+        """Whether the days ``start``..``end`` lie within the current horizon."""
+        with self._lock:
+            self._ensure_fresh()
+            return self.origin <= start and (end - self.origin).days < self.days
+
+    def _window(self, venue_id, start, end):
+        """Counts of ``venue_id`` for the days ``start``..``end`` (clipped to the horizon)."""
+        self._ensure_fresh()
+        venue = self._venues.get(venue_id)
+        first = max((start - self.origin).days, 0)
+        last = min((end - self.origin).days, self.days - 1)
+        if venue is None or first > last:
+            return np.zeros((2, max(last - first + 1, 0), BUCKETS_PER_DAY), dtype=np.uint16)
+        return venue[:, first:last + 1]
+
+    def bitmap(self, venue_id, start, end, include_arrangements=True):
+        """Boolean (days, 48) array of occupied half-hours from ``start`` to ``end``."""
+        with self._lock:
+            counts = self._window(venue_id, start, end)
+            occupied = counts[BOOKED_PLANE] > 0
+            if include_arrangements:
+                occupied = occupied | (counts[ARRANGEMENT_PLANE] > 0)
+            return occupied
+
+    def packed(self, venue_id, start, end):
+        """Occupied half-hours per day as 6-byte bitmaps, the first bucket in the high bit."""
+        return [bytes(day) for day in np.packbits(self.bitmap(venue_id, start, end), axis=1)]
+
+    def utilization(self, venue_ids, start, end):
+        """Booked share of opening hours per venue from ``start`` to ``end``.
+
+        Returns ``{venue_id: {'utilization', 'booked_hours', 'daily'}}`` where
+        ``daily`` is the booked share of each day's opening hours.
+        """
+        opening = getattr(settings, 'CHATBOT_VENUE_OPENING_HOUR', 8) * 60 // BUCKET_MINUTES
+        closing = getattr(settings, 'CHATBOT_VENUE_CLOSING_HOUR', 22) * 60 // BUCKET_MINUTES
+        open_buckets = max(closing - opening, 1)
+        result = {}
+        with self._lock:
+            self._ensure_fresh()
+            for venue_id in (self._venues if venue_ids is None else venue_ids):
+                booked = self.bitmap(venue_id, start, end, include_arrangements=False)
+                daily = np.count_nonzero(booked[:, opening:closing], axis=1) / open_buckets
+                result[venue_id] = {
+                    'utilization': round(float(daily.mean()), 4) if daily.size else 0.0,
+                    'booked_hours': float(np.count_nonzero(booked)) * BUCKET_MINUTES / 60,
+                    'daily': [round(float(value), 4) for value in daily],
+                }
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'venues': len(self._venues),
+                'rows': len(self._rows),
+                'days': self.days,
+                'bytes': sum(array.nbytes for array in self._venues.values()),
+                'rebuilds': self.rebuilds,
+            }
+
+
+_occupancy_calendar = OccupancyCalendar()
+
+
+def get_occupancy_calendar():
+    return _occupancy_calendar
@@ -0,0 +1,25 @@
+"""
+Cursor (keyset) pagination for chat sessions and transcripts.
+
+Pages are fetched with ``WHERE <ordering column> > <cursor position>``
+served by the composite indexes on ChatSession (user_id, updated_at) and
+ChatMessage (session, created_at), so deep pages cost the same as the
+first one and never require OFFSET scans.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class ChatSessionCursorPagination(CursorPagination):
+    """Newest sessions first."""
+    ordering = ('-updated_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class ChatMessageCursorPagination(CursorPagination):
+    """Oldest messages first, as a transcript reads."""
+    ordering = ('created_at', 'id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
@@ -0,0 +1,256 @@
+"""
+Retries and circuit breaking for upstream LLM calls.
+
+Requests are sent with short connect/read timeouts and retried with full
+jitter backoff, within an overall deadline, only when they cannot have
+reached the upstream (connection errors) or were turned away before any
+body (429/5xx statuses). A read timeout is never retried: the upstream may
+already be generating, and billing, the completion. The outcome of each logical call (after its retries) is reported to a
+CircuitBreaker; once the upstream error rate over a sliding window crosses
+the threshold the breaker opens and callers go straight to their local
+fallback. After a cooldown it lets a few live trial calls through and closes
+again on the first success; a background probe can also close it when there
+is no traffic.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+
+import httpx
+import requests
+from urllib3.exceptions import NewConnectionError
+
+
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+STATES = (CLOSED, OPEN, HALF_OPEN)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Error-rate circuit breaker with half-open trial calls.
+
+    Open rejects every call for ``cooldown`` seconds. Half-open then admits
+    up to ``half_open_requests`` trial calls at a time: a successful one
+    closes the breaker, a failed one opens it for another cooldown.
+    ``probe`` is an optional callable returning True when the upstream looks
+    healthy; while the breaker is not closed it is called every ``cooldown``
+    seconds from a daemon thread.
+    """
+
+    def __init__(self, name, probe=None, error_rate=0.5, min_requests=10, window=30, cooldown=15,
+                 half_open_requests=1):
+        self.name = name
+        self.probe = probe
+        self.error_rate = error_rate
+        self.min_requests = min_requests
+        self.window = window
+        self.cooldown = cooldown
+        self.half_open_requests = half_open_requests
+        self.state = CLOSED
+        self._outcomes = deque()
+        self._opened_at = None
+        self._trials = 0
+        self._lock = threading.Lock()
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.trips = 0
+
+    def _prune(self, now):
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._outcomes.popleft()
+
+    def _open(self, now):
+        self.state = OPEN
+        self._opened_at = now
+        self._trials = 0
+        self._outcomes.clear()
+        self.trips += 1
+
+    def _close(self):
+        self.state = CLOSED
+        self._opened_at = None
+        self._trials = 0
+        self._outcomes.clear()
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                self._trials = 0
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self._trials < self.half_open_requests:
+                self._trials += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.successes += 1
+            if self.state == HALF_OPEN:
+                self._close()
+                recovered = True
+            else:
+                recovered = False
+                if self.state == CLOSED:
+                    now = time.monotonic()
+                    self._outcomes.append((now, True))
+                    self._prune(now)
+        if recovered:
+            print(f"Circuit '{self.name}' closed; trial call succeeded")
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            now = time.monotonic()
+            if self.state == HALF_OPEN:
+                # A failed trial call reopens without starting another probe
+                self._open(now)
+                return
+            if self.state != CLOSED:
+                return
+            self._outcomes.append((now, False))
+            self._prune(now)
+            if len(self._outcomes) < self.min_requests:
+                return
+            failed = sum(1 for _, ok in self._outcomes if not ok)
+            if failed / len(self._outcomes) < self.error_rate:
+                return
+            self._open(now)
+        print(f"Circuit '{self.name}' opened after {failed} failed upstream calls")
+        if self.probe:
+            threading.Thread(target=self._recover, name=f'{self.name}-probe', daemon=True).start()
+
+    def _recover(self):
+        while True:
+            time.sleep(self.cooldown)
+            if self.state == CLOSED:
+                return
+            try:
+                healthy = self.probe()
+            except Exception as e:
+                print(f"Circuit '{self.name}' probe failed: {str(e)}")
+                healthy = False
+            if healthy:
+                with self._lock:
+                    self._close()
+                print(f"Circuit '{self.name}' closed; upstream recovered")
+                return
+
+    def reset(self):
+        with self._lock:
+            self._close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'successes': self.successes,
+                'failures': self.failures,
+                'rejected': self.rejected,
+                'trips': self.trips,
+            }
+
+
+def backoff_delay(attempt, base, cap, retry_after=None):
+    """Full-jitter exponential backoff, honouring a short Retry-After."""
+    if retry_after is not None:
+        try:
+            seconds = float(retry_after)
+        except ValueError:
+            seconds = None
+        if seconds is not None and 0 <= seconds <= cap:
+            return seconds
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def is_connect_error(exc):
+    """True when ``exc`` means the request never reached the upstream."""
+    if isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout,
+                        requests.exceptions.ConnectTimeout)):
+        return True
+    if isinstance(exc, requests.exceptions.ConnectionError) and exc.args:
+        # requests reports a refused connection and a dropped one alike
+        return isinstance(getattr(exc.args[0], 'reason', None), NewConnectionError)
+    return False
+
+
+def _retry_delay(attempt, retries, backoff, backoff_max, give_up_at, retry_after=None):
+    """Seconds to wait before the next attempt, or None when there is none."""
+    if attempt >= retries:
+        return None
+    delay = backoff_delay(attempt, backoff, backoff_max, retry_after)
+    if give_up_at is not None and time.monotonic() + delay >= give_up_at:
+        return None
+    return delay
+
+
+def send_with_retries(send, breaker, retries=2, backoff=0.25, backoff_max=2.0, deadline=None):
+    """Call ``send()`` (returning a requests/httpx response) with retries.
+
+    Retries connection errors and retryable statuses only, and starts no
+    new attempt once ``deadline`` seconds have passed since the first.
+    Returns the first non-retryable response (which may still be a 4xx for
+    the caller to raise), or raises the last error. Raises CircuitOpenError
+    without calling ``send`` when the breaker is open. The breaker sees one
+    outcome per call, not one per attempt.
+    """
+    if not breaker.allow_request():
+        raise CircuitOpenError(f"Circuit '{breaker.name}' is open")
+    give_up_at = time.monotonic() + deadline if deadline else None
+    for attempt in range(retries + 1):
+        try:
+            response = send()
+        except Exception as e:
+            delay = _retry_delay(attempt, retries, backoff, backoff_max, give_up_at) if is_connect_error(e) else None
+            if delay is None:
+                breaker.record_failure()
+                raise
+        else:
+            if response.status_code not in RETRYABLE_STATUSES:
+                breaker.record_success()
+                return response
+            delay = _retry_delay(attempt, retries, backoff, backoff_max, give_up_at,
+                                 response.headers.get('Retry-After'))
+            if delay is None:
+                breaker.record_failure()
+                return response
+            response.close()
+        time.sleep(delay)
+
+
+async def asend_with_retries(send, breaker, retries=2, backoff=0.25, backoff_max=2.0, deadline=None):
+    """Async variant of send_with_retries; ``send`` returns an awaitable."""
+    if not breaker.allow_request():
+        raise CircuitOpenError(f"Circuit '{breaker.name}' is open")
+    give_up_at = time.monotonic() + deadline if deadline else None
+    for attempt in range(retries + 1):
+        try:
+            response = await send()
+        except Exception as e:
+            delay = _retry_delay(attempt, retries, backoff, backoff_max, give_up_at) if is_connect_error(e) else None
+            if delay is None:
+                breaker.record_failure()
+                raise
+        else:
+            if response.status_code not in RETRYABLE_STATUSES:
+                breaker.record_success()
+                return response
+            delay = _retry_delay(attempt, retries, backoff, backoff_max, give_up_at,
+                                 response.headers.get('Retry-After'))
+            if delay is None:
+                breaker.record_failure()
+                return response
+            await response.aclose()
+        await asyncio.sleep(delay)
@@ -0,0 +1,98 @@
+"""
+In-process cache of LLM completions for repeated chatbot questions.
+
+Entries are keyed on the normalized user message, the model, the sampling
+temperature and the version of the database context snapshot, so any catalog
+change produces new keys and stale answers are never served. Questions about
+availability and bookings depend on live data outside the snapshot and are
+never cached (see OpenRouterService._get_cache_version). The cache is
+bounded (LRU eviction) and entries expire after a TTL.
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+
+
+def normalize_message(message):
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return ' '.join(_PUNCTUATION.sub(' ', message.lower()).split())
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with per-entry TTL and hit/miss counters."""
+
+    def __init__(self, max_entries=1000, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(message, model, temperature, context_version):
+        raw = '\x1f'.join([normalize_message(message), model, str(temperature), context_version])
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Return the process-wide response cache configured from settings."""
+    global _response_cache
+
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache(
+                    max_entries=getattr(settings, 'CHATBOT_RESPONSE_CACHE_SIZE', 1000),
+                    ttl=getattr(settings, 'CHATBOT_RESPONSE_CACHE_TTL', 3600),
+                )
+    return _response_cache
@@ -0,0 +1,280 @@
+"""
+Model routing and hedged requests for chatbot completions.
+
+Each turn is routed to a model by its detected intents
+(OPENROUTER_INTENT_MODELS), so cheap intents can go to a fast model. When
+OPENROUTER_HEDGE_MODEL is set, a completion that has not produced its first
+token within a deadline derived from the observed time-to-first-token
+quantile of the primary model is raced against a second request to the hedge
+model. The first stream to produce a token wins and the other is cancelled
+at once: its socket is shut down, which wakes the read its thread is blocked
+on, and that thread closes its own response, since a requests response must
+not be closed from a thread other than the one reading it.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from collections import defaultdict, deque
+
+import numpy as np
+from django.conf import settings
+
+from apps.chatbot.intents import INTENT_KEYWORDS
+
+
+DEFAULT_MODEL = 'openai/gpt-3.5-turbo'
+
+
+def get_default_model():
+    return getattr(settings, 'OPENROUTER_DEFAULT_MODEL', DEFAULT_MODEL)
+
+
+def select_model(intents):
+    """Model for a turn with ``intents``; the first routed intent (in
+    INTENT_KEYWORDS order) wins."""
+    routes = getattr(settings, 'OPENROUTER_INTENT_MODELS', {})
+    for intent in INTENT_KEYWORDS:
+        if intent in intents and intent in routes:
+            return routes[intent]
+    return get_default_model()
+
+
+def get_hedge_model(model):
+    """Alternate model to hedge ``model`` with, or None when hedging is off."""
+    hedge_model = getattr(settings, 'OPENROUTER_HEDGE_MODEL', '')
+    if not hedge_model or hedge_model == model:
+        return None
+    return hedge_model
+
+
+class LatencyTracker:
+    """Sliding window of time-to-first-token samples per model."""
+
+    def __init__(self, window=200, min_samples=20):
+        self.min_samples = min_samples
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def observe(self, model, seconds):
+        with self._lock:
+            self._samples[model].append(seconds)
+
+    def quantile(self, model, q):
+        with self._lock:
+            samples = list(self._samples.get(model, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return float(np.quantile(samples, q))
+
+    def record_hedge(self, won):
+        with self._lock:
+            self.hedges += 1
+            if won:
+                self.hedge_wins += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+                'samples': {model: len(samples) for model, samples in self._samples.items()},
+            }
+
+
+_latency_tracker = LatencyTracker()
+
+
+def get_latency_tracker():
+    return _latency_tracker
+
+
+def hedge_delay(model):
+    """Seconds to wait for ``model``'s first token before hedging."""
+    observed = _latency_tracker.quantile(model, getattr(settings, 'OPENROUTER_HEDGE_QUANTILE', 0.95))
+    if observed is None:
+        return getattr(settings, 'OPENROUTER_HEDGE_DEFAULT_DELAY', 2.0)
+    return max(getattr(settings, 'OPENROUTER_HEDGE_MIN_DELAY', 0.3), observed)
+
+
+class _Attempt(threading.Thread):
+    """One streamed completion in a race, run on its own thread."""
+
+    def __init__(self, race, model, open_stream):
+        super().__init__(name=f'hedge-{model}', daemon=True)
+        self.race = race
+        self.model = model
+        self.open_stream = open_stream
+        # Run with the caller's context variables (e.g. the request timer)
+        self.context = contextvars.copy_context()
+        self.stream = None
+        self.tokens = []
+        self.error = None
+        self.finished = False
+        self.cancelled = threading.Event()
+
+    def run(self):
+        self.context.run(self._run)
+
+    def _run(self):
+        started = time.monotonic()
+        try:
+            self.stream = self.open_stream(self.model)
+            if self.cancelled.is_set():
+                # Lost while its request was still being sent
+                return
+            for token in self.stream:
+                if self.cancelled.is_set():
+                    break
+                if not self.tokens:
+                    _latency_tracker.observe(self.model, time.monotonic() - started)
+                    if not self.race.claim(self):
+                        break
+                self.tokens.append(token)
+        except Exception as e:
+            self.error = e
+        finally:
+            if self.stream is not None:
+                self.stream.close()
+            self.race.finish(self)
+
+    def cancel(self):
+        # Flag it and wake a read blocked on the stream so its pooled
+        # connection is freed now; the response is still closed by this
+        # attempt's own thread
+        self.cancelled.set()
+        stream = self.stream
+        if stream is not None:
+            stream.abort()
+
+
+class _Race:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.winner = None
+        self.attempts = []
+
+    def claim(self, attempt):
+        with self.condition:
+            if self.winner is None:
+                self.winner = attempt
+            self.condition.notify_all()
+            return self.winner is attempt
+
+    def finish(self, attempt):
+        with self.condition:
+            attempt.finished = True
+            self.condition.notify_all()
+
+    def start(self, model, open_stream):
+        attempt = _Attempt(self, model, open_stream)
+        self.attempts.append(attempt)
+        attempt.start()
+        return attempt
+
+    def decided(self):
+        return self.winner is not None or all(attempt.finished for attempt in self.attempts)
+
+
+def hedged_completion(model, hedge_model, open_stream):
+    """Return ``(model, content)`` from the first of two racing streams.
+
+    ``open_stream(model)`` must return an iterable of content tokens with
+    ``close()`` and ``abort()`` methods, ``abort()`` unblocking a pending
+    read from another thread. The losing stream is aborted once the race is
+    decided. The hedge request is only sent if ``model`` has not
+    produced a token within hedge_delay(model), or as soon as it fails.
+    """
+    race = _Race()
+    primary = race.start(model, open_stream)
+    with race.condition:
+        race.condition.wait_for(race.decided, timeout=hedge_delay(model))
+        hedged = race.winner is None
+    if hedged:
+        race.start(hedge_model, open_stream)
+
+    with race.condition:
+        race.condition.wait_for(race.decided)
+        winner = race.winner
+    if hedged:
+        _latency_tracker.record_hedge(winner is not None and winner is not primary)
+    if winner is None:
+        raise race.attempts[-1].error or Exception("No completion from any model")
+
+    for attempt in race.attempts:
+        if attempt is not winner:
+            attempt.cancel()
+    winner.join()
+    if winner.error is not None:
+        raise winner.error
+    return winner.model, ''.join(winner.tokens)
+
+
+async def _first_token(model, open_stream):
+    """Open a stream and wait for its first token.
+
+    Returns ``(stream, first_token)``; ``stream`` is an async iterator over
+    the remaining tokens with an ``aclose()`` method.
+    """
+    started = time.monotonic()
+    stream = await open_stream(model)
+    try:
+        async for token in stream:
+            _latency_tracker.observe(model, time.monotonic() - started)
+            return stream, token
+        return stream, None
+    except BaseException:
+        await stream.aclose()
+        raise
+
+
+async def ahedged_stream(model, hedge_model, open_stream):
+    """Async generator of ``(model, token)`` from the first stream to answer.
+
+    ``open_stream(model)`` is a coroutine returning an async iterator of
+    tokens with ``aclose()``. The losing request is cancelled, which closes
+    its connection.
+    """
+    primary = asyncio.ensure_future(_first_token(model, open_stream))
+    tasks = {primary: model}
+    done, _ = await asyncio.wait({primary}, timeout=hedge_delay(model))
+    hedged = not done or primary.exception() is not None
+    if hedged:
+        tasks[asyncio.ensure_future(_first_token(hedge_model, open_stream))] = hedge_model
+
+    winner = None
+    error = None
+    pending = set(tasks)
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                elif winner is None:
+                    winner = task
+                else:
+                    # Both answered in the same tick; close the slower one
+                    await task.result()[0].aclose()
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    if hedged:
+        _latency_tracker.record_hedge(winner is not None and winner is not primary)
+    if winner is None:
+        raise error or Exception("No completion from any model")
+
+    stream, token = winner.result()
+    winner_model = tasks[winner]
+    try:
+        if token is not None:
+            yield winner_model, token
+        async for token in stream:
+            yield winner_model, token
+    finally:
+        await stream.aclose()
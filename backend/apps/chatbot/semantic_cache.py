@@ -0,0 +1,167 @@
+"""
+Similarity-based answer cache for paraphrased chatbot questions.
+
+Questions are reduced to a canonical form (synonym keywords replaced by their
+intent, stopwords and venue names dropped, words sorted), embedded locally
+with hashed character n-grams (no model download, no network) and compared by
+cosine similarity against a fixed-size NumPy matrix of previously answered
+questions. "What is the price of the auditorium" and "how much does the
+auditorium cost" both become "pricing" with the same venue guard.
+
+Similarity alone cannot tell "a wedding in June" from "a wedding in July", so
+every entry is also tagged with a guard that must match exactly: the context
+snapshot version it was answered under, the detected intents, the venues
+named, the numbers, and any weekday, month or relative-day words.
+"""
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+from django.conf import settings
+
+from apps.chatbot.context import mentioned_venue_ids, venue_name_words
+from apps.chatbot.intents import canonical_words, detect_intents
+from apps.chatbot.response_cache import normalize_message
+
+
+_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+# Words that pin a question to a date or time of day
+DATE_WORDS = frozenset("""
+    monday tuesday wednesday thursday friday saturday sunday mon tue tues wed thu thur thurs fri sat sun
+    weekday weekdays weekend weekends
+    january february march april may june july august september october november december
+    jan feb mar apr jun jul aug sep sept oct nov dec
+    today tonight tomorrow yesterday morning afternoon evening night noon midnight
+    week month year next this last
+""".split())
+
+
+def question_key(message):
+    """Return ``(canonical_text, guard)`` for ``message``."""
+    text = normalize_message(message)
+    words = text.split()
+    guard = '|'.join([
+        ','.join(sorted(detect_intents(message))),
+        ','.join(str(venue_id) for venue_id in sorted(mentioned_venue_ids(message))),
+        ','.join(_NUMBER.findall(message)),
+        ','.join(word for word in words if word in DATE_WORDS),
+    ])
+    name_words = venue_name_words()
+    canonical = sorted(set(word for word in canonical_words(text) if word not in name_words))
+    return ' '.join(canonical), guard
+
+
+class HashedNgramVectorizer:
+    """Embed text as an L2-normalised bag of hashed character n-grams."""
+
+    def __init__(self, dim=1024, ngram_range=(3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def transform(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        padded = f" {normalize_message(text)} "
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(padded) - n + 1):
+                # crc32 is stable across processes, unlike hash()
+                h = zlib.crc32(padded[i:i + n].encode('utf-8'))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                vector[h % self.dim] += sign
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector
+
+
+class SemanticCache:
+    """Bounded cosine-similarity index of question vectors and answers.
+
+    Memory is fixed at ``max_entries * dim`` float32 values; once full, the
+    oldest entry is overwritten.
+    """
+
+    def __init__(self, max_entries=1000, threshold=0.85, dim=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+        self.vectorizer = HashedNgramVectorizer(dim=dim)
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._expires_at = np.zeros(max_entries, dtype=np.float64)
+        self._tags = np.empty(max_entries, dtype=object)
+        self._answers = [None] * max_entries
+        self._next_slot = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _embed(self, message, context_version):
+        canonical, guard = question_key(message)
+        return self.vectorizer.transform(canonical), f"{context_version}|{guard}"
+
+    def get(self, message, context_version):
+        vector, tag = self._embed(message, context_version)
+        with self._lock:
+            candidates = (self._expires_at > time.monotonic()) & (self._tags == tag)
+            if candidates.any():
+                similarities = self._vectors @ vector
+                similarities[~candidates] = -1.0
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self.hits += 1
+                    return self._answers[best]
+            self.misses += 1
+            return None
+
+    def set(self, message, context_version, answer):
+        vector, tag = self._embed(message, context_version)
+        with self._lock:
+            slot = self._next_slot
+            self._vectors[slot] = vector
+            self._expires_at[slot] = time.monotonic() + self.ttl
+            self._tags[slot] = tag
+            self._answers[slot] = answer
+            self._next_slot = (slot + 1) % self.max_entries
+
+    def clear(self):
+        with self._lock:
+            self._expires_at[:] = 0
+            self._tags[:] = None
+            self._answers = [None] * self.max_entries
+            self._next_slot = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': int((self._expires_at > time.monotonic()).sum()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+
+_semantic_cache = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache():
+    """Return the process-wide semantic cache, or None when it is disabled."""
+    global _semantic_cache
+
+    max_entries = getattr(settings, 'CHATBOT_SEMANTIC_CACHE_SIZE', 1000)
+    if not max_entries:
+        return None
+    if _semantic_cache is None:
+        with _semantic_cache_lock:
+            if _semantic_cache is None:
+                _semantic_cache = SemanticCache(
+                    max_entries=max_entries,
+                    threshold=getattr(settings, 'CHATBOT_SEMANTIC_CACHE_THRESHOLD', 0.85),
+                    dim=getattr(settings, 'CHATBOT_SEMANTIC_CACHE_DIM', 1024),
+                    ttl=getattr(settings, 'CHATBOT_RESPONSE_CACHE_TTL', 3600),
+                )
+    return _semantic_cache
@@ -1,14 +1,328 @@
+import asyncio
+import atexit
+import os
+import socket
+import threading
+import time
+
+import httpx
 import requests
+from asgiref.sync import sync_to_async
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 from django.conf import settings
-from apps.chatbot.models import Venue, Booking, PriceTier, AdditionalService, JTCCHistory, Contact
+from apps.chatbot.context import get_context_snapshot
+from apps.chatbot.fast_path import fast_path_intent, record_turn_path
+from apps.chatbot.intents import detect_intents
+from apps.chatbot.models import Booking
+from apps.chatbot.resilience import CircuitBreaker, asend_with_retries, send_with_retries
+from apps.chatbot.response_cache import ResponseCache, get_response_cache
+from apps.chatbot.routing import (
+    ahedged_stream, get_default_model, get_hedge_model, hedged_completion, select_model,
+)
+from apps.chatbot.semantic_cache import get_semantic_cache
+from apps.chatbot.slot_finder import render_free_windows_block
+from apps.chatbot.timing import mark_first_byte, stage
 from datetime import datetime, timedelta
 import json
 
+
+# Answers to these intents quote live bookings and free windows, which the
+# context snapshot version does not cover, so they are never cached
+LIVE_DATA_INTENTS = frozenset({'availability', 'booking'})
+
+
+# Process-wide HTTP session shared by every OpenRouterService instance so chat
+# turns reuse pooled keep-alive connections instead of paying a fresh TCP/TLS
+# handshake per message. Each worker process owns its own session.
+_http_session = None
+_http_session_pid = None
+_http_session_last_used = 0.0
+_http_session_lock = threading.Lock()
+
+
+def _bounded_pool_class(pool_class, pool_timeout):
+    class BoundedPool(pool_class):
+        def _get_conn(self, timeout=None):
+            return super()._get_conn(timeout=pool_timeout if timeout is None else timeout)
+
+    return BoundedPool
+
+
+class BoundedPoolAdapter(HTTPAdapter):
+    """HTTPAdapter whose blocking pools wait at most ``pool_timeout`` seconds
+    for a free connection, then raise urllib3's EmptyPoolError. requests
+    itself offers no checkout timeout, so a full pool would block forever.
+    """
+
+    __attrs__ = HTTPAdapter.__attrs__ + ['pool_timeout']
+
+    def __init__(self, pool_timeout=None, **kwargs):
+        self.pool_timeout = pool_timeout
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        if self.pool_timeout is not None:
+            self.poolmanager.pool_classes_by_scheme = {
+                'http': _bounded_pool_class(HTTPConnectionPool, self.pool_timeout),
+                'https': _bounded_pool_class(HTTPSConnectionPool, self.pool_timeout),
+            }
+
+
+def _build_http_session():
+    pool_connections = getattr(settings, 'OPENROUTER_POOL_CONNECTIONS', 4)
+    pool_maxsize = getattr(settings, 'OPENROUTER_POOL_MAXSIZE', 20)
+
+    session = requests.Session()
+    adapter = BoundedPoolAdapter(
+        pool_timeout=getattr(settings, 'OPENROUTER_POOL_TIMEOUT', 5),
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=True,
+        max_retries=0,
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['Connection'] = 'keep-alive'
+    return session
+
+
+def get_http_session():
+    """Return the pooled HTTP session for the current worker process.
+
+    The session is rebuilt after a fork (so workers never share sockets) and
+    after it has been idle longer than OPENROUTER_KEEPALIVE_TIMEOUT seconds, by
+    which time the upstream has usually closed the pooled connections.
+    """
+    global _http_session, _http_session_pid, _http_session_last_used
+
+    keepalive_timeout = getattr(settings, 'OPENROUTER_KEEPALIVE_TIMEOUT', 60)
+    now = time.monotonic()
+
+    with _http_session_lock:
+        stale = (
+            _http_session is not None
+            and keepalive_timeout
+            and now - _http_session_last_used > keepalive_timeout
+        )
+        if _http_session is None or _http_session_pid != os.getpid() or stale:
+            if _http_session is not None and _http_session_pid == os.getpid():
+                _http_session.close()
+            _http_session = _build_http_session()
+            _http_session_pid = os.getpid()
+        _http_session_last_used = now
+        return _http_session
+
+
+def close_http_session():
+    """Close the pooled HTTP session owned by this worker process, if any."""
+    global _http_session, _http_session_pid
+
+    with _http_session_lock:
+        if _http_session is not None and _http_session_pid == os.getpid():
+            _http_session.close()
+        _http_session = None
+        _http_session_pid = None
+
+
+atexit.register(close_http_session)
+
+
+# Async counterpart used by the ASGI chat views. An httpx.AsyncClient is bound
+# to the event loop it was first used on, so one client is kept per loop.
+# Off ASGI (WSGI, runserver, the test client) every request runs on a fresh
+# loop from asyncio.run(); its client is closed when that loop cancels its
+# remaining tasks on the way out, so clients never outlive their loop.
+_async_http_clients = {}
+_async_http_clients_lock = threading.Lock()
+
+
+async def _close_with_loop(loop, client):
+    """Park until the loop cancels this task, then close ``client`` on it."""
+    try:
+        await loop.create_future()
+    finally:
+        with _async_http_clients_lock:
+            if _async_http_clients.get(loop) is client:
+                del _async_http_clients[loop]
+        await client.aclose()
+
+
+def get_async_http_client():
+    """Return the pooled httpx.AsyncClient for the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _async_http_clients_lock:
+        # Loops closed without cancelling their tasks leave entries behind
+        for other in [other for other in _async_http_clients if other.is_closed()]:
+            del _async_http_clients[other]
+        client = _async_http_clients.get(loop)
+        if client is not None and not client.is_closed:
+            return client
+        pool_maxsize = getattr(settings, 'OPENROUTER_POOL_MAXSIZE', 20)
+        keepalive_timeout = getattr(settings, 'OPENROUTER_KEEPALIVE_TIMEOUT', 60)
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=pool_maxsize,
+                max_keepalive_connections=pool_maxsize,
+                keepalive_expiry=keepalive_timeout,
+            ),
+            headers={'Connection': 'keep-alive'},
+        )
+        _async_http_clients[loop] = client
+    loop.create_task(_close_with_loop(loop, client))
+    return client
+
+
+def get_completions_url():
+    """Chat-completions endpoint derived from OPENROUTER_BASE_URL"""
+    base_url = getattr(settings, 'OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1').rstrip('/')
+    if base_url.endswith('/chat/completions'):
+        return base_url
+    return f"{base_url}/chat/completions"
+
+
+def get_request_timeout(stream=False):
+    """(connect, read) timeout for OpenRouter requests, in seconds
+
+    Streamed requests must produce their first byte, and every later token or
+    keep-alive comment, within the shorter first-byte timeout; a plain
+    completion only answers once it is fully generated.
+    """
+    read = getattr(settings, 'OPENROUTER_READ_TIMEOUT', 20)
+    if stream:
+        read = min(read, getattr(settings, 'OPENROUTER_FIRST_BYTE_TIMEOUT', 8))
+    return (getattr(settings, 'OPENROUTER_CONNECT_TIMEOUT', 3.05), read)
+
+
+def get_async_request_timeout(stream=False):
+    connect, read = get_request_timeout(stream)
+    return httpx.Timeout(read, connect=connect)
+
+
+def _retry_options():
+    return {
+        'retries': getattr(settings, 'OPENROUTER_MAX_RETRIES', 2),
+        'backoff': getattr(settings, 'OPENROUTER_RETRY_BACKOFF', 0.25),
+        'backoff_max': getattr(settings, 'OPENROUTER_RETRY_BACKOFF_MAX', 2.0),
+        'deadline': getattr(settings, 'OPENROUTER_RETRY_DEADLINE', 8),
+    }
+
+
+def _probe_openrouter():
+    """Cheap health check used by the circuit breaker while it is not closed"""
+    base_url = get_completions_url().rsplit('/chat/completions', 1)[0]
+    response = get_http_session().get(f"{base_url}/models", timeout=get_request_timeout())
+    return response.status_code < 500 and response.status_code != 429
+
+
+_openrouter_breaker = None
+_openrouter_breaker_lock = threading.Lock()
+
+
+def get_openrouter_breaker():
+    """Return the process-wide circuit breaker guarding OpenRouter calls"""
+    global _openrouter_breaker
+
+    if _openrouter_breaker is None:
+        with _openrouter_breaker_lock:
+            if _openrouter_breaker is None:
+                _openrouter_breaker = CircuitBreaker(
+                    'openrouter',
+                    probe=_probe_openrouter,
+                    error_rate=getattr(settings, 'OPENROUTER_BREAKER_ERROR_RATE', 0.5),
+                    min_requests=getattr(settings, 'OPENROUTER_BREAKER_MIN_REQUESTS', 10),
+                    window=getattr(settings, 'OPENROUTER_BREAKER_WINDOW', 30),
+                    cooldown=getattr(settings, 'OPENROUTER_BREAKER_COOLDOWN', 15),
+                    half_open_requests=getattr(settings, 'OPENROUTER_BREAKER_HALF_OPEN_REQUESTS', 1),
+                )
+    return _openrouter_breaker
+
+
+def _parse_sse_line(line):
+    """Return ``(done, token)`` for one line of an OpenRouter SSE stream"""
+    # SSE comments (": OPENROUTER PROCESSING") and blank keep-alives
+    if not line.startswith('data:'):
+        return False, None
+    data = line[len('data:'):].strip()
+    if data == '[DONE]':
+        return True, None
+    choices = json.loads(data).get('choices') or []
+    if not choices:
+        return False, None
+    return False, (choices[0].get('delta') or {}).get('content')
+
+
+class _TokenStream:
+    """Content tokens of a streamed requests response"""
+
+    def __init__(self, response):
+        self.response = response
+        self._tokens = self._iter_tokens()
+
+    def _iter_tokens(self):
+        for line in self.response.iter_lines(decode_unicode=True):
+            done, token = _parse_sse_line(line or '')
+            if done:
+                return
+            if token:
+                mark_first_byte()
+                yield token
+
+    def __iter__(self):
+        return self._tokens
+
+    def close(self):
+        self.response.close()
+
+    def abort(self):
+        """Make a read blocked on another thread return now.
+
+        Shuts the socket down rather than closing it, which would not wake
+        the reader; the reader's thread still closes the response. The plain
+        socket method also works on a TLS socket without unwrapping it.
+        """
+        connection = getattr(self.response.raw, 'connection', None)
+        sock = getattr(connection, 'sock', None)
+        if sock is not None:
+            try:
+                socket.socket.shutdown(sock, socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class _AsyncTokenStream:
+    """Content tokens of a streamed httpx response"""
+
+    def __init__(self, response):
+        self.response = response
+        self._tokens = self._iter_tokens()
+
+    async def _iter_tokens(self):
+        async for line in self.response.aiter_lines():
+            done, token = _parse_sse_line(line)
+            if done:
+                return
+            if token:
+                mark_first_byte()
+                yield token
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self._tokens.__anext__()
+
+    async def aclose(self):
+        await self._tokens.aclose()
+        await self.response.aclose()
+
+
 class OpenRouterService:
     def __init__(self):
         self.api_key = getattr(settings, 'OPENROUTER_API_KEY', '')
-        self.api_url = getattr(settings, 'OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1/chat/completions')
-        self.default_model = 'openai/gpt-3.5-turbo'
+        self.api_url = get_completions_url()
+        self.default_model = get_default_model()
         self.temperature = 0.7
         self.max_tokens = 1000
         
@@ -24,16 +338,8 @@ class OpenRouterService:
             'X-Title': getattr(settings, 'SITE_NAME', 'EventAura'),
         }
 
-    def generate_response(self, message, conversation_history=None):
-        """Generate response using OpenRouter API with database context"""
-        
-        # First, try to get database-specific information
-        db_context = self._get_database_context(message)
-        
-        # If no API key, use enhanced fallback responses with database data
-        if not self.api_key:
-            return self._get_enhanced_fallback_response(message, db_context)
-        
+    def _build_messages(self, message, db_context, conversation_history=None):
+        """Assemble the chat-completions message list for a user message"""
         messages = []
         
         # Add system prompt with database context
@@ -54,61 +360,398 @@ class OpenRouterService:
         
         # Add current message
         messages.append({'role': 'user', 'content': message})
-        
-        payload = {
-            'model': self.default_model,
+        return messages
+
+    def _build_payload(self, messages, model=None):
+        return {
+            'model': model or self.default_model,
             'messages': messages,
             'temperature': self.temperature,
             'max_tokens': self.max_tokens,
         }
+
+    def _parse_completion(self, response_data):
+        if 'choices' in response_data and len(response_data['choices']) > 0:
+            return response_data['choices'][0]['message']['content']
+        raise Exception("Invalid response from OpenRouter")
+
+    def _get_cache_version(self, conversation_history=None, intents=frozenset()):
+        """Context version to cache this turn under, or None if it must not be cached.
+
+        Follow-up turns depend on the conversation so only standalone
+        questions are cached. Cached answers are tied to the context snapshot
+        version, so a catalog change bypasses every answer produced before it.
+        Availability and booking questions are answered from live data the
+        version does not track and are not cached at all.
+        """
+        if conversation_history or intents & LIVE_DATA_INTENTS:
+            return None
+        try:
+            return get_context_snapshot()['version']
+        except Exception as e:
+            print(f"Error getting context version: {str(e)}")
+            return None
+
+    def _get_cached_response(self, message, context_version, model):
+        """Look up an exact, then a semantically similar, cached answer."""
+        if getattr(settings, 'CHATBOT_RESPONSE_CACHE_SIZE', 1000):
+            key = ResponseCache.make_key(message, model, self.temperature, context_version)
+            cached = get_response_cache().get(key)
+            if cached is not None:
+                return cached
         
+        semantic_cache = get_semantic_cache()
+        if semantic_cache is not None:
+            return semantic_cache.get(message, f"{model}:{self.temperature}:{context_version}")
+        return None
+
+    def _store_cached_response(self, message, context_version, model, content):
+        if getattr(settings, 'CHATBOT_RESPONSE_CACHE_SIZE', 1000):
+            key = ResponseCache.make_key(message, model, self.temperature, context_version)
+            get_response_cache().set(key, content)
+        
+        semantic_cache = get_semantic_cache()
+        if semantic_cache is not None:
+            semantic_cache.set(message, f"{model}:{self.temperature}:{context_version}", content)
+
+    def _get_fast_path_response(self, message, db_context, intents, conversation_history=None):
+        """Answer deterministic intents from the context snapshot, or return None."""
         try:
-            response = requests.post(
+            blocks = get_context_snapshot()['blocks']
+        except Exception as e:
+            print(f"Error getting context snapshot: {str(e)}")
+            return None
+        intent = fast_path_intent(message, intents, blocks, conversation_history)
+        if intent is None:
+            return None
+        record_turn_path('fast_path', intent)
+        return self._get_enhanced_fallback_response(message, db_context, frozenset({intent}))
+
+    def _open_stream(self, model, messages):
+        payload = self._build_payload(messages, model)
+        payload['stream'] = True
+        response = send_with_retries(
+            lambda: get_http_session().post(
                 self.api_url,
                 headers=self.get_headers(),
                 json=payload,
-                timeout=30
-            )
+                stream=True,
+                timeout=get_request_timeout(stream=True)
+            ),
+            get_openrouter_breaker(),
+            **_retry_options()
+        )
+        if not response.ok:
+            response.close()
             response.raise_for_status()
-            response_data = response.json()
-            
-            if 'choices' in response_data and len(response_data['choices']) > 0:
-                return response_data['choices'][0]['message']['content']
-            else:
-                raise Exception("Invalid response from OpenRouter")
+        return _TokenStream(response)
+
+    async def _aopen_stream(self, model, messages):
+        payload = self._build_payload(messages, model)
+        payload['stream'] = True
+        client = get_async_http_client()
+        request = client.build_request(
+            'POST',
+            self.api_url,
+            headers=self.get_headers(),
+            json=payload,
+            timeout=get_async_request_timeout(stream=True)
+        )
+        # Retries only cover getting the stream started; once tokens flow
+        # a failure ends the stream with what was received
+        response = await asend_with_retries(
+            lambda: client.send(request, stream=True),
+            get_openrouter_breaker(),
+            **_retry_options()
+        )
+        if response.is_error:
+            await response.aclose()
+            response.raise_for_status()
+        return _AsyncTokenStream(response)
+
+    def _complete(self, model, messages):
+        """Return the completion text, hedging with a second model if configured"""
+        hedge_model = get_hedge_model(model)
+        if hedge_model:
+            _, content = hedged_completion(model, hedge_model, lambda m: self._open_stream(m, messages))
+            return content
+        
+        payload = self._build_payload(messages, model)
+        response = send_with_retries(
+            lambda: get_http_session().post(
+                self.api_url,
+                headers=self.get_headers(),
+                json=payload,
+                timeout=get_request_timeout(),
+                # Runs once the headers are in, before the body is read
+                hooks={'response': lambda response, *args, **kwargs: mark_first_byte()}
+            ),
+            get_openrouter_breaker(),
+            **_retry_options()
+        )
+        response.raise_for_status()
+        return self._parse_completion(response.json())
+
+    async def _acomplete(self, model, messages):
+        hedge_model = get_hedge_model(model)
+        if hedge_model:
+            return ''.join([token async for token in self._astream_tokens(model, messages)])
+        
+        payload = self._build_payload(messages, model)
+        client = get_async_http_client()
+        request = client.build_request(
+            'POST',
+            self.api_url,
+            headers=self.get_headers(),
+            json=payload,
+            timeout=get_async_request_timeout()
+        )
+        response = await asend_with_retries(
+            lambda: client.send(request, stream=True),
+            get_openrouter_breaker(),
+            **_retry_options()
+        )
+        # Headers are in; the body is read separately so time to first byte
+        # can be told apart from generation time
+        mark_first_byte()
+        try:
+            await response.aread()
+        finally:
+            await response.aclose()
+        response.raise_for_status()
+        return self._parse_completion(response.json())
+
+    async def _astream_tokens(self, model, messages):
+        """Yield completion tokens, racing a hedge model if configured"""
+        hedge_model = get_hedge_model(model)
+        if hedge_model:
+            stream = ahedged_stream(model, hedge_model, lambda m: self._aopen_stream(m, messages))
+            try:
+                async for _, token in stream:
+                    yield token
+            finally:
+                await stream.aclose()
+            return
+        
+        stream = await self._aopen_stream(model, messages)
+        try:
+            async for token in stream:
+                yield token
+        finally:
+            await stream.aclose()
+
+    def generate_response(self, message, conversation_history=None):
+        """Generate response using OpenRouter API with database context"""
+        
+        # Detect intents once; both the context builder and the fallback use them
+        intents = detect_intents(message)
+        
+        # First, try to get database-specific information
+        with stage('context'):
+            db_context = self._get_database_context(message, intents)
+        
+        # Greetings, prices, capacities and the like are answered locally
+        local = self._get_fast_path_response(message, db_context, intents, conversation_history)
+        if local is not None:
+            return local
+        
+        # If no API key, use enhanced fallback responses with database data
+        if not self.api_key:
+            record_turn_path('fallback')
+            return self._get_enhanced_fallback_response(message, db_context, intents)
+        
+        model = select_model(intents)
+        context_version = self._get_cache_version(conversation_history, intents)
+        if context_version:
+            cached = self._get_cached_response(message, context_version, model)
+            if cached is not None:
+                record_turn_path('cache')
+                return cached
+        
+        with stage('prompt'):
+            messages = self._build_messages(message, db_context, conversation_history)
+        
+        try:
+            with stage('llm'):
+                content = self._complete(model, messages)
+            if context_version:
+                self._store_cached_response(message, context_version, model, content)
+            record_turn_path('llm')
+            return content
                 
         except Exception as e:
             print(f"OpenRouter API error: {str(e)}")
             # Fallback to enhanced local response if API fails
-            return self._get_enhanced_fallback_response(message, db_context)
+            record_turn_path('fallback')
+            return self._get_enhanced_fallback_response(message, db_context, intents)
+
+    async def agenerate_response(self, message, conversation_history=None):
+        """Async variant of generate_response for ASGI views.
+
+        The database context is built in a worker thread and the completion is
+        awaited on the shared httpx client, so the event loop stays free while
+        OpenRouter is generating.
+        """
+        intents = detect_intents(message)
+        with stage('context'):
+            db_context = await sync_to_async(self._get_database_context)(message, intents)
+        
+        local = await sync_to_async(self._get_fast_path_response)(
+            message, db_context, intents, conversation_history
+        )
+        if local is not None:
+            return local
+        
+        if not self.api_key:
+            record_turn_path('fallback')
+            return self._get_enhanced_fallback_response(message, db_context, intents)
+        
+        model = select_model(intents)
+        context_version = await sync_to_async(self._get_cache_version)(conversation_history, intents)
+        if context_version:
+            cached = self._get_cached_response(message, context_version, model)
+            if cached is not None:
+                record_turn_path('cache')
+                return cached
+        
+        with stage('prompt'):
+            messages = self._build_messages(message, db_context, conversation_history)
+        
+        try:
+            with stage('llm'):
+                content = await self._acomplete(model, messages)
+            if context_version:
+                self._store_cached_response(message, context_version, model, content)
+            record_turn_path('llm')
+            return content
+        
+        except Exception as e:
+            print(f"OpenRouter API error: {str(e)}")
+            record_turn_path('fallback')
+            return self._get_enhanced_fallback_response(message, db_context, intents)
     
-    def _get_database_context(self, message):
+    async def astream_response(self, message, conversation_history=None):
+        """Yield the completion incrementally as OpenRouter streams tokens.
+
+        Falls back to the local response (yielded as a single chunk) when no
+        API key is configured or the upstream fails before the first token.
+        """
+        intents = detect_intents(message)
+        with stage('context'):
+            db_context = await sync_to_async(self._get_database_context)(message, intents)
+        
+        local = await sync_to_async(self._get_fast_path_response)(
+            message, db_context, intents, conversation_history
+        )
+        if local is not None:
+            yield local
+            return
+        
+        if not self.api_key:
+            record_turn_path('fallback')
+            yield self._get_enhanced_fallback_response(message, db_context, intents)
+            return
+        
+        model = select_model(intents)
+        context_version = await sync_to_async(self._get_cache_version)(conversation_history, intents)
+        if context_version:
+            cached = self._get_cached_response(message, context_version, model)
+            if cached is not None:
+                record_turn_path('cache')
+                yield cached
+                return
+        
+        with stage('prompt'):
+            messages = self._build_messages(message, db_context, conversation_history)
+        
+        streamed_any = False
+        chunks = []
+        tokens = self._astream_tokens(model, messages)
+        try:
+            with stage('llm'):
+                async for token in tokens:
+                    streamed_any = True
+                    chunks.append(token)
+                    yield token
+            
+            if context_version and chunks:
+                self._store_cached_response(message, context_version, model, ''.join(chunks))
+            record_turn_path('llm')
+        
+        except Exception as e:
+            print(f"OpenRouter streaming error: {str(e)}")
+            if not streamed_any:
+                record_turn_path('fallback')
+                yield self._get_enhanced_fallback_response(message, db_context, intents)
+        
+        finally:
+            await tokens.aclose()
+    
+    def summarize_conversation(self, previous_summary, turns, max_chars=2000):
+        """Fold ``turns`` into ``previous_summary`` and return the new summary.
+
+        Uses the LLM when an API key is configured and falls back to a local
+        extractive summary (the opening of each user question) otherwise.
+        """
+        if self.api_key:
+            transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+            messages = [
+                {'role': 'system', 'content': (
+                    "Summarize this conversation between a customer and the EventAura venue "
+                    "booking assistant. Keep names, dates, venues, head counts, prices and open "
+                    f"requests. Reply with the summary only, under {max_chars} characters."
+                )},
+                {'role': 'user', 'content': f"Summary so far:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"},
+            ]
+            payload = self._build_payload(messages)
+            payload['max_tokens'] = 300
+            payload['temperature'] = 0.2
+            try:
+                response = send_with_retries(
+                    lambda: get_http_session().post(
+                        self.api_url,
+                        headers=self.get_headers(),
+                        json=payload,
+                        timeout=get_request_timeout()
+                    ),
+                    get_openrouter_breaker(),
+                    **_retry_options()
+                )
+                response.raise_for_status()
+                return self._parse_completion(response.json()).strip()[:max_chars]
+            except Exception as e:
+                print(f"OpenRouter summary error: {str(e)}")
+        
+        lines = [previous_summary] if previous_summary else []
+        for turn in turns:
+            if turn['role'] == 'user':
+                lines.append(f"- User asked: {turn['content'][:150]}")
+        # Keep the most recent part when the summary outgrows its budget
+        return "\n".join(lines)[-max_chars:]
+    
+    def _get_database_context(self, message, intents=None):
         """Get relevant database information based on the message"""
-        message_lower = message.lower()
+        if intents is None:
+            intents = detect_intents(message)
         context = []
         
         try:
+            # Catalog topics come from the cached snapshot; only the live
+            # booking list is queried per message
+            blocks = get_context_snapshot()['blocks']
+            
             # Get venue information
-            if any(word in message_lower for word in ['venue', 'space', 'hall', 'room', 'available', 'list', 'auditorium', 'conference', 'amphitheatre', 'library', 'exhibition']):
-                venues = Venue.objects.filter(status='active')
-                if venues.exists():
-                    context.append("🏛️ Available Venues at JTCC:")
-                    for venue in venues:
-                        context.append(f"\n📍 {venue.venue_name}")
-                        context.append(f"   Capacity: {venue.capacity} people")
-                        context.append(f"   Description: {venue.description[:200]}...")
-                        
-                        # Get pricing for this venue
-                        price_tiers = PriceTier.objects.filter(venue=venue).order_by('duration')
-                        if price_tiers.exists():
-                            context.append("   💰 Pricing:")
-                            for tier in price_tiers:
-                                context.append(f"      {tier.duration}h: LKR {tier.price:,.2f}")
-                else:
-                    context.append("No venues currently available.")
+            if intents & {'venue', 'availability'}:
+                context.append(blocks['venues'])
+            
+            # Free windows for "when is X free for N hours" questions
+            if intents & {'availability', 'booking'}:
+                free_windows = render_free_windows_block(message)
+                if free_windows:
+                    context.append(free_windows)
             
             # Get booking information
-            if any(word in message_lower for word in ['booking', 'booked', 'reservation', 'schedule', 'book']):
+            if 'booking' in intents:
                 recent_bookings = Booking.objects.filter(
                     created_at__gte=datetime.now() - timedelta(days=7)
                 ).order_by('-created_at')[:5]
@@ -123,51 +766,29 @@ class OpenRouterService:
                     context.append("No recent bookings found.")
             
             # Get pricing information
-            if any(word in message_lower for word in ['price', 'cost', 'rate', 'fee', 'pricing', 'how much']):
-                venues = Venue.objects.filter(status='active')
-                if venues.exists():
-                    context.append("💰 Venue Pricing:")
-                    for venue in venues:
-                        context.append(f"\n📍 {venue.venue_name}:")
-                        price_tiers = PriceTier.objects.filter(venue=venue).order_by('duration')
-                        for tier in price_tiers:
-                            context.append(f"   {tier.duration}h: LKR {tier.price:,.2f}")
+            if 'pricing' in intents:
+                if blocks['pricing']:
+                    context.append(blocks['pricing'])
             
             # Get capacity information
-            if any(word in message_lower for word in ['capacity', 'people', 'size', 'large', 'small', 'how many']):
-                venues = Venue.objects.filter(status='active').order_by('capacity')
-                if venues.exists():
-                    context.append("👥 Venue Capacities:")
-                    for venue in venues:
-                        context.append(f"- {venue.venue_name}: {venue.capacity} people")
+            if 'capacity' in intents:
+                if blocks['capacity']:
+                    context.append(blocks['capacity'])
             
             # Get additional services
-            if any(word in message_lower for word in ['service', 'amenities', 'sound', 'lighting', 'catering', 'security', 'cleaning']):
-                services = AdditionalService.objects.all()
-                if services.exists():
-                    context.append("🔧 Additional Services:")
-                    for service in services:
-                        mandatory = " (Required)" if service.is_mandatory else ""
-                        context.append(f"- {service.service_name}{mandatory}: LKR {service.basic_rate:,.2f} + LKR {service.extra_hourly_rate:,.2f}/hour")
+            if 'services' in intents:
+                if blocks['services']:
+                    context.append(blocks['services'])
             
             # Get JTCC information
-            if any(word in message_lower for word in ['jtcc', 'centre', 'center', 'about', 'information', 'history']):
-                jtcc_info = JTCCHistory.objects.first()
-                if jtcc_info:
-                    context.append("🏛️ About JTCC:")
-                    context.append(f"Official Name: {jtcc_info.official_name}")
-                    context.append(f"Location: {jtcc_info.location}")
-                    context.append(f"Description: {jtcc_info.description[:300]}...")
-                    context.append(f"Facilities: {jtcc_info.facilities}")
+            if 'about' in intents:
+                if blocks['about']:
+                    context.append(blocks['about'])
             
             # Get contact information
-            if any(word in message_lower for word in ['contact', 'phone', 'email', 'call', 'reach']):
-                contact = Contact.objects.first()
-                if contact:
-                    context.append("📞 Contact Information:")
-                    context.append(f"Phone: {contact.phone_number}")
-                    context.append(f"Email: {contact.email}")
-                    context.append(f"Available: {contact.available_time}")
+            if 'contact' in intents:
+                if blocks['contact']:
+                    context.append(blocks['contact'])
             
         except Exception as e:
             print(f"Error getting database context: {str(e)}")
@@ -175,69 +796,70 @@ class OpenRouterService:
         
         return "\n".join(context) if context else "No specific database information available."
     
-    def _get_enhanced_fallback_response(self, message, db_context):
+    def _get_enhanced_fallback_response(self, message, db_context, intents=None):
         """Provide enhanced fallback responses with database information"""
-        message_lower = message.lower()
+        if intents is None:
+            intents = detect_intents(message)
         
         # Venue-related queries
-        if any(word in message_lower for word in ['venue', 'space', 'hall', 'room', 'auditorium', 'conference', 'amphitheatre', 'library', 'exhibition']):
+        if 'venue' in intents:
             if "🏛️ Available Venues at JTCC:" in db_context:
                 return f"🏛️ Welcome to Jaffna Thiruvalluvar Cultural Centre! Here are our available venues:\n\n{db_context}\n\nWhich venue interests you most? I can provide more details about any of these spaces!"
             else:
                 return "🏛️ I can help you with venue bookings at JTCC! We have various spaces available including auditoriums, conference halls, and outdoor areas. What type of event are you planning?"
         
         # Pricing queries
-        elif any(word in message_lower for word in ['price', 'cost', 'rate', 'fee', 'pricing', 'how much', 'expensive', 'cheap']):
+        elif 'pricing' in intents:
             if "💰 Venue Pricing:" in db_context:
                 return f"💰 Here are our current venue rates:\n\n{db_context}\n\nAll prices are in Sri Lankan Rupees (LKR). Would you like more specific pricing information for a particular venue or duration?"
             else:
                 return "💰 Our venue pricing varies based on size, duration, and amenities. We offer flexible pricing from 2-hour sessions to full-day events. What type of event are you planning?"
         
         # Booking queries
-        elif any(word in message_lower for word in ['book', 'reserve', 'schedule', 'booking', 'reservation']):
+        elif 'booking' in intents:
             return "📅 Great! I'd be happy to help you book a venue at JTCC. To get started, I'll need to know:\n• What type of event?\n• How many people?\n• Preferred date and time?\n• Which venue interests you?\n\nYou can also ask me about availability for specific dates!"
         
         # Availability queries
-        elif any(word in message_lower for word in ['availability', 'available', 'free', 'open', 'when']):
+        elif 'availability' in intents:
             if "🏛️ Available Venues at JTCC:" in db_context:
                 return f"📅 Here are our available venues:\n\n{db_context}\n\nPlease let me know the date and time you're interested in, and I can check specific availability for that period!"
             else:
                 return "📅 I can check venue availability for you! Please let me know the date and time you're interested in, and I'll show you what's available at JTCC."
         
         # Capacity queries
-        elif any(word in message_lower for word in ['capacity', 'people', 'size', 'large', 'small', 'how many', 'accommodate']):
+        elif 'capacity' in intents:
             if "👥 Venue Capacities:" in db_context:
                 return f"👥 Here are our venue capacities:\n\n{db_context}\n\nWhat size event are you planning? I can recommend the best venue based on your guest count!"
             else:
                 return "👥 Our venues have different capacities ranging from intimate gatherings to large events. What size event are you planning? I can help you find the perfect space!"
         
         # Services queries
-        elif any(word in message_lower for word in ['service', 'amenities', 'sound', 'lighting', 'catering', 'security', 'cleaning', 'include']):
+        elif 'services' in intents:
             if "🔧 Additional Services:" in db_context:
                 return f"🔧 Here are our additional services:\n\n{db_context}\n\nThese services can enhance your event experience. Which services are you interested in?"
             else:
                 return "🔧 We offer various additional services including sound systems, lighting, catering, security, and more. What services would you like to know about?"
         
         # JTCC information queries
-        elif any(word in message_lower for word in ['jtcc', 'centre', 'center', 'about', 'information', 'history', 'what is']):
+        elif 'about' in intents:
             if "🏛️ About JTCC:" in db_context:
                 return f"🏛️ Here's information about our cultural centre:\n\n{db_context}\n\nIs there anything specific about JTCC you'd like to know more about?"
             else:
                 return "🏛️ Jaffna Thiruvalluvar Cultural Centre (JTCC) is a modern cultural facility promoting cultural exchange and community development. We offer various venues for events, conferences, and cultural activities. What would you like to know about us?"
         
         # Contact queries
-        elif any(word in message_lower for word in ['contact', 'phone', 'email', 'call', 'reach', 'speak', 'talk']):
+        elif 'contact' in intents:
             if "📞 Contact Information:" in db_context:
                 return f"📞 Here's how you can reach us:\n\n{db_context}\n\nFeel free to contact us for any questions or to make a booking!"
             else:
                 return "📞 You can contact us at +94 21 222 1234 or info@jtcc.lk. We're available Monday to Friday, 9:00 AM - 5:00 PM. How can I help you today?"
         
         # Greeting
-        elif any(word in message_lower for word in ['hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening']):
+        elif 'greeting' in intents:
             return "👋 Hello! Welcome to Jaffna Thiruvalluvar Cultural Centre (JTCC)! I'm your virtual assistant and I'm here to help you with:\n• Venue bookings and reservations\n• Pricing information\n• Event planning assistance\n• Information about our facilities\n\nHow can I assist you today?"
         
         # Help queries
-        elif any(word in message_lower for word in ['help', 'what can you do', 'assist', 'support']):
+        elif 'help' in intents:
             return "🤝 I'm here to help you with everything related to JTCC! I can assist you with:\n\n🏛️ **Venue Information** - Details about our auditoriums, conference halls, and outdoor spaces\n💰 **Pricing** - Rates for different venues and durations\n📅 **Bookings** - Help you reserve venues for your events\n🔧 **Services** - Information about additional services like catering, sound, lighting\n📞 **Contact** - How to reach us\n\nWhat would you like to know about?"
         
         # Default response
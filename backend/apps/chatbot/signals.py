@@ -0,0 +1,67 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from apps.chatbot.availability import get_venue_interval_index
+from apps.chatbot.context import invalidate_context_snapshot
+from apps.chatbot.models import (
+    Venue, PriceTier, AdditionalService, JTCCHistory, Contact, Booking, BookingSlot, PreArrangement,
+)
+from apps.chatbot.occupancy import get_occupancy_calendar
+
+
+# Models whose rows are rendered into the chatbot context snapshot
+CONTEXT_SOURCE_MODELS = (Venue, PriceTier, AdditionalService, JTCCHistory, Contact)
+
+
+def refresh_availability_for_slot(sender, instance, **kwargs):
+    """Update the venue interval index and occupancy calendar once the slot change is committed."""
+    slot_id = instance.pk
+
+    def refresh():
+        get_venue_interval_index().refresh_slot(slot_id)
+        get_occupancy_calendar().refresh_slot(slot_id)
+
+    transaction.on_commit(refresh)
+
+
+def refresh_availability_for_booking(sender, instance, **kwargs):
+    """A booking's status decides whether its slots count as booked."""
+    booking_id = instance.pk
+
+    def refresh():
+        get_venue_interval_index().refresh_booking(booking_id)
+        get_occupancy_calendar().refresh_booking(booking_id)
+
+    transaction.on_commit(refresh)
+
+
+def refresh_occupancy_for_arrangement(sender, instance, **kwargs):
+    """Update the occupancy calendar once a setup/rehearsal/breakdown window change is committed."""
+    arrangement_id = instance.pk
+    transaction.on_commit(lambda: get_occupancy_calendar().refresh_arrangement(arrangement_id))
+
+
+def connect_signals():
+    """Wire model signals to the chatbot caches. Called from ChatbotConfig.ready()."""
+    for model in CONTEXT_SOURCE_MODELS:
+        post_save.connect(
+            invalidate_context_snapshot,
+            sender=model,
+            dispatch_uid=f'chatbot_context_save_{model.__name__}',
+        )
+        post_delete.connect(
+            invalidate_context_snapshot,
+            sender=model,
+            dispatch_uid=f'chatbot_context_delete_{model.__name__}',
+        )
+
+    post_save.connect(refresh_availability_for_slot, sender=BookingSlot,
+                      dispatch_uid='chatbot_availability_slot_save')
+    post_delete.connect(refresh_availability_for_slot, sender=BookingSlot,
+                        dispatch_uid='chatbot_availability_slot_delete')
+    post_save.connect(refresh_availability_for_booking, sender=Booking,
+                      dispatch_uid='chatbot_availability_booking_save')
+    post_save.connect(refresh_occupancy_for_arrangement, sender=PreArrangement,
+                      dispatch_uid='chatbot_occupancy_arrangement_save')
+    post_delete.connect(refresh_occupancy_for_arrangement, sender=PreArrangement,
+                        dispatch_uid='chatbot_occupancy_arrangement_delete')
@@ -0,0 +1,184 @@
+"""
+Search for the earliest free windows of a given length.
+
+Answers "when is the auditorium free for 4 hours next week": for every venue
+that offers a price tier of the requested duration (optionally restricted to
+given venues or a minimum capacity) the busy intervals of each day, booked
+slots plus setup/rehearsal/breakdown windows, are swept in start order within
+opening hours, and the gaps long enough for the duration become candidate
+windows. The per-venue candidates are merged by start time and the first
+``limit`` returned. A search costs two queries: the matching venues and one
+UNION over their slots and pre-arrangements in the horizon. Venue names in
+the message are matched against the cached context snapshot, not the
+database.
+"""
+import heapq
+import re
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from apps.chatbot.availability import occupancy_rows
+from apps.chatbot.context import mentioned_venue_ids
+from apps.chatbot.models import Venue
+
+
+MINUTES_PER_DAY = 24 * 60
+
+_DURATION_PATTERN = re.compile(r'(\d{1,2})\s*-?\s*(?:hours?|hrs?|h)\b')
+_CAPACITY_PATTERN = re.compile(r'(\d{2,5})\s*(?:people|persons|guests|pax|attendees)\b')
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _busy_minutes(row):
+    """(start, end) minutes of a busy row on each day it covers."""
+    if row['row_full_day']:
+        return 0, MINUTES_PER_DAY
+    start = _minutes(row['row_start_time'])
+    end = _minutes(row['row_end_time'])
+    # A window ending at or before its start runs to midnight
+    return start, end if end > start else MINUTES_PER_DAY
+
+
+def _opening_minutes():
+    return (
+        getattr(settings, 'CHATBOT_VENUE_OPENING_HOUR', 8) * 60,
+        getattr(settings, 'CHATBOT_VENUE_CLOSING_HOUR', 22) * 60,
+    )
+
+
+def _venue_windows(venue, busy, start, days, duration, earliest):
+    """Yield ``(start_datetime, venue, free_until)`` in time order for one venue."""
+    opening, closing = _opening_minutes()
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        cursor = opening
+        if day == earliest.date():
+            # Never offer a window that has already started today
+            cursor = max(cursor, -(-_minutes(earliest.time()) // 60) * 60)
+        intervals = sorted(busy.get(day, ()))
+        for busy_start, busy_end in intervals + [(closing, closing)]:
+            if busy_start >= closing:
+                busy_start = closing
+            if busy_start - cursor >= duration:
+                yield datetime.combine(day, time()) + timedelta(minutes=cursor), venue, busy_start
+            cursor = max(cursor, busy_end)
+            if cursor >= closing:
+                break
+
+
+def find_free_windows(duration_hours, venue_ids=None, min_capacity=None, start=None,
+                      horizon_days=14, limit=5):
+    """Earliest ``limit`` free windows of ``duration_hours`` hours.
+
+    Only venues with a price tier of exactly ``duration_hours`` are searched.
+    ``start`` is the first day to search (today by default); windows on
+    today start after the current time. Returns a list of dicts with
+    ``venue_id``, ``venue_name``, ``capacity``, ``date``, ``start_time``,
+    ``end_time`` and ``free_until`` (end of the gap the window opens).
+    """
+    now = timezone.localtime()
+    start = start or now.date()
+    venues = Venue.objects.filter(status='active', price_tiers__duration=duration_hours)
+    if venue_ids is not None:
+        venues = venues.filter(venue_id__in=venue_ids)
+    if min_capacity:
+        venues = venues.filter(capacity__gte=min_capacity)
+    venues = {
+        venue_id: {'venue_id': venue_id, 'venue_name': name, 'capacity': capacity}
+        for venue_id, name, capacity in venues.values_list('venue_id', 'venue_name', 'capacity').distinct()
+    }
+    if not venues:
+        return []
+
+    end = start + timedelta(days=horizon_days - 1)
+    busy = {venue_id: {} for venue_id in venues}
+    for row in occupancy_rows(list(venues), start, end):
+        interval = _busy_minutes(row)
+        day = max(row['row_first_day'], start)
+        last_day = min(row['row_last_day'], end)
+        while day <= last_day:
+            busy[row['row_venue']].setdefault(day, []).append(interval)
+            day += timedelta(days=1)
+
+    duration = duration_hours * 60
+    earliest = now.replace(tzinfo=None)
+    candidates = heapq.merge(
+        *(_venue_windows(venue_id, busy[venue_id], start, horizon_days, duration, earliest)
+          for venue_id in sorted(venues)),
+        key=lambda candidate: (candidate[0], candidate[1]),
+    )
+    windows = []
+    for window_start, venue_id, free_until in candidates:
+        if len(windows) == limit:
+            break
+        windows.append({
+            **venues[venue_id],
+            'date': window_start.date().isoformat(),
+            'start_time': window_start.strftime('%H:%M'),
+            'end_time': (window_start + timedelta(minutes=duration)).strftime('%H:%M'),
+            'free_until': f"{free_until // 60:02d}:{free_until % 60:02d}",
+        })
+    return windows
+
+
+def parse_slot_request(message):
+    """Extract the search a chat message asks for.
+
+    Returns a dict with ``duration_hours`` (None when the message names no
+    duration), ``min_capacity``, ``start`` and ``horizon_days``.
+    """
+    text = message.lower()
+    duration = _DURATION_PATTERN.search(text)
+    capacity = _CAPACITY_PATTERN.search(text)
+    today = timezone.localdate()
+    if 'next week' in text:
+        start, horizon_days = today + timedelta(days=7 - today.weekday()), 7
+    elif 'this week' in text:
+        start, horizon_days = today, 7 - today.weekday()
+    elif 'tomorrow' in text:
+        start, horizon_days = today + timedelta(days=1), 1
+    elif 'today' in text:
+        start, horizon_days = today, 1
+    else:
+        start, horizon_days = today, 14
+    return {
+        'duration_hours': int(duration.group(1)) if duration else None,
+        'min_capacity': int(capacity.group(1)) if capacity else None,
+        'start': start,
+        'horizon_days': horizon_days,
+    }
+
+
+def match_venue_ids(message):
+    """Ids of active venues the message names, or None if it names none."""
+    return mentioned_venue_ids(message) or None
+
+
+def render_free_windows_block(message, limit=5):
+    """Context block with the free windows a message asks about, or None."""
+    request = parse_slot_request(message)
+    if request['duration_hours'] is None:
+        return None
+    duration = request['duration_hours']
+    windows = find_free_windows(
+        duration,
+        venue_ids=match_venue_ids(message),
+        min_capacity=request['min_capacity'],
+        start=request['start'],
+        horizon_days=request['horizon_days'],
+        limit=limit,
+    )
+    if not windows:
+        return f"🕒 No venue with a {duration}-hour package is free for {duration} hours in the requested period."
+    lines = [f"🕒 Earliest free {duration}-hour windows:"]
+    for window in windows:
+        lines.append(
+            f"- {window['venue_name']}: {window['date']} {window['start_time']}-{window['end_time']}"
+            f" (free until {window['free_until']})"
+        )
+    return "\n".join(lines)
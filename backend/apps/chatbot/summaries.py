@@ -0,0 +1,94 @@
+"""
+Rolling per-session conversation summaries.
+
+Every CHATBOT_SUMMARY_EVERY new messages a background thread folds the
+session's older messages into ChatSession.summary, leaving the newest
+CHATBOT_SUMMARY_KEEP_RECENT messages verbatim. Prompt assembly then needs the
+summary plus a short tail of ChatMessage rows instead of the whole transcript.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+
+from apps.chatbot.chat_sessions import forget_session
+from apps.chatbot.history import SENDER_ROLES
+from apps.chatbot.models import ChatSession, ChatMessage
+
+
+def _pending_key(session_id):
+    return f'chatbot:summary:pending:{session_id}'
+
+
+def _lock_key(session_id):
+    return f'chatbot:summary:lock:{session_id}'
+
+
+def refresh_session_summary(session_id):
+    """Fold messages older than the verbatim tail into the session summary."""
+    keep_recent = getattr(settings, 'CHATBOT_SUMMARY_KEEP_RECENT', 6)
+    max_chars = getattr(settings, 'CHATBOT_SUMMARY_MAX_CHARS', 2000)
+
+    session = ChatSession.objects.only('user_id', 'summary', 'summary_through_id').get(id=session_id)
+    messages = ChatMessage.objects.filter(session_id=session_id, sender_type__in=SENDER_ROLES)
+    if session.summary_through_id:
+        messages = messages.filter(id__gt=session.summary_through_id)
+    rows = list(messages.order_by('id').values_list('id', 'sender_type', 'content'))
+
+    to_fold = rows[:-keep_recent] if keep_recent else rows
+    if not to_fold:
+        return False
+
+    from apps.chatbot.services import OpenRouterService
+
+    turns = [{'role': SENDER_ROLES[sender_type], 'content': content} for _, sender_type, content in to_fold]
+    summary = OpenRouterService().summarize_conversation(session.summary, turns, max_chars=max_chars)
+    # update() rather than save() so updated_at and concurrent writes are untouched
+    ChatSession.objects.filter(id=session_id).update(
+        summary=summary,
+        summary_through_id=to_fold[-1][0],
+    )
+    # The cached session carries the old summary
+    forget_session(session.user_id)
+    return True
+
+
+def _refresh_in_background(session_id):
+    close_old_connections()
+    try:
+        refresh_session_summary(session_id)
+    except Exception as e:
+        print(f"Error refreshing summary for session {session_id}: {str(e)}")
+    finally:
+        cache.delete(_lock_key(session_id))
+        connection.close()
+
+
+def note_new_messages(session_id, count=2):
+    """Record ``count`` new messages and refresh the summary every K messages.
+
+    Only touches the cache on the request path; the refresh itself runs in
+    a daemon thread, and at most one refresh per session runs at a time.
+    """
+    every = getattr(settings, 'CHATBOT_SUMMARY_EVERY', 10)
+    if not every:
+        return
+
+    key = _pending_key(session_id)
+    cache.add(key, 0, timeout=None)
+    try:
+        pending = cache.incr(key, count)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, count, timeout=None)
+        pending = count
+
+    if pending >= every and cache.add(_lock_key(session_id), True, timeout=300):
+        cache.set(key, 0, timeout=None)
+        threading.Thread(
+            target=_refresh_in_background,
+            args=(session_id,),
+            name=f'chat-summary-{session_id}',
+            daemon=True,
+        ).start()
@@ -0,0 +1,1175 @@
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import threading
+from datetime import time, timedelta
+from decimal import Decimal
+from unittest import mock
+
+import httpx
+import requests
+import urllib3
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from apps.chatbot import services
+from apps.chatbot.archive import archive_idle_sessions, rehydrate_session
+from apps.chatbot.availability import (
+    ARRANGEMENT, BOOKED, FREE, GENERATION_CACHE_KEY as AVAILABILITY_GENERATION_KEY, VenueIntervalIndex,
+    bump_shared_generation, occupancy_matrix,
+)
+from apps.chatbot.context import build_context_snapshot, get_context_snapshot
+from apps.chatbot.fast_path import fast_path_intent, score_turn
+from apps.chatbot.intents import detect_intents
+from apps.chatbot.models import (
+    Applicant, ArchivedChatSession, Booking, BookingSlot, ChatSession, ChatMessage, PreArrangement, PriceTier, Venue,
+)
+from apps.chatbot.occupancy import GENERATION_CACHE_KEY as OCCUPANCY_GENERATION_KEY, OccupancyCalendar
+from apps.chatbot.response_cache import get_response_cache
+from apps.chatbot.resilience import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, send_with_retries,
+)
+from apps.chatbot.routing import get_hedge_model, get_latency_tracker, hedged_completion, select_model
+from apps.chatbot.semantic_cache import SemanticCache
+from apps.chatbot.services import OpenRouterService, get_async_http_client
+from apps.chatbot.slot_finder import find_free_windows, match_venue_ids
+from apps.chatbot.transcripts import TranscriptWriter, shutdown_transcript_writer
+
+
+class ContextSnapshotQueryTests(TestCase):
+    """The context builder must not issue per-venue queries."""
+
+    def _create_venues(self, count):
+        for i in range(count):
+            venue = Venue.objects.create(
+                venue_name=f"Hall {Venue.objects.count() + 1}",
+                capacity=50 * (i + 1),
+                description="Test venue",
+            )
+            for duration, price in ((2, '1000.00'), (4, '1800.00'), (6, '2500.00')):
+                PriceTier.objects.create(venue=venue, duration=duration, price=Decimal(price))
+
+    def test_query_count_is_independent_of_venue_count(self):
+        self._create_venues(1)
+        # venues, prefetched price tiers, services, JTCC history, contact
+        with self.assertNumQueries(5):
+            build_context_snapshot()
+
+        self._create_venues(10)
+        with self.assertNumQueries(5):
+            snapshot = build_context_snapshot()
+
+        self.assertEqual(snapshot['blocks']['pricing'].count('📍'), 11)
+
+    def test_price_tiers_are_ordered_by_duration(self):
+        venue = Venue.objects.create(venue_name="Main Auditorium", capacity=600, description="Main hall")
+        PriceTier.objects.create(venue=venue, duration=6, price=Decimal('2500.00'))
+        PriceTier.objects.create(venue=venue, duration=2, price=Decimal('1000.00'))
+
+        pricing = build_context_snapshot()['blocks']['pricing']
+
+        self.assertLess(pricing.index('2h: LKR 1,000.00'), pricing.index('6h: LKR 2,500.00'))
+
+    def test_saving_a_venue_or_price_tier_invalidates_the_cached_snapshot(self):
+        cache.clear()
+        venue = Venue.objects.create(venue_name="Main Auditorium", capacity=600, description="Main hall")
+        tier = PriceTier.objects.create(venue=venue, duration=4, price=Decimal('1800.00'))
+        version = get_context_snapshot()['version']
+        with self.assertNumQueries(0):
+            get_context_snapshot()
+
+        venue.capacity = 450
+        venue.save()
+        snapshot = get_context_snapshot()
+        self.assertIn('450', snapshot['blocks']['capacity'])
+        self.assertNotEqual(snapshot['version'], version)
+
+        tier.price = Decimal('2000.00')
+        tier.save()
+        self.assertIn('4h: LKR 2,000.00', get_context_snapshot()['blocks']['pricing'])
+
+        tier.delete()
+        self.assertNotIn('4h:', get_context_snapshot()['blocks']['pricing'])
+
+
+@override_settings(OPENROUTER_API_KEY='', CHATBOT_SUMMARY_EVERY=0)
+class ChatTurnQueryTests(TransactionTestCase):
+    """A chat turn with warm caches must cost a fixed number of statements."""
+
+    def setUp(self):
+        cache.clear()
+
+    def _send(self, message, **data):
+        data.setdefault('user_id', 'alice')
+        return self.client.post('/api/chatbot/chat/', {'message': message, **data}, content_type='application/json')
+
+    def _statements(self, captured):
+        # Transaction control is logged by some backends (SQLite) and not others
+        return [
+            query['sql'] for query in captured.captured_queries
+            if query['sql'].split()[0].upper() not in ('BEGIN', 'COMMIT', 'SAVEPOINT', 'RELEASE')
+        ]
+
+    def test_warm_chat_turn_statement_count(self):
+        # Cold turn: bootstraps the user, the session and the context snapshot
+        self._send('hello')
+
+        with CaptureQueriesContext(connection) as captured:
+            response = self._send('hello again')
+
+        # history read, session updated_at bump, user message, bot reply
+        statements = self._statements(captured)
+        self.assertEqual(len(statements), 4, statements)
+        self.assertTrue(statements[1].startswith('UPDATE'))
+        self.assertTrue(statements[2].startswith('INSERT'))
+        self.assertTrue(statements[3].startswith('INSERT'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ChatSession.objects.count(), 1)
+        self.assertEqual(ChatMessage.objects.count(), 4)
+        self.assertEqual(response.json()['session_id'], ChatSession.objects.get().id)
+        self.assertEqual(response.json()['message_id'], ChatMessage.objects.filter(sender_type='admin').latest('id').id)
+
+    def test_statement_count_does_not_grow_with_session_length(self):
+        for i in range(5):
+            self._send(f'hello {i}')
+
+        with CaptureQueriesContext(connection) as captured:
+            self._send('hello once more')
+
+        self.assertEqual(len(self._statements(captured)), 4)
+
+    def test_guest_turn_also_reads_the_cookie_session(self):
+        self._send('hello', user_id='')
+
+        with CaptureQueriesContext(connection) as captured:
+            self._send('hello again', user_id='')
+
+        statements = self._statements(captured)
+        self.assertEqual(len(statements), 5, statements)
+        self.assertIn('django_session', statements[0])
+        self.assertEqual(ChatSession.objects.count(), 1)
+        self.assertTrue(ChatSession.objects.get().user_id.startswith('guest-'))
+
+    def test_callers_get_their_own_sessions(self):
+        alice = self._send('hello').json()['session_id']
+        bob = self._send('hello', user_id='bob').json()['session_id']
+        # Another caller's session_id is not honoured
+        self.assertEqual(self._send('hello', user_id='bob', session_id=alice).json()['session_id'], bob)
+        self.assertEqual(self._send('hello', session_id=alice).json()['session_id'], alice)
+
+        self.assertNotEqual(alice, bob)
+        self.assertEqual(ChatSession.objects.get(id=alice).user_id, 'alice')
+        self.assertEqual(ChatMessage.objects.filter(session_id=alice).count(), 4)
+        self.assertEqual(ChatMessage.objects.filter(session_id=bob).count(), 4)
+
+    def test_session_id_selects_one_of_the_callers_sessions(self):
+        older = ChatSession.objects.create(user_id='alice')
+        latest = ChatSession.objects.create(user_id='alice')
+        ChatSession.objects.filter(id=older.id).update(updated_at=timezone.now() - timedelta(days=1))
+
+        self.assertEqual(self._send('hello').json()['session_id'], latest.id)
+        self.assertEqual(self._send('back to the first one', session_id=older.id).json()['session_id'], older.id)
+        self.assertEqual(ChatMessage.objects.filter(session_id=older.id).count(), 2)
+
+    def test_deleted_session_is_recreated(self):
+        first = self._send('hello').json()['session_id']
+        ChatSession.objects.filter(id=first).delete()
+
+        response = self._send('hello again')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.json()['session_id'], first)
+        self.assertEqual(ChatMessage.objects.filter(session_id=response.json()['session_id']).count(), 2)
+
+    def test_write_behind_turn_is_written_by_the_background_writer(self):
+        with tempfile.TemporaryDirectory() as spool_dir, override_settings(
+            CHATBOT_WRITE_BEHIND=True,
+            CHATBOT_WRITE_BEHIND_SPOOL=os.path.join(spool_dir, 'spool.jsonl'),
+        ):
+            response = self._send('hello')
+            shutdown_transcript_writer()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['message_id'])
+        self.assertEqual(
+            list(ChatMessage.objects.order_by('id').values_list('sender_type', flat=True)), ['user', 'admin']
+        )
+
+    def test_user_message_survives_a_failed_completion(self):
+        with mock.patch.object(OpenRouterService, 'generate_response', side_effect=RuntimeError('upstream down')):
+            response = self._send('is anyone there')
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(
+            list(ChatMessage.objects.values_list('sender_type', 'content')),
+            [('user', 'is anyone there')],
+        )
+
+
+class IntentDetectionTests(SimpleTestCase):
+    """Keyword intents and the fallback answer they select."""
+
+    def test_keywords_match_whole_words_and_phrases(self):
+        self.assertEqual(detect_intents('How much is the auditorium?'), {'pricing', 'venue'})
+        self.assertEqual(detect_intents('this is great'), frozenset())
+        self.assertEqual(detect_intents('Good   morning'), {'greeting'})
+        self.assertEqual(detect_intents('வணக்கம்'), {'greeting'})
+
+    def test_generic_verbs_carry_no_intent(self):
+        self.assertEqual(detect_intents('list the prices'), {'pricing'})
+        self.assertEqual(detect_intents('list your services'), {'services'})
+        self.assertEqual(detect_intents('what is the capacity'), {'capacity'})
+
+    def test_fallback_answers_the_topic_not_the_verb(self):
+        service = OpenRouterService()
+        for message, opening in (
+            ('list the prices', '💰'),
+            ('list your services', '🔧'),
+            ('list the venues', '🏛️'),
+            ('what is the phone number', '📞'),
+        ):
+            with self.subTest(message=message):
+                self.assertTrue(service._get_enhanced_fallback_response(message, '').startswith(opening))
+
+
+class ResponseCachingTests(TestCase):
+    """Which turns may be answered from the answer caches."""
+
+    def setUp(self):
+        cache.clear()
+        self.service = OpenRouterService()
+
+    def _version(self, message, history=None):
+        return self.service._get_cache_version(history, detect_intents(message))
+
+    def test_catalog_questions_are_cached_under_the_snapshot_version(self):
+        self.assertEqual(self._version('what are your prices'), build_context_snapshot()['version'])
+
+    def test_live_data_questions_are_not_cached(self):
+        self.assertIsNone(self._version('is the auditorium available tomorrow'))
+        self.assertIsNone(self._version('when is the hall free for 4 hours'))
+        self.assertIsNone(self._version('I want to book the seminar room'))
+
+    def test_turns_with_live_free_windows_are_not_cached(self):
+        message = 'when is the auditorium free for 4 hours'
+        with mock.patch('apps.chatbot.services.render_free_windows_block', return_value='🕒 windows') as render:
+            self.assertIn('🕒 windows', self.service._get_database_context(message))
+        render.assert_called_once_with(message)
+        self.assertIsNone(self._version(message))
+
+    def test_follow_up_turns_are_not_cached(self):
+        self.assertIsNone(self._version('what are your prices', [{'role': 'user', 'content': 'hi'}]))
+
+
+class SemanticCacheTests(TestCase):
+    """Paraphrases hit; questions about other dates, venues or amounts miss."""
+
+    def setUp(self):
+        cache.clear()
+        for name in ('Main Auditorium', 'Conference Hall', 'Exhibition Hall'):
+            Venue.objects.create(venue_name=name, capacity=100, description="Test venue")
+
+    def _hits(self, asked, paraphrase):
+        semantic_cache = SemanticCache(max_entries=8, threshold=0.85, dim=1024)
+        semantic_cache.set(asked, 'v1', 'answer')
+        return semantic_cache.get(paraphrase, 'v1') == 'answer'
+
+    def test_paraphrases_hit(self):
+        for asked, paraphrase in (
+            ('what is the price of the auditorium', 'how much does the auditorium cost'),
+            ('auditorium price?', 'cost of main auditorium'),
+            ('what are the prices of your venues', 'what are the prices for your venues'),
+            ('tell me about jtcc', 'tell me about the jtcc'),
+        ):
+            with self.subTest(asked=asked, paraphrase=paraphrase):
+                self.assertTrue(self._hits(asked, paraphrase))
+
+    def test_different_questions_miss(self):
+        for asked, other in (
+            ('can i book the main hall for a wedding in june', 'can i book the main hall for a wedding in july'),
+            ('is the hall free monday evening', 'is the hall free tuesday evening'),
+            ('is the auditorium free today', 'is the auditorium free tomorrow'),
+            ('price of conference hall', 'price of exhibition hall'),
+            ('how much for 4 hours', 'how much for 6 hours'),
+            ('do you offer catering', 'do you offer lighting'),
+            ('what are your prices', 'what are your services'),
+        ):
+            with self.subTest(asked=asked, other=other):
+                self.assertFalse(self._hits(asked, other))
+
+    def test_entries_of_another_context_version_miss(self):
+        semantic_cache = SemanticCache(max_entries=8)
+        semantic_cache.set('what are your prices', 'v1', 'answer')
+        self.assertIsNone(semantic_cache.get('what are your prices', 'v2'))
+
+
+class TranscriptWriterTests(TestCase):
+    """Batch writes, spool retries and deleted sessions, without the thread."""
+
+    def setUp(self):
+        self.spool_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.spool_dir.cleanup)
+        self.writer = TranscriptWriter(os.path.join(self.spool_dir.name, 'spool.jsonl'), replay_interval=0)
+        self.session = ChatSession.objects.create(user_id='alice')
+
+    def _turn(self, session_id):
+        return [
+            {'session_id': session_id, 'user_id': 'alice', 'sender_type': 'user', 'content': 'hi'},
+            {'session_id': session_id, 'user_id': 'alice', 'sender_type': 'admin', 'content': 'hello'},
+        ]
+
+    def test_batch_is_written(self):
+        self.writer._flush(self._turn(self.session.id))
+        self.assertEqual(ChatMessage.objects.filter(session=self.session).count(), 2)
+
+    def test_deleted_session_is_recreated_for_its_user(self):
+        deleted_id = self.session.id
+        self.session.delete()
+
+        self.writer._flush(self._turn(deleted_id))
+
+        session = ChatSession.objects.get(user_id='alice')
+        self.assertNotEqual(session.id, deleted_id)
+        self.assertEqual(ChatMessage.objects.filter(session=session).count(), 2)
+
+    def test_spooled_batch_is_retried_while_running(self):
+        with mock.patch.object(TranscriptWriter, '_write', side_effect=RuntimeError('database down')):
+            self.writer._flush(self._turn(self.session.id))
+        self.assertEqual(self.writer.spooled, 2)
+        self.assertTrue(os.path.exists(self.writer.spool_path))
+
+        self.writer._maybe_replay()
+
+        self.assertEqual(ChatMessage.objects.filter(session=self.session).count(), 2)
+        self.assertFalse(os.path.exists(self.writer.spool_path))
+
+    def test_replay_interrupted_by_a_crash_is_not_lost(self):
+        replay_path = f"{self.writer.spool_path}.replay"
+        with mock.patch.object(TranscriptWriter, '_write', side_effect=RuntimeError('database down')):
+            self.writer._flush(self._turn(self.session.id))
+        # Crash after the spool was rotated, before the replay file was removed
+        with mock.patch.object(TranscriptWriter, '_flush', side_effect=SystemExit):
+            with self.assertRaises(SystemExit):
+                self.writer.replay_spool()
+        self.assertTrue(os.path.exists(replay_path))
+        self.assertFalse(os.path.exists(self.writer.spool_path))
+
+        # The leftover is retried even without a fresh spool
+        self.assertEqual(TranscriptWriter(self.writer.spool_path).replay_spool(), 2)
+        self.assertEqual(ChatMessage.objects.filter(session=self.session).count(), 2)
+        self.assertFalse(os.path.exists(replay_path))
+
+    def test_leftover_replay_is_not_overwritten_by_the_next_rotation(self):
+        replay_path = f"{self.writer.spool_path}.replay"
+        with open(replay_path, 'w', encoding='utf-8') as leftover:
+            leftover.write(json.dumps(self._turn(self.session.id)[0]) + '\n')
+        with mock.patch.object(TranscriptWriter, '_write', side_effect=RuntimeError('database down')):
+            self.writer._flush(self._turn(self.session.id)[1:])
+
+        self.assertEqual(self.writer.replay_spool(), 2)
+
+        contents = ChatMessage.objects.filter(session=self.session).order_by('id').values_list('content', flat=True)
+        self.assertEqual(list(contents), ['hi', 'hello'])
+        self.assertFalse(os.path.exists(replay_path))
+        self.assertFalse(os.path.exists(self.writer.spool_path))
+
+
+class CursorPaginationTests(TestCase):
+    """Keyset pages of sessions and transcripts."""
+
+    def _follow(self, url):
+        """Walk every page from ``url``; return the items in page order."""
+        items = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            items.extend(response.json()['results'])
+            url = response.json()['next']
+        return items
+
+    def test_transcript_pages_are_complete_and_in_order(self):
+        session = ChatSession.objects.create(user_id='alice')
+        for index in range(7):
+            ChatMessage.objects.create(session=session, sender_type='user', content=f'message {index}')
+
+        messages = self._follow(f'/api/chatbot/sessions/{session.id}/messages/?page_size=3')
+
+        self.assertEqual([message['content'] for message in messages], [f'message {index}' for index in range(7)])
+
+    def test_session_pages_are_newest_first(self):
+        sessions = [ChatSession.objects.create(user_id='alice') for _ in range(5)]
+        ChatSession.objects.create(user_id='bob')
+
+        listed = self._follow('/api/chatbot/users/alice/sessions/page/?page_size=2')
+
+        self.assertEqual([session['id'] for session in listed], [session.id for session in reversed(sessions)])
+
+    def test_unknown_session_is_not_found(self):
+        response = self.client.get('/api/chatbot/sessions/999999/messages/')
+        self.assertEqual(response.status_code, 404)
+
+
+class ArchiveRoundTripTests(TestCase):
+    """Idle sessions survive archiving and rehydration unchanged."""
+
+    def setUp(self):
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        settings_override = override_settings(CHATBOT_ARCHIVE_DIR=archive_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.session = ChatSession.objects.create(user_id='alice', summary='Asked about prices')
+        for sender_type, content in (('user', 'hi'), ('admin', 'hello'), ('user', 'prices?')):
+            ChatMessage.objects.create(session=self.session, sender_type=sender_type, content=content)
+        ChatSession.objects.filter(id=self.session.id).update(updated_at=timezone.now() - timedelta(days=200))
+        self.messages = list(ChatMessage.objects.order_by('id').values('id', 'sender_type', 'content', 'created_at'))
+
+    def test_round_trip(self):
+        self.assertEqual(archive_idle_sessions(idle_days=90), 1)
+        self.assertFalse(ChatSession.objects.filter(id=self.session.id).exists())
+        self.assertFalse(ChatMessage.objects.exists())
+
+        restored = rehydrate_session(self.session.id)
+
+        self.assertEqual((restored.id, restored.user_id, restored.summary), (self.session.id, 'alice', 'Asked about prices'))
+        self.assertEqual(
+            list(ChatMessage.objects.order_by('id').values('id', 'sender_type', 'content', 'created_at')),
+            self.messages,
+        )
+        self.assertFalse(ArchivedChatSession.objects.exists())
+
+    def test_repeated_rehydration_returns_the_live_session(self):
+        archive_idle_sessions(idle_days=90)
+        first = rehydrate_session(self.session.id)
+
+        self.assertEqual(rehydrate_session(self.session.id).id, first.id)
+        self.assertIsNone(rehydrate_session(999999))
+
+    def test_losing_a_concurrent_rehydration_is_not_an_error(self):
+        archive_idle_sessions(idle_days=90)
+        # The winner's session is live while this caller still sees the entry
+        ChatSession.objects.create(id=self.session.id, user_id='alice')
+
+        self.assertEqual(rehydrate_session(self.session.id).id, self.session.id)
+
+
+class _Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+
+    def close(self):
+        pass
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    """Breaker state transitions and what counts as one failure."""
+
+    def _breaker(self, **kwargs):
+        options = {'error_rate': 0.5, 'min_requests': 2, 'window': 60, 'cooldown': 60}
+        options.update(kwargs)
+        return CircuitBreaker('test', **options)
+
+    def _send(self, breaker, *statuses):
+        responses = iter(_Response(status) for status in statuses)
+        with mock.patch('apps.chatbot.resilience.time.sleep'):
+            return send_with_retries(lambda: next(responses), breaker, retries=len(statuses) - 1)
+
+    def _cool_down(self, breaker):
+        breaker._opened_at -= breaker.cooldown
+
+    def test_retries_of_one_call_count_as_one_failure(self):
+        breaker = self._breaker()
+
+        self.assertEqual(self._send(breaker, 503, 503, 503).status_code, 503)
+        self.assertEqual((breaker.failures, breaker.state), (1, CLOSED))
+
+        self.assertEqual(self._send(breaker, 503, 200).status_code, 200)
+        self.assertEqual((breaker.failures, breaker.successes, breaker.state), (1, 1, CLOSED))
+
+    def test_opens_at_the_error_rate_and_rejects_until_the_cooldown(self):
+        breaker = self._breaker()
+        breaker.record_failure()
+        breaker.record_failure()
+
+        self.assertEqual((breaker.state, breaker.trips), (OPEN, 1))
+        with self.assertRaises(CircuitOpenError):
+            self._send(breaker, 200)
+        self.assertEqual(breaker.rejected, 1)
+
+    def test_half_open_admits_limited_trials_and_closes_on_success(self):
+        breaker = self._breaker(half_open_requests=2)
+        breaker.record_failure()
+        breaker.record_failure()
+        self._cool_down(breaker)
+
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertTrue(breaker.allow_request())
+
+    def test_failed_trial_reopens_for_another_cooldown(self):
+        breaker = self._breaker()
+        breaker.record_failure()
+        breaker.record_failure()
+        self._cool_down(breaker)
+
+        self.assertEqual(self._send(breaker, 502).status_code, 502)
+
+        self.assertEqual((breaker.state, breaker.trips), (OPEN, 2))
+        self.assertFalse(breaker.allow_request())
+
+    def test_only_errors_before_the_request_was_sent_are_retried(self):
+        breaker = self._breaker(min_requests=10)
+        send = mock.Mock(side_effect=[httpx.ConnectError('refused'), requests.exceptions.ConnectTimeout(), _Response(200)])
+        with mock.patch('apps.chatbot.resilience.time.sleep'):
+            self.assertEqual(send_with_retries(send, breaker, retries=2).status_code, 200)
+        self.assertEqual(send.call_count, 3)
+
+        send = mock.Mock(side_effect=requests.exceptions.ReadTimeout())
+        with mock.patch('apps.chatbot.resilience.time.sleep'), self.assertRaises(requests.exceptions.ReadTimeout):
+            send_with_retries(send, breaker, retries=2)
+        self.assertEqual((send.call_count, breaker.failures), (1, 1))
+
+    def test_no_retry_starts_after_the_deadline(self):
+        breaker = self._breaker()
+        send = mock.Mock(return_value=_Response(503))
+        clock = [0.0]
+        with mock.patch('apps.chatbot.resilience.random.uniform', return_value=1.0), \
+                mock.patch('apps.chatbot.resilience.time.monotonic', side_effect=lambda: clock[0]), \
+                mock.patch('apps.chatbot.resilience.time.sleep', side_effect=lambda delay: clock.append(clock.pop() + delay)):
+            self.assertEqual(send_with_retries(send, breaker, retries=5, deadline=2.5).status_code, 503)
+
+        # Waiting for a fourth attempt would end past the deadline
+        self.assertEqual((send.call_count, clock[0]), (3, 2.0))
+        self.assertEqual(breaker.failures, 1)
+
+
+class _TokenStream:
+    """Fake streamed completion that records which thread closes it."""
+
+    def __init__(self, tokens, first_token_delay=0.0):
+        self.tokens = tokens
+        self.first_token_delay = first_token_delay
+        self.reader = None
+        self.closer = None
+        self.closed = threading.Event()
+        self.aborted = threading.Event()
+
+    def __iter__(self):
+        self.reader = threading.current_thread()
+        if self.aborted.wait(self.first_token_delay):
+            return
+        yield from self.tokens
+
+    def close(self):
+        self.closer = threading.current_thread()
+        self.closed.set()
+
+    def abort(self):
+        self.aborted.set()
+
+
+class _StalledUpstream:
+    """Local HTTP server that sends the headers of an event stream, then nothing."""
+
+    def __init__(self):
+        self.listener = socket.create_server(('127.0.0.1', 0))
+        self.url = f"http://127.0.0.1:{self.listener.getsockname()[1]}/chat/completions"
+        self.connections = []
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                return
+            self.connections.append(conn)
+            conn.recv(65536)
+            conn.sendall(b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n')
+
+    def close(self):
+        self.listener.close()
+        for conn in self.connections:
+            conn.close()
+
+
+@override_settings(
+    OPENROUTER_DEFAULT_MODEL='default-model',
+    OPENROUTER_INTENT_MODELS={'greeting': 'fast-model', 'pricing': 'pricing-model'},
+    OPENROUTER_HEDGE_MODEL='hedge-model',
+    OPENROUTER_HEDGE_DEFAULT_DELAY=0.05,
+)
+class RoutingTests(SimpleTestCase):
+    """Intent routing and the hedged completion race."""
+
+    def test_turns_are_routed_by_intent(self):
+        self.assertEqual(select_model({'greeting'}), 'fast-model')
+        self.assertEqual(select_model({'greeting', 'pricing'}), 'pricing-model')
+        self.assertEqual(select_model({'booking'}), 'default-model')
+        self.assertEqual(select_model(frozenset()), 'default-model')
+
+    def test_hedge_model_is_not_raced_against_itself(self):
+        self.assertEqual(get_hedge_model('default-model'), 'hedge-model')
+        self.assertIsNone(get_hedge_model('hedge-model'))
+        with override_settings(OPENROUTER_HEDGE_MODEL=''):
+            self.assertIsNone(get_hedge_model('default-model'))
+
+    def test_fast_primary_is_not_hedged(self):
+        streams = {'default-model': _TokenStream(['Hello', ' there'])}
+        opened = []
+
+        def open_stream(model):
+            opened.append(model)
+            return streams[model]
+
+        self.assertEqual(hedged_completion('default-model', 'hedge-model', open_stream), ('default-model', 'Hello there'))
+        self.assertEqual(opened, ['default-model'])
+
+    def test_slow_primary_loses_and_is_closed_by_its_own_thread(self):
+        streams = {
+            'default-model': _TokenStream(['late'], first_token_delay=0.3),
+            'hedge-model': _TokenStream(['Hi']),
+        }
+        hedge_wins = get_latency_tracker().stats()['hedge_wins']
+
+        result = hedged_completion('default-model', 'hedge-model', streams.__getitem__)
+
+        self.assertEqual(result, ('hedge-model', 'Hi'))
+        self.assertEqual(get_latency_tracker().stats()['hedge_wins'], hedge_wins + 1)
+        loser = streams['default-model']
+        self.assertTrue(loser.closed.wait(5))
+        self.assertIs(loser.closer, loser.reader)
+        self.assertIsNot(loser.closer, threading.current_thread())
+
+    def test_stalled_loser_is_closed_as_soon_as_the_race_is_decided(self):
+        streams = {
+            'default-model': _TokenStream(['late'], first_token_delay=60),
+            'hedge-model': _TokenStream(['Hi']),
+        }
+
+        self.assertEqual(hedged_completion('default-model', 'hedge-model', streams.__getitem__), ('hedge-model', 'Hi'))
+
+        loser = streams['default-model']
+        self.assertTrue(loser.closed.wait(1))
+        self.assertIs(loser.closer, loser.reader)
+
+    def test_loser_still_sending_its_request_is_closed_unread(self):
+        sent = threading.Event()
+        answered = threading.Event()
+        loser = _TokenStream(['late'])
+
+        def open_stream(model):
+            if model == 'hedge-model':
+                return _TokenStream(['Hi'])
+            sent.set()
+            answered.wait(5)
+            return loser
+
+        with override_settings(OPENROUTER_HEDGE_DEFAULT_DELAY=0):
+            self.assertEqual(hedged_completion('default-model', 'hedge-model', open_stream), ('hedge-model', 'Hi'))
+        self.assertTrue(sent.is_set())
+        answered.set()
+
+        self.assertTrue(loser.closed.wait(1))
+        self.assertIsNone(loser.reader)
+
+    @override_settings(OPENROUTER_POOL_MAXSIZE=1, OPENROUTER_POOL_TIMEOUT=0.2)
+    def test_abort_frees_a_blocked_stream_and_pool_checkout_is_bounded(self):
+        upstream = _StalledUpstream()
+        self.addCleanup(upstream.close)
+        session = services._build_http_session()
+        self.addCleanup(session.close)
+        stream = services._TokenStream(session.post(upstream.url, json={}, stream=True, timeout=(1, 30)))
+
+        # The one pooled connection is taken by the open stream
+        with self.assertRaises(urllib3.exceptions.EmptyPoolError):
+            session.post(upstream.url, json={}, stream=True, timeout=(1, 30))
+
+        def read():
+            # The aborted read fails like a dropped connection; a hedge attempt ignores it
+            try:
+                list(stream)
+            except requests.RequestException:
+                pass
+            finally:
+                stream.close()
+
+        reader = threading.Thread(target=read, daemon=True)
+        reader.start()
+        stream.abort()
+        reader.join(2)
+        self.assertFalse(reader.is_alive())
+        session.post(upstream.url, json={}, stream=True, timeout=(1, 30)).close()
+
+
+class FastPathTests(TestCase):
+    """Which turns are answered locally instead of by the LLM."""
+
+    def setUp(self):
+        cache.clear()
+        for name in ('Main Auditorium', 'Conference Hall'):
+            venue = Venue.objects.create(venue_name=name, capacity=100, description="Test venue")
+            PriceTier.objects.create(venue=venue, duration=4, price=Decimal('1000.00'))
+        self.blocks = build_context_snapshot()['blocks']
+
+    def _score(self, message, history=None):
+        return score_turn(message, detect_intents(message), self.blocks, history)
+
+    def test_catalog_questions_score_full_confidence(self):
+        self.assertEqual(self._score('what are your prices'), (1.0, 'pricing'))
+        self.assertEqual(self._score('list the venues'), (1.0, 'venue'))
+        self.assertEqual(self._score('hi'), (1.0, 'greeting'))
+
+    def test_questions_about_one_venue_go_to_the_llm(self):
+        for message in (
+            'what is the price of the auditorium',
+            'how many people fit in the conference hall',
+            'tell me about the main auditorium',
+        ):
+            with self.subTest(message=message):
+                self.assertEqual(self._score(message), (0.0, None))
+
+    def test_threshold(self):
+        message = 'what are your prices for weddings'
+        confidence, intent = self._score(message)
+        self.assertEqual((confidence, intent), (0.5, 'pricing'))
+
+        self.assertIsNone(fast_path_intent(message, detect_intents(message), self.blocks))
+        with override_settings(CHATBOT_FAST_PATH_THRESHOLD=0.5):
+            self.assertEqual(fast_path_intent(message, detect_intents(message), self.blocks), 'pricing')
+        with override_settings(CHATBOT_FAST_PATH=False):
+            self.assertIsNone(fast_path_intent('what are your prices', {'pricing'}, self.blocks))
+
+
+class BookingFixture:
+    """Creates chatbot bookings with their slots and setup windows."""
+
+    def _venue(self, name, status='active'):
+        venue = Venue.objects.create(venue_name=name, capacity=100, status=status, description="Test venue")
+        tier = PriceTier.objects.create(venue=venue, duration=4, price=Decimal('1000.00'))
+        return venue, tier
+
+    def _book(self, tier, start_date, start_time, end_time, end_date=None, status='confirmed',
+              isfullday=False, arrangements=()):
+        """Book ``tier.venue``; ``arrangements`` are ``(type, date, start_time, end_time)``."""
+        user = User.objects.get_or_create(username='organizer')[0]
+        applicant = Applicant.objects.get_or_create(
+            user=user, defaults={'applicant_name': 'Organizer', 'organization': 'Club',
+                                 'contact_no': '0770000000', 'email': 'organizer@example.com'},
+        )[0]
+        booking = Booking.objects.create(
+            applicant=applicant, booking_reference=f'REF{Booking.objects.count() + 1:05d}',
+            event_types=['meeting'], event_details='Test event', total_amount=tier.price, booking_status=status,
+        )
+        slot = BookingSlot.objects.create(
+            booking=booking, venue=tier.venue, tier=tier, start_date=start_date, end_date=end_date or start_date,
+            start_time=start_time, end_time=end_time, isfullday=isfullday, venue_cost=tier.price,
+        )
+        for arrangement_type, day, arrangement_start, arrangement_end in arrangements:
+            PreArrangement.objects.create(
+                booking=booking, venue=tier.venue, arrangement_type=arrangement_type, date=day,
+                start_time=arrangement_start, end_time=arrangement_end,
+            )
+        return booking, slot
+
+
+class VenueIntervalIndexTests(BookingFixture, TestCase):
+    """The index follows this process's changes and reloads on other processes' ones."""
+
+    def setUp(self):
+        cache.clear()
+        self.venue, self.tier = self._venue('Main Auditorium')
+        self.day = timezone.localdate() + timedelta(days=10)
+        self.index = VenueIntervalIndex()
+
+    def _overlaps(self):
+        return self.index.count_overlaps(self.venue.venue_id, self.day, self.day)
+
+    def test_follows_committed_bookings(self):
+        self.assertEqual(self._overlaps(), 0)
+        with mock.patch('apps.chatbot.signals.get_venue_interval_index', return_value=self.index):
+            with self.captureOnCommitCallbacks(execute=True):
+                booking, _ = self._book(self.tier, self.day, time(10), time(14))
+            self.assertEqual(self._overlaps(), 1)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                booking.booking_status = 'cancelled'
+                booking.save()
+        self.assertEqual(self._overlaps(), 0)
+        self.assertEqual(self.index.rebuilds, 1)
+
+    def test_reloads_when_another_process_published_a_change(self):
+        self.assertEqual(self._overlaps(), 0)
+        # Written by another worker: no signal here, only its generation bump
+        self._book(self.tier, self.day, time(10), time(14))
+        self.assertEqual(self._overlaps(), 0)
+        bump_shared_generation(AVAILABILITY_GENERATION_KEY)
+
+        self.assertEqual(self._overlaps(), 1)
+        self.assertEqual(self.index.rebuilds, 2)
+
+    def test_change_racing_another_process_forces_a_reload(self):
+        self.assertEqual(self._overlaps(), 0)
+        _, other = self._book(self.tier, self.day, time(8), time(9))
+        _, own = self._book(self.tier, self.day, time(10), time(14))
+        # The other worker bumps between this index's load and its own change
+        bump_shared_generation(AVAILABILITY_GENERATION_KEY)
+        self.index.refresh_slot(own.slot_id)
+
+        self.assertIsNone(self.index.generation)
+        self.assertEqual(self._overlaps(), 2)
+        self.assertEqual(self.index.check_consistency(), {'missing': [], 'extra': [], 'mismatched': []})
+
+
+class OccupancyMatrixTests(BookingFixture, TestCase):
+    """Hourly cell codes of the bulk availability matrix."""
+
+    def setUp(self):
+        self.venue, self.tier = self._venue('Main Auditorium')
+        self.closed_venue, self.closed_tier = self._venue('Old Hall', status='inactive')
+        self.day = timezone.localdate() + timedelta(days=10)
+
+    def _day(self, matrix, venue, offset=0):
+        return list(matrix[venue.venue_id][offset * 24:(offset + 1) * 24])
+
+    def test_setup_windows_and_bookings(self):
+        self._book(self.tier, self.day, time(10), time(13, 30), arrangements=[
+            ('setup', self.day, time(7), time(11)),
+            ('breakdown', self.day, time(13, 30), time(15)),
+        ])
+
+        cells = self._day(occupancy_matrix(self.day, self.day), self.venue)
+
+        # Booked hours win over the overlapping setup; 13:30 rounds up to 14:00
+        self.assertEqual(cells[6:16], [FREE, ARRANGEMENT, ARRANGEMENT, ARRANGEMENT, BOOKED, BOOKED, BOOKED,
+                                       BOOKED, ARRANGEMENT, FREE])
+
+    def test_multi_day_and_full_day_slots(self):
+        self._book(self.tier, self.day, time(18), time(20), end_date=self.day + timedelta(days=1))
+        self._book(self.tier, self.day + timedelta(days=2), time(0), time(0), isfullday=True)
+        self._book(self.tier, self.day, time(8), time(9), status='cancelled')
+
+        matrix = occupancy_matrix(self.day, self.day + timedelta(days=2), [self.venue.venue_id])
+
+        for offset in (0, 1):
+            self.assertEqual(self._day(matrix, self.venue, offset), [FREE] * 18 + [BOOKED] * 2 + [FREE] * 4)
+        self.assertEqual(self._day(matrix, self.venue, 2), [BOOKED] * 24)
+
+    def test_inactive_venues_are_left_out(self):
+        self._book(self.closed_tier, self.day, time(10), time(12), arrangements=[
+            ('setup', self.day, time(8), time(10)),
+        ])
+
+        with self.assertNumQueries(1):
+            matrix = occupancy_matrix(self.day, self.day)
+
+        self.assertEqual(list(matrix), [self.venue.venue_id])
+        self.assertEqual(self._day(matrix, self.venue), [FREE] * 24)
+
+
+@override_settings(CHATBOT_VENUE_OPENING_HOUR=8, CHATBOT_VENUE_CLOSING_HOUR=22)
+class FreeWindowSearchTests(BookingFixture, TestCase):
+    """The gap sweep behind "when is the auditorium free for 4 hours"."""
+
+    def setUp(self):
+        cache.clear()
+        self.venue, self.tier = self._venue('Main Auditorium')
+        self.day = timezone.localdate() + timedelta(days=10)
+
+    def _windows(self, duration_hours=4, horizon_days=1):
+        return [
+            (window['date'], window['start_time'], window['end_time'], window['free_until'])
+            for window in find_free_windows(duration_hours, start=self.day, horizon_days=horizon_days)
+        ]
+
+    def test_adjacent_bookings_leave_no_gap(self):
+        PriceTier.objects.create(venue=self.venue, duration=2, price=Decimal('600.00'))
+        self._book(self.tier, self.day, time(10), time(12))
+        self._book(self.tier, self.day, time(12), time(14))
+        day = self.day.isoformat()
+
+        self.assertEqual(self._windows(2), [(day, '08:00', '10:00', '10:00'), (day, '14:00', '16:00', '22:00')])
+        self.assertEqual(self._windows(4), [(day, '14:00', '18:00', '22:00')])
+
+    def test_setup_and_breakdown_windows_are_busy(self):
+        self._book(self.tier, self.day, time(12), time(14), arrangements=[
+            ('setup', self.day, time(9), time(12)),
+            ('breakdown', self.day, time(14), time(16, 30)),
+        ])
+
+        self.assertEqual(self._windows(), [(self.day.isoformat(), '16:30', '20:30', '22:00')])
+
+    def test_windows_end_by_closing_time(self):
+        next_day = self.day + timedelta(days=1)
+        self._book(self.tier, self.day, time(8), time(18))
+        self._book(self.tier, next_day, time(8), time(18, 30))
+
+        self.assertEqual(self._windows(horizon_days=3), [
+            (self.day.isoformat(), '18:00', '22:00', '22:00'),
+            ((next_day + timedelta(days=1)).isoformat(), '08:00', '12:00', '22:00'),
+        ])
+
+    def test_slot_running_to_midnight_closes_the_day(self):
+        self._book(self.tier, self.day, time(20), time(0))
+        self._book(self.tier, self.day, time(8), time(12))
+
+        self.assertEqual(self._windows(), [(self.day.isoformat(), '12:00', '16:00', '20:00')])
+
+    def test_venue_names_come_from_the_snapshot(self):
+        self._venue('Conference Hall')
+        get_context_snapshot()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(match_venue_ids('is the auditorium free for 4 hours'), [self.venue.venue_id])
+            self.assertIsNone(match_venue_ids('is any hall free for 4 hours'))
+
+
+@override_settings(CHATBOT_VENUE_OPENING_HOUR=8, CHATBOT_VENUE_CLOSING_HOUR=22)
+class OccupancyCalendarTests(BookingFixture, TestCase):
+    """Horizon bounds and freshness of the half-hour occupancy calendar."""
+
+    def setUp(self):
+        cache.clear()
+        self.venue, self.tier = self._venue('Main Auditorium')
+        self.day = timezone.localdate() + timedelta(days=10)
+        self.calendar = OccupancyCalendar()
+
+    def _booked_hours(self):
+        return self.calendar.utilization([self.venue.venue_id], self.day, self.day)[self.venue.venue_id]['booked_hours']
+
+    def test_utilization_and_bitmap(self):
+        self._book(self.tier, self.day, time(8), time(15), arrangements=[('setup', self.day, time(7), time(8))])
+
+        utilization = self.calendar.utilization([self.venue.venue_id], self.day, self.day)[self.venue.venue_id]
+
+        self.assertEqual((utilization['booked_hours'], utilization['utilization']), (7.0, 0.5))
+        self.assertEqual(self.calendar.packed(self.venue.venue_id, self.day, self.day)[0].hex(), '0003fffc0000')
+
+    def test_days_outside_the_horizon(self):
+        far = timezone.localdate() + timedelta(days=1000)
+
+        self.assertTrue(self.calendar.covers(self.day, self.day))
+        self.assertFalse(self.calendar.covers(self.day, far))
+        self.assertEqual(self.calendar.bitmap(self.venue.venue_id, far, far).shape, (0, 48))
+        self.assertEqual(self.calendar.utilization([self.venue.venue_id], far, far)[self.venue.venue_id]['utilization'], 0.0)
+
+    def test_rebuilds_after_the_ttl_without_a_published_change(self):
+        self.assertEqual(self._booked_hours(), 0)
+        # Written by another worker whose generation bump this process cannot see
+        self._book(self.tier, self.day, time(10), time(12))
+        self.assertEqual(self._booked_hours(), 0)
+
+        self.calendar.built_at -= 61
+        self.assertEqual(self._booked_hours(), 2)
+
+    def test_change_racing_another_process_forces_a_rebuild(self):
+        self.assertEqual(self._booked_hours(), 0)
+        self._book(self.tier, self.day, time(8), time(9))
+        _, own = self._book(self.tier, self.day, time(10), time(12))
+        bump_shared_generation(OCCUPANCY_GENERATION_KEY)
+        self.calendar.refresh_slot(own.slot_id)
+
+        self.assertIsNone(self.calendar.generation)
+        self.assertEqual(self._booked_hours(), 3)
+
+
+class AsyncHttpClientTests(SimpleTestCase):
+    """One pooled httpx client per event loop, closed with its loop."""
+
+    def test_clients_do_not_outlive_their_loop(self):
+        clients = []
+
+        async def use_client():
+            client = get_async_http_client()
+            self.assertIs(get_async_http_client(), client)
+            clients.append(client)
+
+        for _ in range(3):
+            asyncio.run(use_client())
+
+        self.assertEqual(len(set(map(id, clients))), 3)
+        self.assertTrue(all(client.is_closed for client in clients))
+        self.assertEqual(services._async_http_clients, {})
+
+
+@override_settings(OPENROUTER_API_KEY='test-key', CHATBOT_SUMMARY_EVERY=0, OPENROUTER_HEDGE_MODEL='')
+class ConversationHistoryTests(TestCase):
+    """Each caller's prompt carries only their own conversation."""
+
+    QUESTION = 'can you recommend a venue for a family wedding reception'
+
+    def setUp(self):
+        cache.clear()
+        get_response_cache().clear()
+        patcher = mock.patch.object(OpenRouterService, '_complete', autospec=True, return_value='Try the courtyard')
+        self.complete = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _send(self, user_id, message):
+        return self.client.post('/api/chatbot/chat/', {'message': message, 'user_id': user_id},
+                                content_type='application/json')
+
+    def _prompt(self, call):
+        return '\n'.join(message['content'] for message in call.args[2])
+
+    def test_histories_and_summaries_stay_separate(self):
+        self._send('alice', 'my phone number is 0771234567, which hall suits a concert')
+        ChatSession.objects.filter(user_id='alice').update(summary='Alice gave her phone number 0771234567')
+        cache.clear()
+
+        self._send('bob', 'which hall suits a concert')
+        self._send('alice', 'and what about a seminar')
+
+        alice_first, bob, alice_again = self.complete.call_args_list
+        self.assertNotIn('0771234567', self._prompt(bob))
+        self.assertEqual([message['role'] for message in bob.args[2]], ['system', 'user'])
+        self.assertIn('Alice gave her phone number', self._prompt(alice_again))
+        self.assertIn('Try the courtyard', self._prompt(alice_again))
+
+    def test_first_questions_of_different_callers_share_the_answer_cache(self):
+        for user_id in ('alice', 'bob', 'carol', 'dave'):
+            self.assertEqual(self._send(user_id, self.QUESTION).json()['response'], 'Try the courtyard')
+
+        self.assertEqual(self.complete.call_count, 1)
+
+
+@override_settings(OPENROUTER_API_KEY='', CHATBOT_SUMMARY_EVERY=4, CHATBOT_SUMMARY_KEEP_RECENT=2)
+class SessionSummaryTests(TransactionTestCase):
+    """Every K messages the older part of a session is folded into its summary."""
+
+    def setUp(self):
+        cache.clear()
+
+    def _send(self, message):
+        response = self.client.post('/api/chatbot/chat/', {'message': message, 'user_id': 'alice'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        session_id = response.json()['session_id']
+        for thread in threading.enumerate():
+            if thread.name == f'chat-summary-{session_id}':
+                thread.join(timeout=10)
+        return ChatSession.objects.get(id=session_id)
+
+    def test_summary_is_written_after_every_k_messages(self):
+        session = self._send('Do you have a hall for 200 guests in May?')
+        self.assertEqual((session.summary, session.summary_through_id), ('', None))
+
+        session = self._send('What does the Conference Hall cost for four hours?')
+        messages = list(ChatMessage.objects.filter(session=session).order_by('id'))
+        self.assertEqual(len(messages), 4)
+        self.assertIn('hall for 200 guests', session.summary)
+        self.assertNotIn('Conference Hall', session.summary)
+        self.assertEqual(session.summary_through_id, messages[1].id)
+
+        session = self._send('Is parking available?')
+        self.assertEqual(session.summary_through_id, messages[1].id)
+
+
+def _sse_completion(*tokens):
+    """Body of an OpenRouter chat-completions stream producing ``tokens``."""
+    lines = [': OPENROUTER PROCESSING']
+    lines += [f"data: {json.dumps({'choices': [{'delta': {'content': token}}]})}" for token in tokens]
+    lines.append('data: [DONE]')
+    return '\n\n'.join(lines) + '\n\n'
+
+
+def _parse_events(body):
+    events = []
+    for block in body.strip().split('\n\n'):
+        event, data = block.split('\n', 1)
+        events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+@override_settings(OPENROUTER_API_KEY='test-key', CHATBOT_SUMMARY_EVERY=0, OPENROUTER_HEDGE_MODEL='',
+                   CHATBOT_SEMANTIC_CACHE_SIZE=0)
+class StreamingChatTests(TestCase):
+    """POST /api/chatbot/chat/stream/ against a mocked OpenRouter stream."""
+
+    def setUp(self):
+        cache.clear()
+        get_response_cache().clear()
+        self.requests = []
+
+        def upstream(request):
+            self.requests.append(json.loads(request.content))
+            return httpx.Response(200, text=_sse_completion('The courtyard', ' seats 300', '.'),
+                                  headers={'Content-Type': 'text/event-stream'})
+
+        patcher = mock.patch(
+            'apps.chatbot.services.get_async_http_client',
+            side_effect=lambda: httpx.AsyncClient(transport=httpx.MockTransport(upstream)),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def _stream(self, message):
+        response = await self.async_client.post(
+            '/api/chatbot/chat/stream/', {'message': message, 'user_id': 'alice'}, content_type='application/json',
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = ''.join([chunk.decode() async for chunk in response.streaming_content])
+        return _parse_events(body)
+
+    async def test_tokens_are_streamed_and_the_reply_is_saved(self):
+        events = await self._stream('can you recommend a venue for an outdoor concert')
+
+        self.assertEqual([event for event, _ in events], ['session', 'token', 'token', 'token', 'done'])
+        self.assertEqual([data['token'] for event, data in events if event == 'token'],
+                         ['The courtyard', ' seats 300', '.'])
+        self.assertTrue(self.requests[0]['stream'])
+        done = events[-1][1]
+        reply = await ChatMessage.objects.aget(sender_type='admin')
+        self.assertEqual((reply.id, reply.session_id), (done['message_id'], done['session_id']))
+        self.assertEqual(reply.content, 'The courtyard seats 300.')
+        self.assertEqual(await ChatMessage.objects.filter(session_id=done['session_id']).acount(), 2)
+
+    @override_settings(DEBUG=True)
+    async def test_done_event_carries_the_stage_timings_under_debug(self):
+        events = await self._stream('can you recommend a venue for an outdoor concert')
+
+        self.assertIn('llm;dur=', events[-1][1]['server_timing'])
+
+    async def test_done_event_has_no_stage_timings_without_debug(self):
+        events = await self._stream('can you recommend a venue for an outdoor concert')
+
+        self.assertNotIn('server_timing', events[-1][1])
+
+
+@override_settings(OPENROUTER_API_KEY='', CHATBOT_SUMMARY_EVERY=0)
+class ServerTimingTests(TestCase):
+    """Chat responses expose per-stage timings in a header, but only under DEBUG."""
+
+    def setUp(self):
+        cache.clear()
+
+    def _send(self):
+        return self.client.post('/api/chatbot/chat/', {'message': 'hello', 'user_id': 'alice'},
+                                content_type='application/json')
+
+    @override_settings(DEBUG=True)
+    def test_header_lists_the_stages_under_debug(self):
+        response = self._send()
+
+        self.assertEqual(response.status_code, 200)
+        stages = [part.split(';')[0] for part in response['Server-Timing'].split(', ')]
+        self.assertLessEqual({'session', 'history', 'context', 'persist', 'total'}, set(stages))
+        self.assertEqual(stages[-1], 'total')
+
+    def test_header_is_omitted_without_debug(self):
+        self.assertNotIn('Server-Timing', self._send())
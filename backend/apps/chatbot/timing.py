@@ -0,0 +1,137 @@
+"""
+Per-stage latency of chat requests.
+
+The chat views wrap each request in ``request_timer()`` and its stages
+(session resolution, history, DB context, prompt assembly, the LLM call and
+persistence) in ``stage(name)``. The current timer travels in a context
+variable, so the service layer can time its own stages without the timer
+being passed through every call, including into sync_to_async threads and
+hedged request attempts. Finished requests feed process-wide histograms that
+are served on the metrics endpoint; in DEBUG the views also return the
+stages in a ``Server-Timing`` header.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Seconds; spans fast cache hits up to slow LLM completions
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGES = ['session', 'history', 'context', 'prompt', 'llm_ttfb', 'llm', 'persist', 'total']
+
+_current_timer = contextvars.ContextVar('chat_request_timer', default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+
+class StageHistograms:
+    """One histogram per request stage, shared by every request in the process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def observe(self, durations):
+        with self._lock:
+            for name, seconds in durations.items():
+                self._histograms.setdefault(name, Histogram()).observe(seconds)
+
+    def snapshot(self):
+        """Return ``{stage: (buckets, cumulative_counts, count, sum)}``."""
+        with self._lock:
+            return {
+                name: (histogram.buckets, list(histogram.counts), histogram.count, histogram.sum)
+                for name, histogram in self._histograms.items()
+            }
+
+
+_stage_histograms = StageHistograms()
+
+
+def get_stage_histograms():
+    return _stage_histograms
+
+
+class RequestTimer:
+    """Stage durations of one chat request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = {}
+        self._llm_started = None
+        self._finished = False
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        if name == 'llm':
+            self._llm_started = started
+        try:
+            yield
+        finally:
+            self.durations[name] = self.durations.get(name, 0.0) + time.perf_counter() - started
+
+    def mark_first_byte(self):
+        """Record time to first byte of the LLM call; later calls are ignored."""
+        if self._llm_started is not None and 'llm_ttfb' not in self.durations:
+            self.durations['llm_ttfb'] = time.perf_counter() - self._llm_started
+
+    def finish(self):
+        """Record the total and feed the stage histograms (once)."""
+        if self._finished:
+            return
+        self._finished = True
+        self.durations['total'] = time.perf_counter() - self.started
+        _stage_histograms.observe(self.durations)
+
+    def server_timing(self):
+        """The stages as a ``Server-Timing`` header value, in milliseconds."""
+        return ', '.join(
+            f"{name};dur={self.durations[name] * 1000:.1f}"
+            for name in STAGES if name in self.durations
+        )
+
+
+@contextmanager
+def request_timer(timer=None):
+    """Make ``timer`` (a new one by default) current for the enclosed block."""
+    timer = timer or RequestTimer()
+    token = _current_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _current_timer.reset(token)
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as ``name`` on the current request, if any."""
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    with timer.stage(name):
+        yield
+
+
+def mark_first_byte():
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.mark_first_byte()
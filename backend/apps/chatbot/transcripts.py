@@ -0,0 +1,207 @@
+"""
+Opt-in write-behind persistence for chat transcripts.
+
+With CHATBOT_WRITE_BEHIND enabled, chat turns are put on an in-process
+bounded queue and a background thread writes them with bulk_create every
+CHATBOT_WRITE_BEHIND_FLUSH_MS milliseconds or CHATBOT_WRITE_BEHIND_BATCH_SIZE
+messages, whichever comes first. Batches that cannot be written are appended
+to a local JSONL spool file, which the writer retries when it starts and then
+every CHATBOT_WRITE_BEHIND_REPLAY_SECONDS; a replay interrupted by a crash is
+picked up again from its rotated ``.replay`` file. Like the synchronous path, messages
+for a session deleted in the meantime go to a new session of the same user.
+The queue is drained on interpreter shutdown.
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from apps.chatbot.chat_sessions import forget_session
+from apps.chatbot.models import ChatSession, ChatMessage
+
+
+class TranscriptWriter:
+    """Background bulk writer for ChatMessage rows."""
+
+    def __init__(self, spool_path, max_queue=10000, flush_interval=0.2, batch_size=200, replay_interval=60):
+        self.spool_path = str(spool_path)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.replay_interval = replay_interval
+        self._next_replay = 0.0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stopping = threading.Event()
+        self._spool_lock = threading.Lock()
+        self._thread = None
+        self.written = 0
+        self.spooled = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='chat-transcript-writer', daemon=True)
+        self._thread.start()
+
+    def enqueue(self, messages):
+        """Queue a list of message dicts (``session_id``, ``user_id``,
+        ``sender_type``, ``content``) to be written together. Raises
+        queue.Full when the writer is saturated.
+        """
+        self._queue.put_nowait(messages)
+
+    def stop(self, timeout=10):
+        """Stop accepting work, flush what is queued and wait for the thread."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        close_old_connections()
+        try:
+            while True:
+                self._maybe_replay()
+                batch = self._collect_batch()
+                if batch:
+                    self._flush(batch)
+                elif self._stopping.is_set():
+                    break
+        finally:
+            connection.close()
+
+    def _maybe_replay(self):
+        """Retry spooled batches at most every ``replay_interval`` seconds."""
+        now = time.monotonic()
+        if now < self._next_replay:
+            return
+        self._next_replay = now + self.replay_interval
+        try:
+            self.replay_spool()
+        except Exception as e:
+            print(f"Error replaying chat transcript spool: {str(e)}")
+
+    def _collect_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if self._stopping.is_set():
+                # Drain without waiting once shutdown has begun
+                try:
+                    batch.extend(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+                continue
+            try:
+                batch.extend(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch):
+        try:
+            self._write(batch)
+            self.written += len(batch)
+        except Exception as e:
+            print(f"Error writing chat transcript batch, spooling {len(batch)} messages: {str(e)}")
+            close_old_connections()
+            self._spool(batch)
+
+    def _write(self, batch):
+        session_ids = {item['session_id'] for item in batch}
+        with transaction.atomic():
+            existing = set(ChatSession.objects.filter(id__in=session_ids).values_list('id', flat=True))
+            # Sessions may have been deleted since the turn was queued; give
+            # their messages a new session of the same user, as record_user_message does
+            replacements = {}
+            for item in batch:
+                session_id, user_id = item['session_id'], item.get('user_id')
+                if session_id in existing or session_id in replacements or user_id is None:
+                    continue
+                replacements[session_id] = ChatSession.objects.create(user_id=user_id).id
+                transaction.on_commit(lambda user_id=user_id: forget_session(user_id))
+            messages = [
+                ChatMessage(
+                    session_id=replacements.get(item['session_id'], item['session_id']),
+                    sender_type=item['sender_type'],
+                    content=item['content'],
+                )
+                for item in batch if item['session_id'] in existing or item['session_id'] in replacements
+            ]
+            if len(messages) < len(batch):
+                # Only spooled by older versions, which did not record the user
+                print(f"Dropping {len(batch) - len(messages)} chat messages of deleted sessions without a user")
+            ChatMessage.objects.bulk_create(messages)
+            ChatSession.objects.filter(id__in=existing).update(updated_at=timezone.now())
+
+    def _spool(self, batch):
+        with self._spool_lock:
+            os.makedirs(os.path.dirname(self.spool_path) or '.', exist_ok=True)
+            with open(self.spool_path, 'a', encoding='utf-8') as spool:
+                for item in batch:
+                    spool.write(json.dumps(item) + '\n')
+                spool.flush()
+                os.fsync(spool.fileno())
+            self.spooled += len(batch)
+
+    def replay_spool(self):
+        """Write spooled messages back to the database, keeping them on failure."""
+        replay_path = f"{self.spool_path}.replay"
+        # A replay file left by a crash mid-replay goes first, so rotating
+        # the spool cannot overwrite it
+        replayed = self._replay_file(replay_path) if os.path.exists(replay_path) else 0
+        with self._spool_lock:
+            if not os.path.exists(self.spool_path):
+                return replayed
+            os.replace(self.spool_path, replay_path)
+        return replayed + self._replay_file(replay_path)
+
+    def _replay_file(self, path):
+        """Flush the batches spooled in ``path``; failures go back to the spool."""
+        with open(path, encoding='utf-8') as spool:
+            batch = [json.loads(line) for line in spool if line.strip()]
+        for start in range(0, len(batch), self.batch_size):
+            self._flush(batch[start:start + self.batch_size])
+        os.remove(path)
+        return len(batch)
+
+
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def get_transcript_writer():
+    """Return the running writer for this process, starting it on first use."""
+    global _writer, _writer_pid
+
+    with _writer_lock:
+        if _writer is None or _writer_pid != os.getpid():
+            _writer = TranscriptWriter(
+                spool_path=getattr(settings, 'CHATBOT_WRITE_BEHIND_SPOOL', 'chat_transcript_spool.jsonl'),
+                max_queue=getattr(settings, 'CHATBOT_WRITE_BEHIND_QUEUE_SIZE', 10000),
+                flush_interval=getattr(settings, 'CHATBOT_WRITE_BEHIND_FLUSH_MS', 200) / 1000,
+                batch_size=getattr(settings, 'CHATBOT_WRITE_BEHIND_BATCH_SIZE', 200),
+                replay_interval=getattr(settings, 'CHATBOT_WRITE_BEHIND_REPLAY_SECONDS', 60),
+            )
+            _writer_pid = os.getpid()
+            _writer.start()
+        return _writer
+
+
+def shutdown_transcript_writer():
+    """Drain and stop this process's writer, if one was started."""
+    global _writer
+
+    with _writer_lock:
+        if _writer is not None and _writer_pid == os.getpid():
+            _writer.stop()
+        _writer = None
+
+
+atexit.register(shutdown_transcript_writer)
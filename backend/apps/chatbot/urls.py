@@ -6,7 +6,11 @@ urlpatterns = [
     path('csrf-token/', views.get_csrf_token, name='get_csrf_token'),
     path('chat/', views.send_message, name='send_message'),
     path('send-message/', views.send_message, name='send_message_alt'),
+    path('chat/async/', views.send_message_async, name='send_message_async'),
+    path('chat/stream/', views.send_message_stream, name='send_message_stream'),
     path('users/<str:user_id>/sessions/', views.get_sessions_by_user, name='get_chat_sessions'),
+    path('users/<str:user_id>/sessions/page/', views.get_sessions_page, name='get_chat_sessions_page'),
+    path('sessions/<int:session_id>/messages/', views.get_session_messages, name='get_session_messages'),
     path('sessions/delete/<int:session_id>/', views.get_session, name='delete_chat_session'),
     
     # Venue Management endpoints
@@ -14,6 +18,9 @@ urlpatterns = [
     path('venues/<int:venue_id>/', views.get_venue_detail, name='get_venue_detail'),
     path('venues/recommendations/', views.get_venue_recommendations, name='get_venue_recommendations'),
     path('venues/<int:venue_id>/availability/', views.get_venue_availability, name='get_venue_availability'),
+    path('venues/availability/', views.get_bulk_availability, name='get_bulk_availability'),
+    path('venues/utilization/', views.get_venue_utilization, name='get_venue_utilization'),
+    path('venues/free-slots/', views.get_free_slots, name='get_free_slots'),
     path('venues/search/', views.search_venues, name='search_venues'),
     
     # Applicant Management endpoints
@@ -63,6 +70,7 @@ urlpatterns = [
     
     # Health check
     path('health/', views.health_check, name='health_check'),
+    path('metrics/', views.metrics, name='metrics'),
     
     # Test endpoint
     path('test/', views.test_endpoint, name='test_endpoint'),
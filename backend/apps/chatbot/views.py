@@ -5,8 +5,11 @@ from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.decorators import action
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.contrib.auth.models import User
+from django.conf import settings
+from asgiref.sync import sync_to_async
 from django.middleware.csrf import get_token
 from django.db.models import Q, Count, Sum
 from django.utils import timezone
@@ -33,7 +36,19 @@ from .serializers import (
     JTCCFacilitySerializer, JTCCMilestoneSerializer, ContactSerializer,
     VenueDetailSerializer, BookingDetailSerializer
 )
+from .archive import rehydrate_session
+from .availability import (
+    ACTIVE_BOOKING_STATUSES, ARRANGEMENT, BOOKED, FREE, day_range, get_venue_interval_index, occupancy_matrix,
+)
+from .chat_sessions import resolve_session, record_reply, record_user_message
+from .history import load_conversation_history
+from .metrics import render_metrics
+from .occupancy import get_occupancy_calendar
+from .pagination import ChatSessionCursorPagination, ChatMessageCursorPagination
 from .services import OpenRouterService
+from .slot_finder import find_free_windows
+from .summaries import note_new_messages
+from .timing import request_timer, stage
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -79,61 +94,180 @@ def send_message(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # For development, use first user or create one
-        user = User.objects.first()
-        if not user:
-            user = User.objects.create_user('testuser', 'test@example.com', 'password')
-        
-        # If user is not authenticated, use the test user
-        if not request.user.is_authenticated:
-            request.user = user
+        with request_timer() as timer:
+            # Cached session lookup; no queries on a warm cache
+            with stage('session'):
+                session = resolve_session(request, data)
+            
+            # Recent turns of this session, before the new message is stored
+            with stage('history'):
+                conversation_history = load_conversation_history(session)
+            
+            # Save the user's message first so a failed LLM call cannot lose it
+            with stage('persist'):
+                session = record_user_message(session, message_content)
+            
+            # Get response from OpenRouter
+            openrouter_service = OpenRouterService()
+            bot_response = openrouter_service.generate_response(message_content, conversation_history)
+            
+            # message_id is None when the reply was queued for write-behind
+            with stage('persist'):
+                bot_message = record_reply(session, bot_response)
+                note_new_messages(session.id)
+        timer.finish()
         
-        # Get or create session
-        session = ChatSession.objects.filter(user_id=user.username).first()
-        if not session:
-            session = ChatSession.objects.create(
-                user_id=user.username
-            )
+        response = Response({
+            'session_id': session.id,
+            'message_id': bot_message.id if bot_message else None,
+            'response': bot_response
+        })
+        if settings.DEBUG:
+            response['Server-Timing'] = timer.server_timing()
+        return response
         
-        # Save user message
-        user_message = ChatMessage.objects.create(
-            session=session,
-            sender_type='user',
-            content=message_content
+    except Exception as e:
+        return Response(
+            {'error': str(e)}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+@csrf_exempt
+@require_POST
+async def send_message_async(request):
+    """Async variant of send_message for ASGI deployments.
+
+    Holds no worker thread while OpenRouter is generating, so a single
+    process can serve many in-flight conversations.
+    """
+    try:
+        data = json.loads(request.body)
+        message_content = data.get('message', '').strip()
         
-        # Get response from OpenRouter
-        openrouter_service = OpenRouterService()
-        bot_response = openrouter_service.generate_response(message_content)
-        
-        # Save bot response
-        bot_message = ChatMessage.objects.create(
-            session=session,
-            sender_type='admin',
-            content=bot_response
-        )
+        if not message_content:
+            return JsonResponse(
+                {'error': 'Message is required'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Update session
-        session.save()
+        with request_timer() as timer:
+            # Cached session lookup; no queries on a warm cache
+            with stage('session'):
+                session = await sync_to_async(resolve_session)(request, data)
+            
+            # Recent turns of this session, before the new message is stored
+            with stage('history'):
+                conversation_history = await sync_to_async(load_conversation_history)(session)
+            
+            # Save the user's message first so a failed LLM call cannot lose it
+            with stage('persist'):
+                session = await sync_to_async(record_user_message)(session, message_content)
+            
+            # Get response from OpenRouter
+            openrouter_service = OpenRouterService()
+            bot_response = await openrouter_service.agenerate_response(message_content, conversation_history)
+            
+            # message_id is None when the reply was queued for write-behind
+            with stage('persist'):
+                bot_message = await sync_to_async(record_reply)(session, bot_response)
+                await sync_to_async(note_new_messages)(session.id)
+        timer.finish()
         
-        return Response({
+        response = JsonResponse({
             'session_id': session.id,
-            'message_id': bot_message.id,
+            'message_id': bot_message.id if bot_message else None,
             'response': bot_response
         })
+        if settings.DEBUG:
+            response['Server-Timing'] = timer.server_timing()
+        return response
         
     except Exception as e:
-        return Response(
+        return JsonResponse(
             {'error': str(e)}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@csrf_exempt
+@require_POST
+async def send_message_stream(request):
+    """Stream the chatbot response to the client as Server-Sent Events.
+
+    Emits a ``session`` event, one ``token`` event per chunk received from
+    OpenRouter and a final ``done`` event once the assembled bot message has
+    been saved.
+    """
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    message_content = data.get('message', '').strip()
+    if not message_content:
+        return JsonResponse(
+            {'error': 'Message is required'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    with request_timer() as timer:
+        # Cached session lookup; no queries on a warm cache
+        with stage('session'):
+            session = await sync_to_async(resolve_session)(request, data)
+        
+        # Recent turns of this session, before the new message is stored
+        with stage('history'):
+            conversation_history = await sync_to_async(load_conversation_history)(session)
+        
+        # Save the user's message first so a failed stream cannot lose it
+        with stage('persist'):
+            session = await sync_to_async(record_user_message)(session, message_content)
+    
+    async def event_stream():
+        yield _sse_event('session', {'session_id': session.id})
+        
+        with request_timer(timer):
+            chunks = []
+            try:
+                openrouter_service = OpenRouterService()
+                async for token in openrouter_service.astream_response(message_content, conversation_history):
+                    chunks.append(token)
+                    yield _sse_event('token', {'token': token})
+            except Exception as e:
+                yield _sse_event('error', {'error': str(e)})
+            
+            # Persist the reply once the stream has completed
+            bot_response = ''.join(chunks)
+            with stage('persist'):
+                bot_message = await sync_to_async(record_reply)(session, bot_response)
+                await sync_to_async(note_new_messages)(session.id)
+        timer.finish()
+        
+        done = {
+            'session_id': session.id,
+            'message_id': bot_message.id if bot_message else None,
+        }
+        # Headers are long gone by now, so the stages ride on the last event
+        if settings.DEBUG:
+            done['server_timing'] = timer.server_timing()
+        yield _sse_event('done', done)
+    
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx and similar proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_session(request, session_id):
     """Get a specific chat session"""
     try:
-        session = get_object_or_404(ChatSession, id=session_id)
+        session = ChatSession.objects.filter(id=session_id).first() or rehydrate_session(session_id)
+        if session is None:
+            return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
         serializer = ChatSessionSerializer(session)
         return Response(serializer.data)
     except Exception as e:
@@ -156,6 +290,29 @@ def get_sessions_by_user(request, user_id):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_sessions_page(request, user_id):
+    """Get one cursor-paginated page of a user's chat sessions, newest first"""
+    paginator = ChatSessionCursorPagination()
+    sessions = ChatSession.objects.filter(user_id=user_id).only('id', 'user_id', 'created_at', 'updated_at')
+    page = paginator.paginate_queryset(sessions, request)
+    serializer = ChatSessionSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_session_messages(request, session_id):
+    """Get one cursor-paginated page of a session's transcript, oldest first"""
+    paginator = ChatMessageCursorPagination()
+    # A session moved to cold storage is restored on first access
+    if not ChatSession.objects.filter(id=session_id).exists() and rehydrate_session(session_id) is None:
+        return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
+    messages = ChatMessage.objects.filter(session_id=session_id)
+    page = paginator.paginate_queryset(messages, request)
+    serializer = ChatMessageSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_venues(request):
@@ -202,6 +359,10 @@ def health_check(request):
     """Health check endpoint"""
     return Response({'status': 'healthy'})
 
+def metrics(request):
+    """Prometheus metrics for this worker process"""
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 
 # ==================== VENUE MANAGEMENT ENDPOINTS ====================
 
@@ -270,26 +431,181 @@ def get_venue_availability(request, venue_id):
             return Response({'error': 'start_date and end_date are required'}, 
                           status=status.HTTP_400_BAD_REQUEST)
         
-        # Check for existing bookings that overlap with the requested dates
-        conflicting_bookings = BookingSlot.objects.filter(
-            venue_id=venue_id,
-            start_date__lte=end_date,
-            end_date__gte=start_date,
-            booking__booking_status__in=['confirmed', 'pending']
-        )
+        try:
+            start = date.fromisoformat(start_date)
+            end = date.fromisoformat(end_date)
+        except ValueError:
+            return Response({'error': 'Invalid date format. Use YYYY-MM-DD.'},
+                          status=status.HTTP_400_BAD_REQUEST)
         
-        is_available = not conflicting_bookings.exists()
+        # Count active slots that overlap the requested dates
+        if getattr(settings, 'CHATBOT_AVAILABILITY_INDEX', False):
+            conflicting_bookings = get_venue_interval_index().count_overlaps(venue_id, start, end)
+        else:
+            conflicting_bookings = BookingSlot.objects.filter(
+                venue_id=venue_id,
+                start_date__lte=end,
+                end_date__gte=start,
+                booking__booking_status__in=ACTIVE_BOOKING_STATUSES
+            ).count()
         
         return Response({
             'venue_id': venue_id,
             'start_date': start_date,
             'end_date': end_date,
-            'is_available': is_available,
-            'conflicting_bookings': conflicting_bookings.count()
+            'is_available': conflicting_bookings == 0,
+            'conflicting_bookings': conflicting_bookings
         })
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_bulk_availability(request):
+    """Occupancy of several venues over a date window in one call.
+
+    ``venue_ids`` is a comma-separated list (all active venues if omitted).
+    With ``resolution=day`` (default) each day is the number of occupied
+    hours; with ``resolution=hour`` each day is a 24-character string of
+    cell codes (see ``legend``).
+    """
+    try:
+        start_date = request.GET.get('start_date')
+        end_date = request.GET.get('end_date')
+        resolution = request.GET.get('resolution', 'day')
+        
+        if not start_date or not end_date:
+            return Response({'error': 'start_date and end_date are required'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        if resolution not in ('day', 'hour'):
+            return Response({'error': 'resolution must be day or hour'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start = date.fromisoformat(start_date)
+            end = date.fromisoformat(end_date)
+            venue_ids = request.GET.get('venue_ids')
+            if venue_ids:
+                venue_ids = sorted({int(venue_id) for venue_id in venue_ids.split(',') if venue_id.strip()})
+            else:
+                venue_ids = None
+        except ValueError:
+            return Response({'error': 'Invalid dates (YYYY-MM-DD) or venue_ids (comma-separated integers)'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        max_days = getattr(settings, 'CHATBOT_AVAILABILITY_MAX_DAYS', 93)
+        if end < start or (end - start).days >= max_days:
+            return Response({'error': f'end_date must be on or after start_date and within {max_days} days'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        matrix = occupancy_matrix(start, end, venue_ids)
+        days = day_range(start, end)
+        occupancy = {}
+        for venue_id, cells in sorted(matrix.items()):
+            rows = [cells[offset * 24:(offset + 1) * 24] for offset in range(len(days))]
+            if resolution == 'hour':
+                occupancy[venue_id] = [''.join(str(cell) for cell in row) for row in rows]
+            else:
+                occupancy[venue_id] = [24 - row.count(FREE) for row in rows]
+        
+        response = {
+            'start_date': start_date,
+            'end_date': end_date,
+            'resolution': resolution,
+            'days': [day.isoformat() for day in days],
+            'occupancy': occupancy,
+        }
+        if resolution == 'hour':
+            response['legend'] = {str(FREE): 'free', str(ARRANGEMENT): 'setup/rehearsal/breakdown', str(BOOKED): 'booked'}
+        return Response(response)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_venue_utilization(request):
+    """Booked share of opening hours per venue and day, for dashboards.
+
+    Served from the in-memory occupancy calendar, so the window must lie
+    within its horizon. ``bitmap=true`` adds each day's occupied half-hours
+    (bookings and setup windows) as 12 hex digits, 00:00 in the high bit.
+    """
+    try:
+        start_date = request.GET.get('start_date')
+        end_date = request.GET.get('end_date')
+        
+        if not start_date or not end_date:
+            return Response({'error': 'start_date and end_date are required'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start = date.fromisoformat(start_date)
+            end = date.fromisoformat(end_date)
+            venue_ids = request.GET.get('venue_ids')
+            if venue_ids:
+                venue_ids = sorted({int(venue_id) for venue_id in venue_ids.split(',') if venue_id.strip()})
+            else:
+                venue_ids = None
+        except ValueError:
+            return Response({'error': 'Invalid dates (YYYY-MM-DD) or venue_ids (comma-separated integers)'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        calendar = get_occupancy_calendar()
+        if end < start or not calendar.covers(start, end):
+            return Response({'error': 'end_date must be on or after start_date and both within the occupancy calendar horizon'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        utilization = calendar.utilization(venue_ids, start, end)
+        if request.GET.get('bitmap') == 'true':
+            for venue_id, venue in utilization.items():
+                venue['bitmap'] = [day.hex() for day in calendar.packed(venue_id, start, end)]
+        return Response({
+            'start_date': start_date,
+            'end_date': end_date,
+            'days': [day.isoformat() for day in day_range(start, end)],
+            'venues': dict(sorted(utilization.items())),
+        })
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_free_slots(request):
+    """Earliest free windows of ``duration`` hours, optionally for one venue
+    (``venue_id``) or venues seating at least ``min_capacity``."""
+    try:
+        try:
+            duration = int(request.GET['duration'])
+            venue_id = request.GET.get('venue_id')
+            venue_ids = [int(venue_id)] if venue_id else None
+            min_capacity = int(request.GET.get('min_capacity') or 0)
+            start_date = request.GET.get('start_date')
+            start = date.fromisoformat(start_date) if start_date else None
+            horizon_days = int(request.GET.get('horizon_days', 14))
+            limit = int(request.GET.get('limit', 5))
+        except KeyError:
+            return Response({'error': 'duration is required'}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({'error': 'Invalid parameter; numbers must be integers and dates YYYY-MM-DD'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        max_days = getattr(settings, 'CHATBOT_AVAILABILITY_MAX_DAYS', 93)
+        if not 1 <= horizon_days <= max_days or not 1 <= limit <= 50:
+            return Response({'error': f'horizon_days must be 1-{max_days} and limit 1-50'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        windows = find_free_windows(
+            duration, venue_ids=venue_ids, min_capacity=min_capacity, start=start,
+            horizon_days=horizon_days, limit=limit,
+        )
+        if not windows:
+            # Only worth a query when nothing was found
+            durations = sorted(set(PriceTier.objects.values_list('duration', flat=True)))
+            if duration not in durations:
+                return Response({'error': f'No package lasts {duration} hours', 'durations': durations},
+                              status=status.HTTP_400_BAD_REQUEST)
+        return Response({'duration': duration, 'windows': windows})
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 
 # ==================== APPLICANT MANAGEMENT ENDPOINTS ====================
 
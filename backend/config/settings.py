@@ -1,3 +1,4 @@
+import json
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -67,6 +68,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
 
 # Database
 DATABASES = {
@@ -166,9 +168,135 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
 ]
 
+# Cache
+# The chatbot keeps its prompt context snapshot here. Use a shared backend
+# (Redis/Memcached) when running several workers so model-signal
+# invalidation reaches every process.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'eventaura'),
+    }
+}
+
+# Chatbot context snapshot lifetime in seconds; None keeps it until a
+# catalog model signal invalidates it
+CHATBOT_CONTEXT_CACHE_TIMEOUT = None
+
+# How long the chat endpoints cache the caller's session lookup (seconds)
+CHATBOT_SESSION_CACHE_TIMEOUT = int(os.getenv('CHATBOT_SESSION_CACHE_TIMEOUT', '3600'))
+
+# Conversation history sent with each chat turn: at most this many recent
+# messages, trimmed to an estimated token budget
+CHATBOT_HISTORY_MAX_MESSAGES = int(os.getenv('CHATBOT_HISTORY_MAX_MESSAGES', '10'))
+CHATBOT_HISTORY_TOKEN_BUDGET = int(os.getenv('CHATBOT_HISTORY_TOKEN_BUDGET', '1500'))
+
+# Rolling session summaries: every N new messages older turns are folded into
+# ChatSession.summary in the background, keeping the newest ones verbatim
+CHATBOT_SUMMARY_EVERY = int(os.getenv('CHATBOT_SUMMARY_EVERY', '10'))
+CHATBOT_SUMMARY_KEEP_RECENT = int(os.getenv('CHATBOT_SUMMARY_KEEP_RECENT', '6'))
+CHATBOT_SUMMARY_MAX_CHARS = int(os.getenv('CHATBOT_SUMMARY_MAX_CHARS', '2000'))
+
+# Write-behind chat transcripts: turns are queued in-process and written in
+# bulk every FLUSH_MS or BATCH_SIZE messages. Batches the database rejects go
+# to the spool file, which is retried every REPLAY_SECONDS. Chat responses then
+# carry message_id null, since the reply has not been written yet.
+CHATBOT_WRITE_BEHIND = os.getenv('CHATBOT_WRITE_BEHIND', 'False') == 'True'
+CHATBOT_WRITE_BEHIND_FLUSH_MS = int(os.getenv('CHATBOT_WRITE_BEHIND_FLUSH_MS', '200'))
+CHATBOT_WRITE_BEHIND_BATCH_SIZE = int(os.getenv('CHATBOT_WRITE_BEHIND_BATCH_SIZE', '200'))
+CHATBOT_WRITE_BEHIND_QUEUE_SIZE = int(os.getenv('CHATBOT_WRITE_BEHIND_QUEUE_SIZE', '10000'))
+CHATBOT_WRITE_BEHIND_REPLAY_SECONDS = int(os.getenv('CHATBOT_WRITE_BEHIND_REPLAY_SECONDS', '60'))
+CHATBOT_WRITE_BEHIND_SPOOL = os.getenv('CHATBOT_WRITE_BEHIND_SPOOL', str(BASE_DIR / 'logs' / 'chat_transcript_spool.jsonl'))
+
+# Cold storage: `manage.py archive_chat_sessions` (run daily from cron) moves
+# sessions idle for this many days into gzip segment files in ARCHIVE_DIR
+CHATBOT_ARCHIVE_IDLE_DAYS = int(os.getenv('CHATBOT_ARCHIVE_IDLE_DAYS', '90'))
+CHATBOT_ARCHIVE_DIR = os.getenv('CHATBOT_ARCHIVE_DIR', str(BASE_DIR / 'archive' / 'chat'))
+
+# In-process LRU cache of LLM answers to standalone questions (0 disables)
+CHATBOT_RESPONSE_CACHE_SIZE = int(os.getenv('CHATBOT_RESPONSE_CACHE_SIZE', '1000'))
+CHATBOT_RESPONSE_CACHE_TTL = int(os.getenv('CHATBOT_RESPONSE_CACHE_TTL', '3600'))
+
+# Similarity cache for paraphrased questions (0 disables). Memory use is
+# SIZE * DIM * 4 bytes; entries share the response cache TTL.
+CHATBOT_SEMANTIC_CACHE_SIZE = int(os.getenv('CHATBOT_SEMANTIC_CACHE_SIZE', '1000'))
+CHATBOT_SEMANTIC_CACHE_DIM = int(os.getenv('CHATBOT_SEMANTIC_CACHE_DIM', '1024'))
+CHATBOT_SEMANTIC_CACHE_THRESHOLD = float(os.getenv('CHATBOT_SEMANTIC_CACHE_THRESHOLD', '0.85'))
+
+# Serve venue availability checks from the in-memory interval index instead
+# of MySQL. The index follows model signals in this process and reloads when
+# another process changed bookings or after TTL seconds (0 disables the TTL).
+# Other processes' changes are announced through the default cache, so the
+# index is off unless that cache is shared between workers.
+CHATBOT_SHARED_CACHE = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+CHATBOT_AVAILABILITY_INDEX = os.getenv('CHATBOT_AVAILABILITY_INDEX', str(CHATBOT_SHARED_CACHE)) == 'True'
+CHATBOT_AVAILABILITY_INDEX_TTL = int(os.getenv('CHATBOT_AVAILABILITY_INDEX_TTL', '300'))
+# Longest date window the bulk availability endpoint accepts
+CHATBOT_AVAILABILITY_MAX_DAYS = int(os.getenv('CHATBOT_AVAILABILITY_MAX_DAYS', '93'))
+# Days before and after today the half-hour occupancy calendar keeps in
+# memory (192 bytes per venue and day)
+CHATBOT_OCCUPANCY_PAST_DAYS = int(os.getenv('CHATBOT_OCCUPANCY_PAST_DAYS', '31'))
+CHATBOT_OCCUPANCY_FUTURE_DAYS = int(os.getenv('CHATBOT_OCCUPANCY_FUTURE_DAYS', '366'))
+# Seconds after which the calendar is rebuilt even without a change announced
+# through the cache (0 disables); bounds staleness when the cache is per-process
+CHATBOT_OCCUPANCY_TTL = int(os.getenv('CHATBOT_OCCUPANCY_TTL', '60'))
+# Opening hours the free-slot search offers windows within and utilization is measured against
+CHATBOT_VENUE_OPENING_HOUR = int(os.getenv('CHATBOT_VENUE_OPENING_HOUR', '8'))
+CHATBOT_VENUE_CLOSING_HOUR = int(os.getenv('CHATBOT_VENUE_CLOSING_HOUR', '22'))
+
+# Answer deterministic intents (greetings, contact, venue list, capacities,
+# prices) from the context snapshot without calling the LLM when the turn
+# scores at least THRESHOLD (0-1)
+CHATBOT_FAST_PATH = os.getenv('CHATBOT_FAST_PATH', 'True') == 'True'
+CHATBOT_FAST_PATH_THRESHOLD = float(os.getenv('CHATBOT_FAST_PATH_THRESHOLD', '0.75'))
+
 # OpenRouter API settings
 OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
-OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
+# Base URL of the chat-completions API; point it at scripts/fake_openrouter.py
+# (e.g. http://127.0.0.1:8765/api/v1) for local load testing
+OPENROUTER_BASE_URL = os.getenv('OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1')
+
+# Connection pool for OpenRouter requests (per worker process); a request
+# waits at most POOL_TIMEOUT seconds for a free connection before failing
+OPENROUTER_POOL_CONNECTIONS = int(os.getenv('OPENROUTER_POOL_CONNECTIONS', '4'))
+OPENROUTER_POOL_MAXSIZE = int(os.getenv('OPENROUTER_POOL_MAXSIZE', '20'))
+OPENROUTER_KEEPALIVE_TIMEOUT = int(os.getenv('OPENROUTER_KEEPALIVE_TIMEOUT', '60'))
+OPENROUTER_POOL_TIMEOUT = float(os.getenv('OPENROUTER_POOL_TIMEOUT', '5'))
+
+# Resilience for OpenRouter calls: (connect, read) timeouts, with the shorter
+# FIRST_BYTE timeout as the read timeout of streamed calls; jittered retries
+# on 429/5xx and connection errors (never on read timeouts) that stop once
+# RETRY_DEADLINE seconds have passed; and a circuit breaker that answers
+# locally once the upstream error rate over WINDOW seconds reaches ERROR_RATE;
+# after COOLDOWN seconds up to HALF_OPEN_REQUESTS live calls are let through
+# as trials and the first success closes it again
+OPENROUTER_CONNECT_TIMEOUT = float(os.getenv('OPENROUTER_CONNECT_TIMEOUT', '3.05'))
+OPENROUTER_READ_TIMEOUT = float(os.getenv('OPENROUTER_READ_TIMEOUT', '20'))
+OPENROUTER_FIRST_BYTE_TIMEOUT = float(os.getenv('OPENROUTER_FIRST_BYTE_TIMEOUT', '8'))
+OPENROUTER_MAX_RETRIES = int(os.getenv('OPENROUTER_MAX_RETRIES', '2'))
+OPENROUTER_RETRY_DEADLINE = float(os.getenv('OPENROUTER_RETRY_DEADLINE', '8'))
+OPENROUTER_RETRY_BACKOFF = float(os.getenv('OPENROUTER_RETRY_BACKOFF', '0.25'))
+OPENROUTER_RETRY_BACKOFF_MAX = float(os.getenv('OPENROUTER_RETRY_BACKOFF_MAX', '2'))
+OPENROUTER_BREAKER_ERROR_RATE = float(os.getenv('OPENROUTER_BREAKER_ERROR_RATE', '0.5'))
+OPENROUTER_BREAKER_MIN_REQUESTS = int(os.getenv('OPENROUTER_BREAKER_MIN_REQUESTS', '10'))
+OPENROUTER_BREAKER_WINDOW = int(os.getenv('OPENROUTER_BREAKER_WINDOW', '30'))
+OPENROUTER_BREAKER_COOLDOWN = int(os.getenv('OPENROUTER_BREAKER_COOLDOWN', '15'))
+OPENROUTER_BREAKER_HALF_OPEN_REQUESTS = int(os.getenv('OPENROUTER_BREAKER_HALF_OPEN_REQUESTS', '1'))
+
+# Model routing: OPENROUTER_INTENT_MODELS maps detected intents to models
+# (JSON, e.g. {"greeting": "openai/gpt-4o-mini"}); other turns use the default
+# model. With OPENROUTER_HEDGE_MODEL set, a request that has produced no token
+# after the HEDGE_QUANTILE of observed time-to-first-token (HEDGE_DEFAULT_DELAY
+# until enough samples exist) is raced against the hedge model.
+OPENROUTER_DEFAULT_MODEL = os.getenv('OPENROUTER_DEFAULT_MODEL', 'openai/gpt-3.5-turbo')
+OPENROUTER_INTENT_MODELS = json.loads(os.getenv('OPENROUTER_INTENT_MODELS', '{}'))
+OPENROUTER_HEDGE_MODEL = os.getenv('OPENROUTER_HEDGE_MODEL', '')
+OPENROUTER_HEDGE_QUANTILE = float(os.getenv('OPENROUTER_HEDGE_QUANTILE', '0.95'))
+OPENROUTER_HEDGE_MIN_DELAY = float(os.getenv('OPENROUTER_HEDGE_MIN_DELAY', '0.3'))
+OPENROUTER_HEDGE_DEFAULT_DELAY = float(os.getenv('OPENROUTER_HEDGE_DEFAULT_DELAY', '2'))
 
 # Logging
 LOGGING = {
@@ -0,0 +1,6 @@
+"""
+Load-generation suite for the chatbot API.
+
+See loadtest/run.py; results are written as JSON so runs can be compared
+across commits.
+"""
@@ -0,0 +1,98 @@
+"""
+Deterministic fixture data for load-test runs.
+"""
+import random
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+
+from apps.booking.models import Venue as BookingVenue
+from apps.chatbot.models import (
+    Applicant, Booking, BookingSlot, PriceTier, Venue,
+)
+from apps.complaints.models import Complaint, ComplaintAttachment, ComplaintReply
+
+
+VENUE_NAMES = [
+    'Main Auditorium', 'Conference Hall', 'Pond Amphitheatre',
+    'Exhibition Hall', 'Seminar Room', 'Open Courtyard',
+]
+TIER_PRICES = {2: 15000, 4: 27000, 6: 38000, 12: 70000}
+
+
+def ensure_complaints_schema():
+    """Match the complaints tables to the models the views query.
+
+    The complaints migration predates the tables the views use in
+    production, so a freshly migrated database has the wrong columns.
+    """
+    models = [Complaint, ComplaintReply, ComplaintAttachment]
+    with connection.cursor() as cursor:
+        columns = {
+            column.name
+            for column in connection.introspection.get_table_description(cursor, Complaint._meta.db_table)
+        }
+    if 'complaint_id' in columns:
+        return
+    with connection.schema_editor() as editor:
+        for model in models:
+            editor.execute(f'DROP TABLE IF EXISTS {editor.quote_name(model._meta.db_table)}')
+            editor.create_model(model)
+
+
+def seed_fixture(venues=6, bookings=200, complaints=100, seed=1):
+    """Populate an empty database; does nothing if venues already exist."""
+    ensure_complaints_schema()
+    if Venue.objects.exists():
+        return False
+
+    rng = random.Random(seed)
+    user, _ = User.objects.get_or_create(username='loadtest', defaults={'email': 'loadtest@example.com'})
+
+    venue_rows = []
+    for index in range(venues):
+        name = VENUE_NAMES[index % len(VENUE_NAMES)]
+        capacity = rng.choice([50, 100, 300, 600])
+        venue_rows.append(Venue.objects.create(
+            venue_name=name, capacity=capacity, description=f"{name} for up to {capacity} guests",
+        ))
+        BookingVenue.objects.create(venue_name=name, capacity=capacity, description=f"{name} for up to {capacity} guests")
+    tiers = {
+        venue.venue_id: PriceTier.objects.bulk_create([
+            PriceTier(venue=venue, duration=hours, price=Decimal(price))
+            for hours, price in TIER_PRICES.items()
+        ])
+        for venue in venue_rows
+    }
+
+    applicant = Applicant.objects.create(
+        user=user, applicant_name='Load Test', organization='EventAura QA',
+        contact_no='0770000000', email='loadtest@example.com',
+    )
+    start = date.today()
+    for index in range(bookings):
+        booking = Booking.objects.create(
+            applicant=applicant,
+            booking_reference=f'LT{index:06d}',
+            event_types=['conference'],
+            event_details='Load test booking',
+            total_amount=Decimal('27000'),
+            booking_status=rng.choice(['pending', 'confirmed', 'confirmed', 'cancelled']),
+        )
+        venue = rng.choice(venue_rows)
+        tier = rng.choice(tiers[venue.venue_id])
+        day = start + timedelta(days=rng.randrange(90))
+        hour = rng.randrange(8, 21 - tier.duration)
+        BookingSlot.objects.create(
+            booking=booking, venue=venue, tier=tier, start_date=day, end_date=day,
+            start_time=time(hour), end_time=time(hour + tier.duration),
+            venue_cost=tier.price, isfullday=tier.duration == 12,
+        )
+
+    Complaint.objects.bulk_create([
+        Complaint(subject=f'Load test complaint {index}', description='Generated for load testing')
+        for index in range(complaints)
+    ])
+    return True
@@ -0,0 +1,20 @@
+from django.db import connection
+
+
+class QueryCountMiddleware:
+    """Report the number of SQL statements a request ran in ``X-DB-Queries``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            response = self.get_response(request)
+        response['X-DB-Queries'] = str(len(queries))
+        return response
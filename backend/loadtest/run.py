@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+"""
+End-to-end load test for the chatbot API.
+
+Starts the fake OpenRouter server and the Django app in-process (SQLite by
+default, LOADTEST_DB=mysql for a local MySQL database), seeds a fixture,
+drives the chat, venues, bookings and complaints endpoints from concurrent
+clients with a weighted mix and prints throughput, latency percentiles and
+DB queries per request as JSON.
+
+    cd backend
+    python -m loadtest.run --concurrency 16 --duration 30 \
+        --mix chat=60,venues=20,bookings=10,complaints=10 --output results/run.json
+
+Use --target-url to drive an already running server instead (queries per
+request are reported only if it runs with loadtest.settings).
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+import numpy as np
+import requests
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    'chat': ('POST', '/api/chatbot/chat/'),
+    'venues': ('GET', '/api/chatbot/venues/'),
+    'bookings': ('GET', '/api/chatbot/bookings/'),
+    'complaints': ('GET', '/api/complaints/complaints/'),
+}
+
+CHAT_MESSAGES = [
+    'Hello',
+    'What venues do you have?',
+    'How much does the Main Auditorium cost for 4 hours?',
+    'Is the Conference Hall available next Friday?',
+    'What is the capacity of the Pond Amphitheatre?',
+    'What additional services do you offer?',
+    'How do I make a booking?',
+    'What are your contact details?',
+    'Tell me about the Jaffna Cultural Centre',
+    'Can I hold a wedding reception for 250 guests?',
+]
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario '{name}' (choose from {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Load test the chatbot API')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients')
+    parser.add_argument('--duration', type=float, default=20, help='Measured run time in seconds')
+    parser.add_argument('--requests', type=int, default=None, help='Stop after this many measured requests')
+    parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests before the run')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('chat=60,venues=20,bookings=10,complaints=10'),
+                        help='Weighted scenario mix, e.g. chat=60,venues=20,bookings=10,complaints=10')
+    parser.add_argument('--chat-messages', default=None, help='JSON file with a list of chat messages to send')
+    parser.add_argument('--unique-ratio', type=float, default=0.2,
+                        help='Fraction of chat messages made unique so they bypass answer caches')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--target-url', default=None, help='Drive an already running server')
+    parser.add_argument('--port', type=int, default=8010, help='Port for the in-process app server')
+    parser.add_argument('--llm-port', type=int, default=8765, help='Port for the fake OpenRouter server')
+    parser.add_argument('--llm-args', default='--latency-dist lognormal --latency-ms 300 --tokens-per-sec 200',
+                        help='Extra arguments for scripts/fake_openrouter.py')
+    parser.add_argument('--fresh-db', action='store_true', help='Delete the SQLite fixture database first')
+    parser.add_argument('--output', default=None, help='Also write the JSON report to this file')
+    return parser
+
+
+def start_fake_llm(options):
+    sys.path.insert(0, os.path.join(BACKEND_DIR, 'scripts'))
+    from fake_openrouter import start_server
+
+    argv = ['--port', str(options.llm_port), '--seed', str(options.seed), '--quiet'] + options.llm_args.split()
+    return start_server(argv, background=True)
+
+
+def start_app_server(options):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'loadtest.settings')
+    os.environ.setdefault('OPENROUTER_BASE_URL', f'http://127.0.0.1:{options.llm_port}/api/v1')
+    if options.fresh_db and os.getenv('LOADTEST_DB', 'sqlite') != 'mysql':
+        from loadtest.settings import DATABASES
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(DATABASES['default']['NAME'] + suffix):
+                os.remove(DATABASES['default']['NAME'] + suffix)
+
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.core.wsgi import get_wsgi_application
+    from loadtest.fixtures import seed_fixture
+
+    call_command('migrate', interactive=False, verbosity=0)
+    seed_fixture(seed=options.seed)
+
+    server = ThreadedWSGIServer(('127.0.0.1', options.port), WSGIRequestHandler, allow_reuse_address=True)
+    server.set_app(get_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class LoadGenerator:
+    def __init__(self, base_url, options, messages):
+        self.base_url = base_url.rstrip('/')
+        self.options = options
+        self.messages = messages
+        self.names = list(options.mix)
+        self.weights = [options.mix[name] for name in self.names]
+        self.samples = []
+        self.lock = threading.Lock()
+        self.issued = 0
+
+    def _claim(self, limit):
+        with self.lock:
+            if limit is not None and self.issued >= limit:
+                return False
+            self.issued += 1
+            return True
+
+    def _request(self, client, rng, name):
+        method, path = SCENARIOS[name]
+        body = None
+        if name == 'chat':
+            message = rng.choice(self.messages)
+            if rng.random() < self.options.unique_ratio:
+                message = f"{message} (ref {uuid.UUID(int=rng.getrandbits(128)).hex[:8]})"
+            body = {'message': message}
+        started = time.perf_counter()
+        try:
+            response = client.request(method, self.base_url + path, json=body, timeout=60)
+            response.content
+            elapsed = time.perf_counter() - started
+            queries = response.headers.get('X-DB-Queries')
+            return (name, response.status_code, elapsed, int(queries) if queries is not None else None)
+        except requests.RequestException:
+            return (name, None, time.perf_counter() - started, None)
+
+    def _worker(self, worker_id, deadline, limit, record):
+        rng = random.Random(self.options.seed * 1000 + worker_id)
+        client = requests.Session()
+        while time.monotonic() < deadline and self._claim(limit):
+            sample = self._request(client, rng, rng.choices(self.names, self.weights)[0])
+            if record:
+                with self.lock:
+                    self.samples.append(sample)
+        client.close()
+
+    def run(self, duration, limit, record=True):
+        self.issued = 0
+        deadline = time.monotonic() + duration
+        threads = [
+            threading.Thread(target=self._worker, args=(worker_id, deadline, limit, record))
+            for worker_id in range(self.options.concurrency)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+
+def summarize(samples, elapsed):
+    latencies = np.array([sample[2] for sample in samples]) * 1000
+    errors = sum(1 for sample in samples if sample[1] is None or sample[1] >= 400)
+    queries = [sample[3] for sample in samples if sample[3] is not None]
+    summary = {
+        'requests': len(samples),
+        'errors': errors,
+        'error_rate': errors / len(samples) if samples else 0.0,
+        'throughput_rps': len(samples) / elapsed if elapsed else 0.0,
+    }
+    if len(samples):
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        summary.update({
+            'latency_ms': {
+                'mean': float(latencies.mean()),
+                'p50': float(p50),
+                'p95': float(p95),
+                'p99': float(p99),
+                'max': float(latencies.max()),
+            },
+            'db_queries_per_request': float(np.mean(queries)) if queries else None,
+        })
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL, text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    options = build_parser().parse_args(argv)
+    messages = CHAT_MESSAGES
+    if options.chat_messages:
+        with open(options.chat_messages, encoding='utf-8') as messages_file:
+            messages = json.load(messages_file)
+
+    if options.target_url:
+        base_url = options.target_url
+    else:
+        start_fake_llm(options)
+        start_app_server(options)
+        base_url = f'http://127.0.0.1:{options.port}'
+
+    generator = LoadGenerator(base_url, options, messages)
+    if options.warmup:
+        generator.run(duration=60, limit=options.warmup, record=False)
+    elapsed = generator.run(duration=options.duration, limit=options.requests)
+
+    by_scenario = defaultdict(list)
+    for sample in generator.samples:
+        by_scenario[sample[0]].append(sample)
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'config': {
+            'concurrency': options.concurrency,
+            'duration': options.duration,
+            'requests': options.requests,
+            'mix': options.mix,
+            'unique_ratio': options.unique_ratio,
+            'seed': options.seed,
+            'database': os.getenv('LOADTEST_DB', 'sqlite') if not options.target_url else None,
+            'llm_args': options.llm_args if not options.target_url else None,
+            'target_url': base_url,
+        },
+        'elapsed_s': elapsed,
+        'overall': summarize(generator.samples, elapsed),
+        'scenarios': {name: summarize(samples, elapsed) for name, samples in sorted(by_scenario.items())},
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if options.output:
+        os.makedirs(os.path.dirname(os.path.abspath(options.output)), exist_ok=True)
+        with open(options.output, 'w', encoding='utf-8') as output_file:
+            output_file.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Settings for load-test runs: the project settings with a local SQLite (or a
+separate local MySQL) database, the fake OpenRouter server and per-request
+query counting.
+"""
+from config.settings import *  # noqa: F401,F403
+
+if os.getenv('LOADTEST_DB', 'sqlite') == 'mysql':
+    DATABASES['default']['NAME'] = os.getenv('LOADTEST_MYSQL_NAME', 'EventAura_loadtest')
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('LOADTEST_SQLITE_PATH', str(BASE_DIR / 'loadtest' / 'loadtest.sqlite3')),
+            'OPTIONS': {
+                'timeout': 30,
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+            },
+        }
+    }
+
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+STATICFILES_DIRS = []
+
+MIDDLEWARE = ['loadtest.middleware.QueryCountMiddleware'] + MIDDLEWARE
+
+# Stubbed LLM: scripts/fake_openrouter.py, started by loadtest/run.py
+OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY') or 'loadtest'
+OPENROUTER_BASE_URL = os.getenv('OPENROUTER_BASE_URL', 'http://127.0.0.1:8765/api/v1')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'loggers': {
+        'django.server': {'level': 'ERROR'},
+    },
+}
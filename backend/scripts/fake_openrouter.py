@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+"""
+Local stand-in for the OpenRouter chat-completions API.
+
+Speaks the same request/response schema as OpenRouter (including SSE
+streaming with ``stream: true``) so the chat path can be load tested without
+network noise or API costs. Latency, error rate and token throughput are
+configurable and the random source can be seeded for reproducible runs.
+
+    python scripts/fake_openrouter.py --port 8765 --latency-dist lognormal \
+        --latency-ms 800 --tokens-per-sec 40 --error-rate 0.02
+
+Then point the backend at it:
+
+    OPENROUTER_BASE_URL=http://127.0.0.1:8765/api/v1 OPENROUTER_API_KEY=fake
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+LATENCY_DISTRIBUTIONS = ['fixed', 'uniform', 'normal', 'lognormal', 'exponential']
+
+FILLER_WORDS = (
+    "Jaffna Cultural Centre offers halls and open spaces for conferences, "
+    "weddings, concerts and exhibitions with flexible hourly and full day "
+    "pricing, on site parking, sound systems and catering on request."
+).split()
+
+
+class FakeOpenRouterServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, options):
+        super().__init__(address, FakeOpenRouterHandler)
+        self.options = options
+        self.random = random.Random(options.seed)
+        self.random_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.stats = {'requests': 0, 'streamed': 0, 'errors': 0}
+
+    def sample_latency(self, model=None):
+        """Seconds to wait before the first byte of the response."""
+        options = self.options
+        mean = options.model_latency.get(model, options.latency_ms)
+        with self.random_lock:
+            if options.latency_dist == 'uniform':
+                value = self.random.uniform(mean - options.latency_jitter_ms, mean + options.latency_jitter_ms)
+            elif options.latency_dist == 'normal':
+                value = self.random.gauss(mean, options.latency_jitter_ms)
+            elif options.latency_dist == 'lognormal':
+                # latency_ms is the median; sigma controls the tail
+                value = mean * math.exp(self.random.gauss(0, options.latency_sigma))
+            elif options.latency_dist == 'exponential':
+                value = self.random.expovariate(1 / mean) if mean > 0 else 0
+            else:
+                value = mean
+        return max(0.0, value) / 1000
+
+    def should_fail(self):
+        with self.random_lock:
+            if self.random.random() >= self.options.error_rate:
+                return None
+            return self.random.choice(self.options.error_statuses)
+
+    def count(self, key):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+
+class FakeOpenRouterHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if not self.server.options.quiet:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data):
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/stats'):
+            with self.server.stats_lock:
+                self._send_json(200, dict(self.server.stats))
+        else:
+            self._send_json(200, {'status': 'ok'})
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'code': 404, 'message': f'No route for {self.path}'}})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            messages = body['messages']
+        except (ValueError, KeyError):
+            self._send_json(400, {'error': {'code': 400, 'message': 'Invalid chat completions request'}})
+            return
+
+        self.server.count('requests')
+        model = body.get('model', 'openai/gpt-3.5-turbo')
+        time.sleep(self.server.sample_latency(model))
+
+        error_status = self.server.should_fail()
+        if error_status:
+            self.server.count('errors')
+            headers = {'Retry-After': '1'} if error_status == 429 else None
+            self._send_json(error_status, {
+                'error': {'code': error_status, 'message': 'Injected failure from fake OpenRouter'},
+            }, headers)
+            return
+
+        prompt = next((m['content'] for m in reversed(messages) if m.get('role') == 'user'), '')
+        max_tokens = body.get('max_tokens') or self.server.options.response_tokens
+        tokens = self._completion_tokens(prompt, min(max_tokens, self.server.options.response_tokens))
+        prompt_tokens = sum(len(str(m.get('content', ''))) for m in messages) // 4
+
+        if body.get('stream'):
+            self.server.count('streamed')
+            self._stream(model, tokens)
+        else:
+            # Without streaming the whole completion is generated before replying
+            time.sleep(len(tokens) / self.server.options.tokens_per_sec)
+            self._send_json(200, {
+                'id': f'gen-{uuid.uuid4().hex}',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': ''.join(tokens)},
+                    'finish_reason': 'stop',
+                }],
+                'usage': {
+                    'prompt_tokens': prompt_tokens,
+                    'completion_tokens': len(tokens),
+                    'total_tokens': prompt_tokens + len(tokens),
+                },
+            })
+
+    def _completion_tokens(self, prompt, count):
+        words = [f"(fake reply to: {prompt[:80]})"] + FILLER_WORDS
+        return [f"{words[i % len(words)]} " for i in range(max(1, count))]
+
+    def _stream(self, model, tokens):
+        generation_id = f'gen-{uuid.uuid4().hex}'
+        created = int(time.time())
+        interval = 1 / self.server.options.tokens_per_sec
+
+        def chunk(delta, finish_reason=None):
+            return {
+                'id': generation_id,
+                'object': 'chat.completion.chunk',
+                'created': created,
+                'model': model,
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+            }
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            # OpenRouter sends SSE comments while the upstream model is queued
+            self._write_chunk(b': OPENROUTER PROCESSING\n\n')
+            for index, token in enumerate(tokens):
+                delta = {'role': 'assistant', 'content': token} if index == 0 else {'content': token}
+                self._write_chunk(f"data: {json.dumps(chunk(delta))}\n\n".encode('utf-8'))
+                time.sleep(interval)
+            self._write_chunk(f"data: {json.dumps(chunk({}, 'stop'))}\n\n".encode('utf-8'))
+            self._write_chunk(b'data: [DONE]\n\n')
+            self._write_chunk(b'')
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away mid-stream (e.g. a cancelled hedged request)
+            self.close_connection = True
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Fake OpenRouter chat-completions server for load testing')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-dist', choices=LATENCY_DISTRIBUTIONS, default='fixed',
+                        help='Distribution of the delay before the first byte')
+    parser.add_argument('--latency-ms', type=float, default=300,
+                        help='Mean (median for lognormal) delay before the first byte')
+    parser.add_argument('--latency-jitter-ms', type=float, default=100,
+                        help='Half-width for uniform, standard deviation for normal')
+    parser.add_argument('--latency-sigma', type=float, default=0.5,
+                        help='Shape of the lognormal tail')
+    parser.add_argument('--model-latency', action='append', default=[],
+                        type=lambda value: (value.split('=', 1)[0], float(value.split('=', 1)[1])),
+                        help='Per-model latency override in ms, e.g. openai/gpt-4o=1500 (repeatable)')
+    parser.add_argument('--tokens-per-sec', type=float, default=50, help='Completion token throughput')
+    parser.add_argument('--response-tokens', type=int, default=60, help='Tokens per completion')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests that fail')
+    parser.add_argument('--error-statuses', type=lambda value: [int(v) for v in value.split(',')],
+                        default=[500, 502, 503, 429], help='Comma-separated statuses to fail with')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for reproducible runs')
+    parser.add_argument('--quiet', action='store_true', help='Do not log each request')
+    return parser
+
+
+def start_server(argv=None, background=False):
+    """Start the fake server; with ``background`` it runs in a daemon thread."""
+    options = build_parser().parse_args(argv)
+    options.model_latency = dict(options.model_latency)
+    server = FakeOpenRouterServer((options.host, options.port), options)
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    server = start_server()
+    host, port = server.server_address[:2]
+    print(f"Fake OpenRouter listening on http://{host}:{port}/api/v1/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
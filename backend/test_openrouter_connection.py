@@ -26,8 +26,8 @@ def test_openrouter_configuration():
     django_api_key = getattr(settings, 'OPENROUTER_API_KEY', None)
     print(f"Django Settings OPENROUTER_API_KEY: {'✅ SET' if django_api_key else '❌ NOT SET'}")
     
-    django_api_url = getattr(settings, 'OPENROUTER_API_URL', None)
-    print(f"Django Settings OPENROUTER_API_URL: {django_api_url}")
+    django_base_url = getattr(settings, 'OPENROUTER_BASE_URL', None)
+    print(f"Django Settings OPENROUTER_BASE_URL: {django_base_url}")
     
     return api_key is not None or django_api_key is not None
 